@@ -9,6 +9,69 @@ type Episode = {
   duration_sec: number;
 };
 
+type Chapter = {
+  title: string;
+  start_sec: number;
+};
+
+type Peaks = {
+  length: number;
+  duration_sec: number;
+  data: number[]; // pares [min, max] de 8 bits
+};
+
+const WAVEFORM_BINS = 160;
+
+// Miniatura de la forma de onda con los picos precalculados; un clic salta a ese punto
+function Waveform({
+  episodeId,
+  onSeek,
+}: {
+  episodeId: number;
+  onSeek: (sec: number) => void;
+}) {
+  const [peaks, setPeaks] = useState<Peaks | null>(null);
+
+  useEffect(() => {
+    fetch(`${apiBase()}/episodes/${episodeId}/peaks?bins=${WAVEFORM_BINS}`)
+      .then((r) => (r.ok ? r.json() : null))
+      .then(setPeaks)
+      .catch(() => setPeaks(null));
+  }, [episodeId]);
+
+  if (!peaks || !peaks.length) return null;
+  const width = 480;
+  const height = 40;
+  const barWidth = width / peaks.length;
+  return (
+    <svg
+      width={width}
+      height={height}
+      style={{ display: "block", marginTop: 4, cursor: "pointer" }}
+      onClick={(e) => {
+        const rect = e.currentTarget.getBoundingClientRect();
+        onSeek(((e.clientX - rect.left) / rect.width) * peaks.duration_sec);
+      }}
+    >
+      {Array.from({ length: peaks.length }, (_, i) => {
+        const min = peaks.data[2 * i] / 128;
+        const max = peaks.data[2 * i + 1] / 128;
+        const top = ((1 - max) / 2) * height;
+        return (
+          <rect
+            key={i}
+            x={i * barWidth}
+            y={top}
+            width={Math.max(1, barWidth - 1)}
+            height={Math.max(1, ((max - min) / 2) * height)}
+            fill="#888"
+          />
+        );
+      })}
+    </svg>
+  );
+}
+
 interface ScriptSection {
   id: number;
   title: string;
@@ -39,6 +102,7 @@ export default function Dashboard() {
   const [currentScript, setCurrentScript] = useState<Script | null>(null);
   const [editingSection, setEditingSection] = useState<number | null>(null);
   const [editingContent, setEditingContent] = useState<string>("");
+  const [chapters, setChapters] = useState<Record<number, Chapter[]>>({});
   const [step, setStep] = useState<
     "idle" | "uploaded" | "draft_ready" | "generating"
   >("idle");
@@ -62,6 +126,23 @@ export default function Dashboard() {
     if (r.ok) setEpisodes(await r.json());
   };
 
+  const loadChapters = async (episodeId: number) => {
+    const r = await fetch(`${apiBase()}/episodes/${episodeId}/chapters`);
+    if (!r.ok) return;
+    const d = await r.json();
+    setChapters((prev) => ({ ...prev, [episodeId]: d.chapters || [] }));
+  };
+
+  // Saltar a un capítulo: el navegador pide solo el rango de bytes necesario
+  const seekTo = (episodeId: number, sec: number) => {
+    const audio = document.getElementById(
+      `audio-${episodeId}`
+    ) as HTMLAudioElement | null;
+    if (!audio) return;
+    audio.currentTime = sec;
+    audio.play();
+  };
+
   const onUpload = async (e: any) => {
     const file = e.target.files?.[0];
     if (!file) return;
@@ -78,7 +159,14 @@ export default function Dashboard() {
     const { upload_id } = await r.json();
     setUploadId(upload_id);
     setStep("uploaded");
-    setMsg("Archivo subido. Generando script con secciones...");
+    // Las páginas sin capa de texto pasan por OCR: avisar que va a tardar más
+    const info = await fetch(`${apiBase()}/uploads/${upload_id}/info`);
+    const scanned = info.ok ? (await info.json()).pages_without_text.length : 0;
+    setMsg(
+      scanned
+        ? `Archivo subido (${scanned} páginas escaneadas, se procesan con OCR). Generando script con secciones...`
+        : "Archivo subido. Generando script con secciones..."
+    );
 
     // Generar script con secciones usando el endpoint /generate-script
     const processResponse = await fetch(`${apiBase()}/generate-script`, {
@@ -167,10 +255,63 @@ export default function Dashboard() {
         voice: selectedVoice || "em_santa",
       }),
     });
-    setMsg(p.ok ? "Episodio creado" : "Error procesando");
+    if (!p.ok) {
+      setMsg("Error procesando");
+      setStep("idle");
+      return;
+    }
+    const { episode_id } = await p.json();
+    setMsg("Episodio en cola...");
     await refreshEpisodes();
-    setStep("idle");
-    setCurrentScript(null);
+    followProgress(episode_id);
+  };
+
+  const cancelJob = async (episodeId: number) => {
+    await fetch(`${apiBase()}/episodes/${episodeId}/job`, { method: "DELETE" });
+    await refreshEpisodes();
+  };
+
+  // Sigue el progreso del trabajo por SSE en lugar de esperar a /process;
+  // si se cierra la pestaña, el servidor cancela el trabajo
+  const followProgress = (episodeId: number) => {
+    const es = new EventSource(
+      `${apiBase()}/episodes/${episodeId}/events?cancel_on_disconnect=true`
+    );
+    const finish = async (text: string) => {
+      es.close();
+      setMsg(text);
+      await refreshEpisodes();
+      setStep("idle");
+      setCurrentScript(null);
+    };
+    es.addEventListener("stage", (e) => {
+      const d = JSON.parse((e as MessageEvent).data);
+      setMsg(`Etapa: ${d.stage}`);
+    });
+    es.addEventListener("progress", (e) => {
+      const d = JSON.parse((e as MessageEvent).data);
+      if (d.stage === "extract") {
+        setMsg(`Extrayendo páginas ${d.pages}/${d.total}`);
+      } else if (d.total) {
+        setMsg(
+          `Sintetizando sección ${d.section}/${d.total} — ${d.audio_sec}s de audio`
+        );
+      } else {
+        setMsg(`Sintetizando ${d.title ?? ""} — ${d.audio_sec}s de audio`);
+      }
+    });
+    es.addEventListener("done", () => finish("Episodio creado"));
+    es.addEventListener("cancelled", () => finish("Episodio cancelado"));
+    es.addEventListener("error", (e) => {
+      const data = (e as MessageEvent).data;
+      if (data) finish(`Error procesando: ${JSON.parse(data).message}`);
+    });
+    // El trabajo corre en otro proceso: el estado es informativo, el cierre
+    // llega como done/error/cancelled
+    es.addEventListener("status", (e) => {
+      const d = JSON.parse((e as MessageEvent).data);
+      setMsg(`Estado del episodio: ${d.status}`);
+    });
   };
 
   return (
@@ -298,12 +439,45 @@ export default function Dashboard() {
         {episodes.map((ep) => (
           <li key={ep.id} style={{ margin: "8px 0" }}>
             <b>{ep.title}</b> — {ep.status}
+            {(ep.status === "pending" || ep.status === "processing") && (
+              <button onClick={() => cancelJob(ep.id)} style={{ marginLeft: 8 }}>
+                Cancelar
+              </button>
+            )}
             {ep.status === "ready" && (
-              <audio
-                controls
-                src={`${apiBase()}/episodes/${ep.id}/audio`}
-                style={{ display: "block", marginTop: 4 }}
-              />
+              <>
+                <Waveform episodeId={ep.id} onSeek={(sec) => seekTo(ep.id, sec)} />
+                <label style={{ display: "block", marginTop: 4 }}>
+                  Vista previa:{" "}
+                  <audio
+                    controls
+                    preload="none"
+                    src={`${apiBase()}/episodes/${ep.id}/preview`}
+                    style={{ verticalAlign: "middle", height: 28 }}
+                  />
+                </label>
+                <audio
+                  id={`audio-${ep.id}`}
+                  controls
+                  preload="metadata"
+                  src={`${apiBase()}/episodes/${ep.id}/audio`}
+                  style={{ display: "block", marginTop: 4 }}
+                />
+                {chapters[ep.id] ? (
+                  <ol style={{ marginTop: 4 }}>
+                    {chapters[ep.id].map((c) => (
+                      <li key={`${c.title}-${c.start_sec}`}>
+                        <button onClick={() => seekTo(ep.id, c.start_sec)}>
+                          {c.title} ({Math.floor(c.start_sec / 60)}:
+                          {String(Math.floor(c.start_sec % 60)).padStart(2, "0")})
+                        </button>
+                      </li>
+                    ))}
+                  </ol>
+                ) : (
+                  <button onClick={() => loadChapters(ep.id)}>Capítulos</button>
+                )}
+              </>
             )}
           </li>
         ))}
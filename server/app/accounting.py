@@ -0,0 +1,143 @@
+"""
+Contabilidad de recursos por trabajo. Cada etapa del pipeline (extracción,
+guion, síntesis; o la conversión en streaming) registra tiempo de reloj, CPU
+del proceso y del hilo, pico de RSS (muestreado en /proc mientras corre),
+caracteres sintetizados y segundos de audio producidos, en filas JobStats
+ligadas al episodio y al upload.
+
+La CPU del proceso incluye los hilos de torch y del OCR, así que con varios
+trabajos simultáneos (JOB_WORKERS > 1) se solapa entre ellos; con el servidor
+de modelos la síntesis se cuenta allá y no acá.
+"""
+import os
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import case, func
+from sqlmodel import select
+
+from .db import Episode, JobStats, Upload, get_session
+from .pipeline_pool import rss_mb
+
+RSS_SAMPLE_SEC = float(os.getenv("RSS_SAMPLE_SEC", "0.2"))
+# En estas etapas `chars` es texto sintetizado; en extract/script es texto extraído / del guion
+SYNTH_STAGES = ("synthesize", "stream")
+
+class _PeakRss:
+    """Muestrea el RSS en un hilo aparte hasta `stop()`, que devuelve el máximo visto."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_SEC):
+        self.interval = interval
+        self.peak = rss_mb() or 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb() or 0.0)
+
+    def stop(self) -> float:
+        self._stop.set()
+        self._thread.join()
+        return round(max(self.peak, rss_mb() or 0.0), 1)
+
+class JobAccount:
+    """Acumula las etapas de una corrida; `save` las guarda con el resultado del trabajo."""
+
+    def __init__(self):
+        self.stages: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict]:
+        """El dict que se entrega admite `chars` y `audio_sec`; lo demás se mide solo."""
+        row = {"stage": name, "chars": 0, "audio_sec": 0.0}
+        sampler = _PeakRss()
+        wall, cpu, thread_cpu = time.perf_counter(), time.process_time(), time.thread_time()
+        try:
+            yield row
+        finally:
+            row.update(
+                wall_sec=round(time.perf_counter() - wall, 3),
+                cpu_sec=round(time.process_time() - cpu, 3),
+                thread_cpu_sec=round(time.thread_time() - thread_cpu, 3),
+                peak_rss_mb=sampler.stop(),
+            )
+            row["audio_sec"] = round(row["audio_sec"], 2)
+            self.stages.append(row)
+
+    def save(self, episode_id: int, status: str = "ok"):
+        save_stages(episode_id, self.stages, status)
+
+def save_stages(episode_id: int, stages: List[Dict], status: str = "ok"):
+    if not stages:
+        return
+    with get_session() as s:
+        e = s.get(Episode, episode_id)
+        if e is None:
+            return
+        s.add_all([JobStats(episode_id=e.id, upload_id=e.upload_id, user_id=e.user_id, status=status, **row) for row in stages])
+        s.commit()
+
+def episode_stats(episode_id: int) -> Dict:
+    with get_session() as s:
+        rows = s.exec(select(JobStats).where(JobStats.episode_id == episode_id).order_by(JobStats.id)).all()
+        stages = [r.model_dump(exclude={"episode_id", "upload_id", "user_id"}) for r in rows]
+    total = {k: round(sum(r[k] for r in stages), 3) for k in ("wall_sec", "cpu_sec", "thread_cpu_sec", "audio_sec")}
+    total["chars"] = sum(r["chars"] for r in stages if r["stage"] in SYNTH_STAGES)
+    total["peak_rss_mb"] = max((r["peak_rss_mb"] for r in stages), default=0.0)
+    return {"episode_id": episode_id, "total": total, "stages": stages}
+
+def _synth_chars():
+    return func.sum(case((JobStats.stage.in_(SYNTH_STAGES), JobStats.chars), else_=0))
+
+def usage(days: int = 30, user_id: Optional[int] = None) -> List[Dict]:
+    """Totales por usuario y por día (UTC) de los últimos `days` días."""
+    day = func.date(JobStats.created_at)
+    stmt = select(
+        JobStats.user_id, day, func.count(func.distinct(JobStats.episode_id)),
+        func.sum(JobStats.wall_sec), func.sum(JobStats.cpu_sec), func.max(JobStats.peak_rss_mb),
+        _synth_chars(), func.sum(JobStats.audio_sec),
+        func.count(func.distinct(JobStats.episode_id)).filter(JobStats.status != "ok"),
+    ).where(JobStats.created_at >= datetime.utcnow() - timedelta(days=days))
+    if user_id is not None:
+        stmt = stmt.where(JobStats.user_id == user_id)
+    stmt = stmt.group_by(JobStats.user_id, day).order_by(day.desc(), JobStats.user_id)
+    with get_session() as s:
+        rows = s.exec(stmt).all()
+    return [{
+        "user_id": uid, "day": d, "episodes": episodes, "failed_or_cancelled": failed,
+        "wall_sec": round(wall or 0, 1), "cpu_sec": round(cpu or 0, 1), "peak_rss_mb": peak or 0.0,
+        "chars": chars or 0, "audio_sec": round(audio or 0, 1),
+        # CPU por minuto de audio: la cifra para dimensionar máquinas
+        "cpu_sec_per_audio_min": round(cpu / audio * 60, 2) if audio else None,
+    } for uid, d, episodes, wall, cpu, peak, chars, audio, failed in rows]
+
+def outliers(factor: float = 10.0, days: int = 30) -> Dict:
+    """
+    Episodios cuyo costo (CPU por cada 1000 caracteres) es al menos `factor`
+    veces la mediana del período: PDFs patológicos (OCR masivo, texto basura...).
+    """
+    stmt = select(
+        JobStats.episode_id, JobStats.upload_id, func.sum(JobStats.cpu_sec), func.sum(JobStats.wall_sec),
+        _synth_chars(),
+    ).where(JobStats.created_at >= datetime.utcnow() - timedelta(days=days)).group_by(JobStats.episode_id, JobStats.upload_id)
+    with get_session() as s:
+        runs = [
+            {"episode_id": eid, "upload_id": uid, "cpu_sec": round(cpu, 2), "wall_sec": round(wall, 2), "chars": chars,
+             "cpu_ms_per_kchar": round(cpu / chars * 1e6, 1) if chars else None}
+            for eid, uid, cpu, wall, chars in s.exec(stmt).all()
+        ]
+        costs = [r["cpu_ms_per_kchar"] for r in runs if r["cpu_ms_per_kchar"] is not None]
+        median = statistics.median(costs) if costs else 0.0
+        flagged = sorted((r for r in runs if median and r["cpu_ms_per_kchar"] and r["cpu_ms_per_kchar"] >= factor * median),
+                         key=lambda r: -r["cpu_ms_per_kchar"])
+        names = {u.id: u.filename for u in s.exec(select(Upload).where(Upload.id.in_([r["upload_id"] for r in flagged]))).all()}
+    for r in flagged:
+        r["filename"] = names.get(r["upload_id"])
+        r["times_median"] = round(r["cpu_ms_per_kchar"] / median, 1)
+    return {"episodes": len(runs), "median_cpu_ms_per_kchar": median, "factor": factor, "outliers": flagged}
@@ -2,6 +2,8 @@ from sqlmodel import SQLModel, Field, Session, create_engine, select
 from typing import Optional
 from datetime import datetime
 
+from ..compression import CompressedText, compress_existing_rows
+
 engine = create_engine("sqlite:///app.db", echo=False)
 
 class User(SQLModel, table=True):
@@ -22,9 +24,9 @@ class PodcastScript(SQLModel, table=True):
     user_id: int = Field(index=True)
     upload_id: int
     title: str
-    raw_text: str  # Texto extraído del PDF
-    script_content: str  # Script generado por IA
-    script_sections: str  # JSON con las secciones del script
+    raw_text: str = Field(sa_type=CompressedText)  # Texto extraído del PDF
+    script_content: str = Field(sa_type=CompressedText)  # Script generado por IA
+    script_sections: str = Field(sa_type=CompressedText)  # JSON con las secciones del script
     target_minutes: int
     style: str
     voice: str
@@ -46,6 +48,7 @@ class Episode(SQLModel, table=True):
 
 def init_db():
     SQLModel.metadata.create_all(engine)
+    compress_existing_rows(engine, {"podcastscript": ["raw_text", "script_content", "script_sections"]})
 
 def get_session():
     return Session(engine)
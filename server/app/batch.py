@@ -0,0 +1,209 @@
+"""
+Conversión offline de PDFs a episodios, sin pasar por HTTP. Uso:
+
+    python -m app.batch cursos/fisica/
+    python -m app.batch "cursos/**/*.pdf" --workers 8 --target-minutes 15 --language es
+
+Cada PDF pasa por el mismo pipeline que /generate-script + /process
+(documento → secciones → guion completo → síntesis por sección) en un pool
+de procesos del tamaño de la máquina. Los archivos cuyo hash ya tiene un
+episodio listo se saltean; los resultados se registran como Upload/Episode
+del usuario indicado. Con KOKORO_SERVER_SOCKET los workers comparten el
+servidor de modelo en vez de cargar Kokoro cada uno.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from sqlmodel import select
+
+def _expand(inputs: List[str]) -> List[str]:
+    """Directorios (recursivo), globs o archivos sueltos → PDFs sin repetir, en orden."""
+    out: Dict[str, None] = {}
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, "**", "*.pdf"), recursive=True)
+        else:
+            matches = glob.glob(item, recursive=True) or ([item] if os.path.isfile(item) else [])
+        for path in sorted(matches):
+            if path.lower().endswith(".pdf"):
+                out[os.path.abspath(path)] = None
+    return list(out)
+
+def _init_worker(threads: int):
+    # Se lee al importar el proveedor; solo aplica si el worker carga Kokoro en el proceso
+    os.environ.setdefault("KOKORO_TORCH_THREADS", str(threads))
+
+def convert(pdf_path: str, content_hash: str, target_minutes: int, voice: Optional[str], lang_code: str) -> Dict:
+    """Corre en un worker: devuelve lo necesario para registrar el episodio (o `error`)."""
+    from .accounting import JobAccount
+    from .document import for_upload
+    from .kokoro_provider import synthesize, wav_to_pcm
+    from .paths import AUDIO_DIR
+    from .sections import create_full_script, sections_from_blocks
+    from .streaming import WavSink
+    from .summarize import INTRO, OUTRO
+
+    start = time.perf_counter()
+    wav_path = os.path.join(AUDIO_DIR, f"{uuid.uuid4()}.wav")
+    account = JobAccount()
+    try:
+        with account.stage("extract") as usage:
+            doc = for_upload(pdf_path, content_hash)
+            usage["chars"] = len(doc.text)
+        if not len(doc):
+            raise ValueError("No hay texto disponible para procesar")
+        with account.stage("script") as usage:
+            sections = sections_from_blocks(doc.blocks(), target_minutes, doc)
+            # El guion en una línea queda solo como transcripción; el audio va por sección
+            script = create_full_script(sections)
+            usage["chars"] = len(script)
+        parts = [("Introducción", INTRO.strip())]
+        for i, section in enumerate(sections):
+            transition = " Ahora pasemos al siguiente tema." if i < len(sections) - 1 else ""
+            parts.append((section["title"], section["content"] + transition))
+        parts.append(("Cierre", OUTRO.strip()))
+        with WavSink(wav_path) as sink, account.stage("synthesize") as usage:
+            for title, body in parts:
+                if not body.strip():
+                    continue
+                sink.mark(title)
+                usage["chars"] += len(body)
+                data, sr = synthesize(body, voice=voice, lang=lang_code)
+                pcm, sr = wav_to_pcm(data, sr)
+                if not pcm:
+                    raise RuntimeError("TTS no disponible")
+                sink.write(pcm, sr)
+                usage["audio_sec"] = sink.seconds
+    except Exception as e:
+        if os.path.exists(wav_path):
+            os.remove(wav_path)
+        return {"pdf_path": pdf_path, "error": str(e), "elapsed": time.perf_counter() - start}
+    return {
+        "pdf_path": pdf_path, "content_hash": content_hash, "wav_path": wav_path,
+        "seconds": sink.seconds, "sample_rate": sink.sample_rate, "chapters": sink.chapters(),
+        "transcript": script, "chars": len(doc.text), "elapsed": time.perf_counter() - start,
+        "boilerplate": doc.boilerplate, "stages": account.stages,
+    }
+
+def _converted_hashes() -> set:
+    from .db import Episode, Upload, get_session
+    with get_session() as s:
+        return set(s.exec(select(Upload.content_hash).join(Episode, Episode.upload_id == Upload.id)
+                          .where(Episode.status == "ready", Upload.content_hash != "")).all())
+
+def _register(result: Dict, user_id: int, voice: Optional[str], lang_code: str):
+    """Copia el PDF a UPLOAD_DIR (como /uploads), crea el Upload y el Episode listos y su forma de onda."""
+    from . import waveform
+    from .accounting import save_stages
+    from .db import Episode, Upload, get_session
+    from .paths import UPLOAD_DIR
+
+    filename = os.path.basename(result["pdf_path"])
+    path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{filename}")
+    shutil.copyfile(result["pdf_path"], path)
+    with get_session() as s:
+        up = Upload(user_id=user_id, filename=filename, path=path, content_hash=result["content_hash"])
+        s.add(up); s.commit(); s.refresh(up)
+        ep = Episode(user_id=user_id, upload_id=up.id, title=filename, voice=voice or "default", lang_code=lang_code,
+                     status="ready", audio_path=result["wav_path"], duration_sec=round(result["seconds"]),
+                     sample_rate=result["sample_rate"], transcript=result["transcript"],
+                     chapters_json=json.dumps(result["chapters"], ensure_ascii=False))
+        s.add(ep); s.commit(); s.refresh(ep)
+    save_stages(ep.id, result["stages"])
+    waveform.build(ep.id, result["wav_path"], result["chapters"])
+    return ep.id
+
+def run(inputs: List[str], workers: int, target_minutes: int = 10, voice: Optional[str] = None,
+        language: Optional[str] = None, user_id: int = 1, force: bool = False) -> Dict:
+    from .db import init_db
+    from .kokoro_provider import resolve_lang
+    from .script_cache import file_hash
+
+    init_db()
+    lang_code = resolve_lang(language, voice)
+    start = time.perf_counter()
+    files = _expand(inputs)
+    done = set() if force else _converted_hashes()
+    pending: Dict[str, str] = {}
+    skipped = 0
+    for path in files:
+        h = file_hash(path)
+        if h in done:
+            skipped += 1
+            print(f"= {path} (ya convertido)")
+        else:
+            pending[path] = h
+            done.add(h)
+
+    converted = failed = 0
+    audio_sec = work_sec = 0.0
+    chars = in_bytes = boilerplate_chars = 0
+    boilerplate_sec = 0.0
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # spawn: cada worker arranca limpio (torch no se lleva bien con fork)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(convert, path, h, target_minutes, voice, lang_code): path for path, h in pending.items()}
+        for fut in as_completed(futures):
+            try:
+                result = fut.result()
+            except Exception as e:
+                # Un worker caído (p. ej. sin memoria) rompe el pool: se cuentan sus archivos como fallidos
+                failed += 1
+                print(f"! {futures[fut]}: worker abortado ({e.__class__.__name__}: {e})")
+                continue
+            work_sec += result["elapsed"]
+            if "error" in result:
+                failed += 1
+                print(f"! {result['pdf_path']}: {result['error']}")
+                continue
+            episode_id = _register(result, user_id, voice, lang_code)
+            converted += 1
+            audio_sec += result["seconds"]
+            chars += result["chars"]
+            in_bytes += os.path.getsize(result["pdf_path"])
+            boilerplate_chars += result["boilerplate"].get("chars_removed", 0)
+            boilerplate_sec += result["boilerplate"].get("est_seconds_saved", 0.0)
+            print(f"+ {result['pdf_path']} → episodio {episode_id} ({result['seconds']:.0f} s de audio en {result['elapsed']:.1f} s)")
+
+    wall = time.perf_counter() - start
+    return {
+        "files": len(files), "converted": converted, "skipped": skipped, "failed": failed,
+        "workers": workers, "wall_sec": round(wall, 1),
+        "files_per_min": round(converted / wall * 60, 2) if wall else 0.0,
+        "mb_per_min": round(in_bytes / 1e6 / wall * 60, 2) if wall else 0.0,
+        "chars_per_sec": round(chars / wall) if wall else 0,
+        "audio_sec": round(audio_sec, 1),
+        "realtime_factor": round(audio_sec / wall, 2) if wall else 0.0,  # segundos de audio por segundo de reloj
+        "parallel_efficiency": round(work_sec / (wall * workers), 2) if wall else 0.0,
+        "boilerplate_chars_removed": boilerplate_chars,
+        "boilerplate_sec_saved": round(boilerplate_sec, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversión offline de PDFs a episodios")
+    parser.add_argument("inputs", nargs="+", help="directorios, globs o archivos PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--target-minutes", type=int, default=10)
+    parser.add_argument("--voice")
+    parser.add_argument("--language")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--force", action="store_true", help="convertir aunque el hash ya tenga episodio")
+    args = parser.parse_args()
+    try:
+        stats = run(args.inputs, max(1, args.workers), args.target_minutes, args.voice, args.language,
+                    args.user_id, args.force)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmarks de síntesis. Uso:
+
+    python -m app.bench coalesce --sizes 1,2,4,8 --segments 64 --clients 8 --replicas 2
+    python -m app.bench coalesce --fake   # sin Kokoro: modelo simulado
+    python -m app.bench chunks --sizes 100,200,400,800 [--text guion.txt] [--fake]
+
+`coalesce` reparte segmentos de varios clientes concurrentes entre las réplicas
+por la cola compartida (SynthesisCoalescer) y, para cada tamaño máximo de grupo,
+informa segmentos por segundo, la latencia por segmento (espera en la cola más
+síntesis) y el tamaño medio de grupo. Cada segmento se sintetiza por separado:
+el throughput lo fijan las réplicas, no el tamaño de grupo.
+`chunks` sintetiza el mismo texto empaquetado en segmentos de cada tamaño y
+compara el factor de tiempo real y la latencia hasta el primer audio.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+
+from . import kokoro_provider as kp
+from .coalescer import SynthesisCoalescer
+from .chunker import pack_sentences
+
+SAMPLE_TEXT = (
+    "La criptografía estudia técnicas para proteger la información. "
+    "Un algoritmo de cifrado transforma un mensaje legible en otro ilegible. "
+    "Las funciones hash resumen datos de cualquier tamaño en un valor fijo."
+)
+
+def _fake_group(_resource, _key, texts: List[str]) -> List[np.ndarray]:
+    # Como _run_group: costo fijo + costo por carácter por cada segmento, uno tras otro
+    time.sleep(sum(0.005 + 0.0002 * len(t) for t in texts))
+    return [np.zeros(len(t) * 400, dtype=np.float32) for t in texts]
+
+def bench_coalesce(sizes: List[int], segments: int, clients: int, replicas: int, fake: bool):
+    if fake:
+        resources, run_group = [None] * replicas, _fake_group
+    else:
+        kp.tune_threads(kp.KOKORO_TORCH_THREADS or max(1, (os.cpu_count() or 1) // replicas))
+        resources, run_group = [kp._new_pool() for _ in range(replicas)], kp._run_group
+    lang_code = kp.DEFAULT_LANG_CODE
+    voice = kp._voice_for(None, lang_code)
+    texts = [SAMPLE_TEXT] * segments
+
+    def timed(coalescer: SynthesisCoalescer, text: str):
+        t0 = time.perf_counter()
+        out = coalescer.submit((lang_code, voice, kp.KOKORO_SPEED), text).result()
+        return out, time.perf_counter() - t0
+
+    print(f"{'group':>6} {'seg/s':>8} {'audio s/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'avg group':>10}")
+    for size in sizes:
+        coalescer = SynthesisCoalescer(run_group, resources, max_group=size, max_wait_ms=kp.KOKORO_COALESCE_WAIT_MS)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = list(pool.map(lambda t: timed(coalescer, t), texts))
+        elapsed = time.perf_counter() - start
+        audio_sec = sum(len(o) for o, _ in results) / 24000
+        p50, p95 = np.percentile([lat for _, lat in results], [50, 95]) * 1000
+        stats = coalescer.stats()
+        print(f"{size:>6} {segments / elapsed:>8.2f} {audio_sec / elapsed:>10.2f} {p50:>8.0f} {p95:>8.0f} {stats['avg_group_size']:>10}")
+
+def _fake_segment(segment: str) -> np.ndarray:
+    # Costo fijo por llamada + lineal + un término cuadrático (atención) que castiga los segmentos largos
+    n = len(segment)
+    time.sleep(0.02 + 0.0003 * n + 2e-7 * n * n)
+    return np.zeros(n * kp.FAKE_SAMPLES_PER_CHAR, dtype=np.float32)
+
+def bench_chunks(sizes: List[int], text: str, fake: bool, warmup: bool = True):
+    lang_code = kp.DEFAULT_LANG_CODE
+    voice = kp._voice_for(None, lang_code)
+    if fake:
+        synth = _fake_segment
+    else:
+        kp.tune_threads()
+        kp._try_import()
+        if not kp.KOKORO_AVAILABLE:
+            raise SystemExit("Kokoro no disponible (usar --fake)")
+        pipeline = kp._pool.get(lang_code)
+
+        def synth(segment: str) -> np.ndarray:
+            arrs = list(kp._kokoro_segment(pipeline, segment, voice))
+            return np.concatenate(arrs) if arrs else np.zeros(0, dtype=np.float32)
+        if warmup:
+            synth(SAMPLE_TEXT)
+
+    print(f"{'chars':>6} {'segs':>5} {'avg':>6} {'first s':>8} {'RTF':>7} {'x real':>7}")
+    for size in sizes:
+        # Por encima del tope normal se deja pasar el tamaño pedido: se mide lo que hace el modelo
+        segments = list(pack_sentences(text, size, max(size, 2 * size)))
+        start = time.perf_counter()
+        first = None
+        samples = 0
+        for seg in segments:
+            samples += len(synth(seg))
+            if first is None:
+                first = time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+        audio_sec = samples / 24000
+        rtf = elapsed / audio_sec if audio_sec else float("inf")
+        avg = sum(len(s) for s in segments) / len(segments)
+        print(f"{size:>6} {len(segments):>5} {avg:>6.0f} {first:>8.2f} {rtf:>7.3f} {1 / rtf:>7.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de síntesis")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("coalesce", help="cola compartida entre réplicas: latencia por segmento vs. tamaño de grupo")
+    b.add_argument("--sizes", default="1,2,4,8")
+    b.add_argument("--segments", type=int, default=32)
+    b.add_argument("--clients", type=int, default=8)
+    b.add_argument("--replicas", type=int, default=1)
+    b.add_argument("--fake", action="store_true")
+    c = sub.add_parser("chunks", help="factor de tiempo real vs. tamaño de segmento")
+    c.add_argument("--sizes", default="100,200,300,400,500,800")
+    c.add_argument("--text", help="archivo de texto a sintetizar (por defecto, un texto de ejemplo repetido)")
+    c.add_argument("--repeat", type=int, default=20)
+    c.add_argument("--fake", action="store_true")
+    args = parser.parse_args()
+    if args.cmd == "coalesce":
+        bench_coalesce([int(x) for x in args.sizes.split(",")], args.segments, args.clients, args.replicas, args.fake)
+    elif args.cmd == "chunks":
+        if args.text:
+            with open(args.text, encoding="utf-8") as f:
+                text = f.read()
+        else:
+            text = " ".join([SAMPLE_TEXT] * args.repeat)
+        bench_chunks([int(x) for x in args.sizes.split(",")], text, args.fake)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import threading
+import time
+from typing import Optional
+
+class Cancelled(Exception):
+    """El trabajo se canceló (`reason` = "cancelled", "timeout", "disconnected"...)."""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+class CancelToken:
+    """
+    Cancelación cooperativa: quien hace el trabajo llama a `check()` entre
+    fragmentos y se corta con `Cancelled`. Con `start(timeout)` además vence
+    solo al pasar ese tiempo de reloj.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+        self.deadline: Optional[float] = None
+
+    def start(self, timeout_sec: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout_sec if timeout_sec else None
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("timeout")
+        return self._event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled(self.reason or "cancelled")
+
+def check(token: Optional[CancelToken]):
+    if token is not None:
+        token.check()
@@ -0,0 +1,118 @@
+"""
+Checkpoints de síntesis por episodio, en DATA_DIR/checkpoints/<episode_id>/:
+
+    job.json        parámetros del trabajo (para retomarlo en otro proceso)
+    segments.json   guion fijado en la primera corrida (modo resumen)
+    audio.part      header WAV provisorio + PCM de las unidades terminadas
+
+El manifiesto (unidades terminadas, muestras, capítulos) vive en
+Episode.checkpoint_json y se actualiza después de sincronizar el audio a disco,
+así lo que diga el manifiesto siempre está en el archivo; lo que sobre al final
+del archivo (una unidad a medio escribir) se trunca al retomar.
+"""
+import json
+import os
+import shutil
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from .paths import DATA_DIR
+from .streaming import WavSink
+
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join(DATA_DIR, "checkpoints"))
+WAV_HEADER_BYTES = 44
+
+def episode_dir(episode_id: int) -> str:
+    return os.path.join(CHECKPOINT_DIR, str(episode_id))
+
+def _write_json(path: str, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _read_json(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_job(episode_id: int, params: Dict):
+    os.makedirs(episode_dir(episode_id), exist_ok=True)
+    _write_json(os.path.join(episode_dir(episode_id), "job.json"), params)
+
+def load_job(episode_id: int) -> Optional[Dict]:
+    return _read_json(os.path.join(episode_dir(episode_id), "job.json"))
+
+def save_segments(episode_id: int, segments: List[Tuple[str, str]]):
+    os.makedirs(episode_dir(episode_id), exist_ok=True)
+    _write_json(os.path.join(episode_dir(episode_id), "segments.json"), segments)
+
+def load_segments(episode_id: int) -> Optional[List[Tuple[str, str]]]:
+    data = _read_json(os.path.join(episode_dir(episode_id), "segments.json"))
+    return [tuple(s) for s in data] if data is not None else None
+
+def discard(episode_id: int):
+    shutil.rmtree(episode_dir(episode_id), ignore_errors=True)
+
+def wav_header(samples: int, sample_rate: int) -> bytes:
+    """El mismo header PCM16 mono de 44 bytes que escribe `wave`."""
+    data = samples * 2
+    return (b"RIFF" + struct.pack("<I", 36 + data) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", data))
+
+class CheckpointSink(WavSink):
+    """
+    Como WavSink pero sobre `audio.part`, que sobrevive a un reinicio.
+    `units` es la cantidad de unidades (segmentos o fragmentos) ya confirmadas.
+    """
+
+    def __init__(self, episode_id: int, manifest: Optional[Dict] = None):
+        super().__init__(os.path.join(episode_dir(episode_id), "audio.part"))
+        os.makedirs(episode_dir(episode_id), exist_ok=True)
+        manifest = manifest or {}
+        self.units = manifest.get("units", 0)
+        self.samples = manifest.get("samples", 0)
+        self.sample_rate = manifest.get("sample_rate", 0)
+        self._marks = [tuple(m) for m in manifest.get("marks", [])]
+        resume = self.units > 0 and os.path.exists(self.path)
+        if not resume:
+            self.units = self.samples = 0
+            self._marks = []
+        self._f = open(self.path, "r+b" if resume else "wb")
+        if not resume:
+            self._f.write(b"\0" * WAV_HEADER_BYTES)
+        # Descarta lo escrito después del último checkpoint
+        self._f.truncate(WAV_HEADER_BYTES + self.samples * 2)
+        self._f.seek(0, os.SEEK_END)
+
+    @property
+    def last_title(self) -> Optional[str]:
+        return self._marks[-1][0] if self._marks else None
+
+    def write(self, pcm: bytes, sample_rate: int):
+        if not self.sample_rate:
+            self.sample_rate = sample_rate or 24000
+        self._f.write(pcm)
+        self.samples += len(pcm) // 2
+
+    def commit(self, units: int) -> Dict:
+        """Sincroniza el audio a disco y devuelve el manifiesto a guardar en el episodio."""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.units = units
+        return {"units": self.units, "samples": self.samples, "sample_rate": self.sample_rate,
+                "marks": [list(m) for m in self._marks]}
+
+    def finalize(self, wav_path: str):
+        """Escribe el header definitivo y mueve el WAV a su lugar."""
+        self._f.seek(0)
+        self._f.write(wav_header(self.samples, self.sample_rate or 24000))
+        self.close()
+        shutil.move(self.path, wav_path)
+
+    def close(self):
+        if self._f is not None and not self._f.closed:
+            self._f.close()
@@ -0,0 +1,73 @@
+"""
+Empaquetado de oraciones en segmentos para Kokoro. El modelo rinde mejor con
+entradas largas (el costo fijo por llamada se reparte) pero no acepta más de
+~510 tokens de fonemas; los guiones llegan en una sola línea, así que sin esto
+el pipeline recibe un único texto enorme y lo parte por su cuenta.
+
+`pack_sentences` junta oraciones completas hasta ~`KOKORO_CHUNK_CHARS` y solo
+corta una oración (por comas y luego por palabras) si supera
+`KOKORO_CHUNK_MAX_CHARS`. Es un generador: las oraciones se cortan con
+`document.SENTENCE_RE` (el mismo corte que el modelo de documento y la caché
+G2P) a medida que se consumen, así el primer segmento sale sin recorrer el
+resto del texto y la síntesis (o la cola de segmentos) puede empezar enseguida.
+El tamaño se mide en caracteres, que en español siguen de cerca a los fonemas;
+`python -m app.bench chunks` compara el factor de tiempo real por tamaño.
+"""
+import os
+import re
+from typing import Iterator, Optional
+
+from .document import SENTENCE_RE, normalize
+
+# Tamaño objetivo de cada segmento y tope duro (por debajo del límite de tokens del modelo)
+KOKORO_CHUNK_CHARS = int(os.getenv("KOKORO_CHUNK_CHARS", "400"))
+KOKORO_CHUNK_MAX_CHARS = int(os.getenv("KOKORO_CHUNK_MAX_CHARS", "500"))
+
+_CLAUSE_RE = re.compile(r"(?<=[,;:])\s+")
+
+def _pack(parts: Iterator[str], target: int) -> Iterator[str]:
+    current = ""
+    for part in parts:
+        if current and len(current) + len(part) + 1 > target:
+            yield current
+            current = ""
+        current = f"{current} {part}" if current else part
+    if current:
+        yield current
+
+def _split_long(sentence: str, max_chars: int) -> Iterator[str]:
+    """Parte una oración demasiado larga por cláusulas; las cláusulas largas, por palabras."""
+    for clause in _pack(_CLAUSE_RE.split(sentence), max_chars):
+        if len(clause) <= max_chars:
+            yield clause
+            continue
+        words = []
+        for word in clause.split(" "):
+            # Una "palabra" más larga que el tope (URLs, fórmulas) se corta a la fuerza
+            words.extend(word[i:i + max_chars] for i in range(0, len(word), max_chars))
+        yield from _pack(iter(words), max_chars)
+
+def _iter_sentences(text: str) -> Iterator[str]:
+    """Oraciones de `text` normalizadas una por una, sin partir ni copiar el texto entero."""
+    start = 0
+    for m in SENTENCE_RE.finditer(text):
+        yield normalize(text[start:m.start()])
+        start = m.end()
+    yield normalize(text[start:])
+
+def _sentences(text: str, max_chars: int) -> Iterator[str]:
+    for sentence in _iter_sentences(text):
+        if not sentence:
+            continue
+        if len(sentence) > max_chars:
+            yield from _split_long(sentence, max_chars)
+        else:
+            yield sentence
+
+def pack_sentences(text: str, target: int = KOKORO_CHUNK_CHARS, max_chars: Optional[int] = None) -> Iterator[str]:
+    """
+    Segmentos de oraciones completas de hasta ~`target` caracteres (uno más largo
+    solo si una oración sola lo supera), nunca más de `max_chars`.
+    """
+    max_chars = max(target, max_chars or KOKORO_CHUNK_MAX_CHARS)
+    return _pack(_sentences(text, max_chars), target)
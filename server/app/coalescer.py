@@ -0,0 +1,79 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Sequence
+
+# run_group(recurso, clave, textos) -> una salida por texto, en el mismo orden
+RunGroup = Callable[[Any, Hashable, List[str]], List[Any]]
+
+class SynthesisCoalescer:
+    """
+    Cola compartida de segmentos de trabajos concurrentes: cada réplica toma
+    hasta `max_group` segmentos pendientes (esperando como mucho `max_wait_ms` a
+    que lleguen más), los agrupa por clave (voz, velocidad) y los corre seguidos
+    con la voz ya cargada. No hay inferencia en lote: Kokoro sintetiza cada
+    segmento por separado, así que agrupar no multiplica el throughput; lo que
+    se gana es que los trabajos no compitan por un mismo pipeline y que ninguna
+    réplica quede ociosa mientras haya segmentos en cola.
+    Hay un hilo de inferencia por recurso (p. ej. una réplica del pipeline);
+    con un solo recurso no hay nada que repartir.
+    """
+
+    def __init__(self, run_group: RunGroup, resources: Sequence[Any], max_group: int = 8, max_wait_ms: int = 20):
+        self._run_group = run_group
+        self._queue: "queue.Queue" = queue.Queue()
+        self.max_group = max(1, max_group)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self._lock = threading.Lock()
+        self._groups = 0
+        self._items = 0
+        for i, res in enumerate(resources):
+            threading.Thread(target=self._loop, args=(res,), name=f"coalescer-{i}", daemon=True).start()
+
+    def submit(self, key: Hashable, text: str) -> Future:
+        fut: Future = Future()
+        self._queue.put((key, text, fut))
+        return fut
+
+    def _collect(self) -> List:
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_group:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _loop(self, resource: Any):
+        while True:
+            groups: Dict[Hashable, List] = defaultdict(list)
+            for key, text, fut in self._collect():
+                # Los futuros cancelados (trabajo abortado) no llegan al modelo
+                if fut.set_running_or_notify_cancel():
+                    groups[key].append((text, fut))
+            for key, items in groups.items():
+                with self._lock:
+                    self._groups += 1
+                    self._items += len(items)
+                try:
+                    outputs = self._run_group(resource, key, [t for t, _ in items])
+                    for (_, fut), out in zip(items, outputs):
+                        fut.set_result(out)
+                except Exception as e:
+                    for _, fut in items:
+                        fut.set_exception(e)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "groups": self._groups,
+                "segments": self._items,
+                "avg_group_size": round(self._items / self._groups, 2) if self._groups else 0.0,
+                "pending": self._queue.qsize(),
+            }
@@ -0,0 +1,254 @@
+"""
+Almacenamiento en frío de episodios. Uso:
+
+    python -m app.cold_storage              # una pasada con COLD_AFTER_DAYS
+    python -m app.cold_storage --days 7
+    python -m app.cold_storage --restore 42
+
+Los episodios listos que no se escuchan hace más de COLD_AFTER_DAYS días se
+pasan de WAV a FLAC (sin pérdida, ~50% del tamaño en voz). GET /audio restaura
+el WAV al primer acceso, así los rangos y los offsets de capítulos siguen
+siendo los del WAV. El FLAC guarda el mtime del WAV y la restauración se lo
+devuelve: el WAV restaurado tiene los mismos bytes y el mismo ETag (tamaño y
+mtime) que el original, y los clientes con If-Range/If-None-Match no lo bajan
+de nuevo. La conversión se verifica comparando el hash del PCM
+antes de borrar el original. Requiere el paquete opcional `soundfile`.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import wave
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import update
+from sqlmodel import select
+
+from . import waveform
+from .db import Episode, get_session
+
+try:
+    import soundfile  # type: ignore
+except ImportError:  # sin soundfile los episodios quedan en WAV
+    soundfile = None
+
+COLD_AFTER_DAYS = float(os.getenv("COLD_AFTER_DAYS", "30"))
+COLD_INTERVAL_SEC = int(os.getenv("COLD_INTERVAL_SEC", str(6 * 3600)))  # 0 = sin tarea en segundo plano
+# Los accesos se registran como mucho una vez por intervalo (los saltos del reproductor son muchos requests)
+ACCESS_TOUCH_SEC = int(os.getenv("ACCESS_TOUCH_SEC", "3600"))
+# Cuánto espera un pedido a que otro proceso termine de restaurar el mismo episodio
+# antes de darlo por muerto y restaurarlo él
+RESTORE_WAIT_SEC = float(os.getenv("COLD_RESTORE_WAIT_SEC", "120"))
+BLOCK_FRAMES = 64 * 1024
+
+_locks: Dict[int, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+def available() -> bool:
+    return soundfile is not None
+
+def _lock_for(episode_id: int) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(episode_id, threading.Lock())
+
+def _flac_pcm_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with soundfile.SoundFile(path) as f:
+        for block in f.blocks(blocksize=BLOCK_FRAMES, dtype="int16"):
+            h.update(block.tobytes())
+    return h.hexdigest()
+
+def _copy_mtime(src: str, dst: str):
+    # El ETag de media.serve_file sale del tamaño y el mtime: se conserva el del WAV original
+    st = os.stat(src)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+def wav_to_flac(wav_path: str, flac_path: str):
+    """Convierte en bloques (memoria constante) y verifica que el PCM decodificado sea idéntico."""
+    h = hashlib.sha256()
+    tmp = f"{flac_path}.{uuid.uuid4().hex}.tmp"
+    with wave.open(wav_path, "rb") as wf, soundfile.SoundFile(
+        tmp, "w", samplerate=wf.getframerate(), channels=wf.getnchannels(), subtype="PCM_16", format="FLAC"
+    ) as out:
+        channels = wf.getnchannels()
+        while True:
+            frames = wf.readframes(BLOCK_FRAMES)
+            if not frames:
+                break
+            h.update(frames)
+            out.write(np.frombuffer(frames, dtype="<i2").reshape(-1, channels))
+    if _flac_pcm_hash(tmp) != h.hexdigest():
+        os.remove(tmp)
+        raise RuntimeError(f"FLAC verification failed for {wav_path}")
+    _copy_mtime(wav_path, tmp)
+    os.replace(tmp, flac_path)
+
+def flac_to_wav(flac_path: str, wav_path: str):
+    # Nombre único: otro proceso puede estar restaurando el mismo archivo
+    tmp = f"{wav_path}.{uuid.uuid4().hex}.tmp"
+    with soundfile.SoundFile(flac_path) as f, wave.open(tmp, "wb") as wf:
+        wf.setnchannels(f.channels)
+        wf.setsampwidth(2)
+        wf.setframerate(f.samplerate)
+        for block in f.blocks(blocksize=BLOCK_FRAMES, dtype="int16"):
+            wf.writeframes(block.astype("<i2").tobytes())
+    _copy_mtime(flac_path, tmp)
+    os.replace(tmp, wav_path)
+
+def _claim(episode_id: int, expected: str, claimed: str) -> bool:
+    """Cambia `storage` solo si sigue en `expected` (evita que dos workers conviertan lo mismo)."""
+    with get_session() as s:
+        result = s.exec(update(Episode).where(Episode.id == episode_id, Episode.storage == expected).values(storage=claimed))
+        s.commit()
+        return result.rowcount == 1
+
+def transcode_episode(episode_id: int) -> Optional[int]:
+    """Pasa el episodio a FLAC; devuelve los bytes ahorrados o None si no correspondía."""
+    if not _claim(episode_id, "wav", "transcoding"):
+        return None
+    with _lock_for(episode_id):
+        with get_session() as s:
+            e = s.get(Episode, episode_id)
+            wav_path, chapters = e.audio_path, json.loads(e.chapters_json or "[]")
+        flac_path = os.path.splitext(wav_path)[0] + ".flac"
+        try:
+            # La forma de onda se saca del WAV antes de enfriarlo: pedirla no debe restaurarlo
+            waveform.ensure(episode_id, wav_path, chapters)
+            wav_to_flac(wav_path, flac_path)
+        except Exception as ex:
+            print(f"Cold storage: episode {episode_id} stays as WAV: {ex}")
+            _claim(episode_id, "transcoding", "wav")
+            return None
+        saved = os.path.getsize(wav_path) - os.path.getsize(flac_path)
+        with get_session() as s:
+            e = s.get(Episode, episode_id)
+            e.audio_path, e.storage = flac_path, "flac"
+            s.add(e); s.commit()
+        os.remove(wav_path)
+        return saved
+
+def _episode_storage(episode_id: int):
+    with get_session() as s:
+        e = s.get(Episode, episode_id)
+        return e.storage, e.audio_path
+
+def ensure_wav(episode_id: int) -> str:
+    """
+    Ruta del WAV del episodio, restaurándolo desde FLAC si está en frío. La
+    restauración se reclama en la base (flac → restoring) como la conversión,
+    así entre varios workers de uvicorn la hace uno solo y el resto espera.
+    """
+    with _lock_for(episode_id):
+        deadline = time.monotonic() + RESTORE_WAIT_SEC
+        while True:
+            storage, path = _episode_storage(episode_id)
+            # Mientras se convierte a FLAC el WAV sigue en su lugar
+            if storage in ("wav", "transcoding"):
+                return path
+            if storage == "flac" and _claim(episode_id, "flac", "restoring"):
+                break
+            if storage == "restoring" and time.monotonic() > deadline:
+                print(f"Cold storage: restore of episode {episode_id} looks stalled, taking over")
+                break
+            time.sleep(0.2)
+        flac_path = path
+        wav_path = os.path.splitext(flac_path)[0] + ".wav"
+        try:
+            flac_to_wav(flac_path, wav_path)
+        except Exception:
+            storage, path = _episode_storage(episode_id)
+            if storage == "wav":  # lo terminó otro mientras tanto
+                return path
+            _claim(episode_id, "restoring", "flac")
+            raise
+        with get_session() as s:
+            s.exec(update(Episode).where(Episode.id == episode_id).values(audio_path=wav_path, storage="wav"))
+            s.commit()
+        if os.path.exists(flac_path):
+            os.remove(flac_path)
+        print(f"Cold storage: restored episode {episode_id}")
+        return wav_path
+
+def open_audio(episode_id: int, attempts: int = 3):
+    """
+    Audio del episodio abierto para leer, en el formato en que esté (WAV o FLAC),
+    o None si no hay. Un archivo abierto sigue legible aunque después se borre
+    al pasarlo a FLAC o al restaurarlo; si se borra entre leer la fila y abrirlo,
+    se vuelve a leer la fila.
+    """
+    for _ in range(attempts):
+        with get_session() as s:
+            e = s.get(Episode, episode_id)
+            path = e.audio_path if e else ""
+        if not path:
+            return None
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            time.sleep(0.2)
+    return None
+
+def touch(episode: Episode):
+    """Registra el acceso (acotado a uno por ACCESS_TOUCH_SEC)."""
+    now = datetime.utcnow()
+    if episode.last_accessed_at and (now - episode.last_accessed_at).total_seconds() < ACCESS_TOUCH_SEC:
+        return
+    with get_session() as s:
+        s.exec(update(Episode).where(Episode.id == episode.id).values(last_accessed_at=now))
+        s.commit()
+
+def run_maintenance(days: float = COLD_AFTER_DAYS) -> Dict:
+    """Una pasada: convierte a FLAC los episodios listos sin acceso en `days` días."""
+    if not available():
+        return {"transcoded": 0, "saved_bytes": 0, "skipped": "soundfile no instalado"}
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    with get_session() as s:
+        ids = s.exec(select(Episode.id).where(
+            Episode.status == "ready", Episode.storage == "wav",
+            (Episode.last_accessed_at < cutoff) | (Episode.last_accessed_at.is_(None) & (Episode.created_at < cutoff)),
+        )).all()
+    transcoded = saved = 0
+    for episode_id in ids:
+        result = transcode_episode(episode_id)
+        if result is not None:
+            transcoded += 1
+            saved += result
+    if transcoded:
+        print(f"Cold storage: {transcoded} episodes to FLAC, {saved / 1e6:.1f} MB saved")
+    return {"transcoded": transcoded, "saved_bytes": saved}
+
+def _loop(interval: int):
+    while True:
+        try:
+            run_maintenance()
+        except Exception as e:
+            print(f"Cold storage maintenance error: {e}")
+        time.sleep(interval)
+
+def start_background(interval: int = COLD_INTERVAL_SEC):
+    if interval <= 0:
+        return
+    if not available():
+        print("Cold storage disabled: install `soundfile` to transcode old episodes to FLAC")
+        return
+    threading.Thread(target=_loop, args=(interval,), name="cold-storage", daemon=True).start()
+
+def main():
+    parser = argparse.ArgumentParser(description="Almacenamiento en frío de episodios (WAV → FLAC)")
+    parser.add_argument("--days", type=float, default=COLD_AFTER_DAYS)
+    parser.add_argument("--restore", type=int, help="restaurar a WAV el episodio indicado")
+    args = parser.parse_args()
+    if not available():
+        raise SystemExit("Instalar `soundfile` para usar el almacenamiento en frío")
+    if args.restore is not None:
+        print(ensure_wav(args.restore))
+    else:
+        print(run_maintenance(args.days))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import zlib
+from typing import Dict, List, Union
+
+from sqlalchemy import text
+from sqlalchemy.types import Text, TypeDecorator
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # zstd es opcional; zlib siempre está disponible
+    zstandard = None
+
+# Los textos por encima del umbral se guardan comprimidos como BLOB con un
+# prefijo que indica el códec; los cortos quedan como TEXT legible.
+COMPRESS_MIN_BYTES = int(os.getenv("DB_COMPRESS_MIN_BYTES", "2048"))
+COMPRESS_CODEC = os.getenv("DB_COMPRESS_CODEC", "zstd" if zstandard else "zlib")
+_ZLIB = b"\x00z1"
+_ZSTD = b"\x00zs"
+
+def compress_text(value: str) -> Union[str, bytes]:
+    raw = value.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return value
+    if COMPRESS_CODEC == "zstd" and zstandard is not None:
+        return _ZSTD + zstandard.ZstdCompressor(level=6).compress(raw)
+    return _ZLIB + zlib.compress(raw, 6)
+
+def decompress_text(value: Union[str, bytes, None]) -> Union[str, None]:
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value.startswith(_ZSTD):
+        if zstandard is None:
+            raise RuntimeError("Columna comprimida con zstd: instalar `zstandard`")
+        return zstandard.ZstdDecompressor().decompress(value[len(_ZSTD):]).decode("utf-8")
+    if value.startswith(_ZLIB):
+        return zlib.decompress(value[len(_ZLIB):]).decode("utf-8")
+    return value.decode("utf-8")
+
+class CompressedText(TypeDecorator):
+    """Columna de texto que se comprime de forma transparente (zstd o zlib)."""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+def compress_existing_rows(engine, columns: Dict[str, List[str]]) -> int:
+    """
+    Migración: comprime las filas guardadas antes de usar CompressedText.
+    Es idempotente (solo toca valores TEXT por encima del umbral) y hace VACUUM
+    si cambió algo, para que el archivo de la base efectivamente se achique.
+    """
+    changed = 0
+    with engine.begin() as conn:
+        existing = {r[0] for r in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type='table'")}
+        for table, cols in columns.items():
+            if table not in existing:
+                continue
+            for col in cols:
+                rows = conn.execute(
+                    text(f"SELECT id, {col} FROM {table} WHERE typeof({col}) = 'text' AND length({col}) >= :n"),
+                    {"n": COMPRESS_MIN_BYTES},
+                ).fetchall()
+                for row_id, value in rows:
+                    packed = compress_text(value)
+                    if isinstance(packed, bytes):
+                        conn.execute(text(f"UPDATE {table} SET {col} = :v WHERE id = :id"), {"v": packed, "id": row_id})
+                        changed += 1
+    if changed:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+        print(f"Compressed {changed} text values")
+    return changed
@@ -1,8 +1,11 @@
 from sqlmodel import SQLModel, Field, Session, create_engine
+import os
 from typing import Optional
 from datetime import datetime
 
-engine = create_engine("sqlite:///app.db", echo=False)
+from .compression import CompressedText, compress_existing_rows
+
+engine = create_engine(os.getenv("DATABASE_URL", "sqlite:///app.db"), echo=False)
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -15,14 +18,25 @@ class Upload(SQLModel, table=True):
     user_id: int = Field(index=True)
     filename: str
     path: str
+    content_hash: str = Field(default="", index=True)  # sha256 del archivo subido
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Draft(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(index=True)
     upload_id: int = Field(index=True)
-    raw_text: str = ""
-    refined_text: str = ""
+    raw_text: str = Field(default="", sa_type=CompressedText)
+    refined_text: str = Field(default="", sa_type=CompressedText)  # solo borradores sin secciones (anteriores a DraftSection)
+    version: int = 0  # concurrencia optimista: cada guardado la incrementa
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class DraftSection(SQLModel, table=True):
+    """Una sección `## ...` del texto refinado; se guardan por separado para editar de a una."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    draft_id: int = Field(index=True)
+    position: int
+    title: str = ""
+    content: str = Field(default="", sa_type=CompressedText)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Episode(SQLModel, table=True):
@@ -33,12 +47,59 @@ class Episode(SQLModel, table=True):
     voice: str
     lang_code: str
     duration_sec: int = 0
-    status: str = Field(default="pending")  # pending|ready|error
+    status: str = Field(default="pending")  # pending|processing|ready|error|cancelled
     audio_path: str = ""
+    sample_rate: int = 0
+    chapters_json: str = ""  # [{"title", "start_sample", "start_sec"}]
+    transcript: str = Field(default="", sa_type=CompressedText)  # guion sintetizado, en markdown
+    storage: str = "wav"  # wav|transcoding|flac|restoring (ver cold_storage.py)
+    last_accessed_at: Optional[datetime] = None
+    checkpoint_json: str = ""  # manifiesto de la síntesis en curso (ver checkpoint.py)
+    heartbeat_at: Optional[datetime] = None  # lo renueva el proceso dueño del trabajo
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class JobStats(SQLModel, table=True):
+    """Recursos de una etapa de un trabajo de síntesis (ver accounting.py)."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    episode_id: int = Field(index=True)
+    upload_id: int = Field(index=True)
+    user_id: int = Field(index=True)
+    stage: str  # extract|script|synthesize|stream
+    status: str = "ok"  # resultado del trabajo: ok|error|cancelled
+    wall_sec: float = 0.0
+    cpu_sec: float = 0.0  # CPU del proceso durante la etapa (incluye hilos de torch y OCR)
+    thread_cpu_sec: float = 0.0  # CPU del hilo del trabajo
+    peak_rss_mb: float = 0.0
+    chars: int = 0
+    audio_sec: float = 0.0
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+def _sql_literal(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return "NULL"
+
+def _add_missing_columns():
+    """create_all no modifica tablas existentes: agrega las columnas nuevas de cada modelo."""
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                default = col.default.arg if col.default is not None and col.default.is_scalar else None
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(dialect=engine.dialect)} DEFAULT {_sql_literal(default)}"
+                conn.exec_driver_sql(ddl)
+                print(f"Added column {table.name}.{col.name}")
+
 def init_db():
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    compress_existing_rows(engine, {"draft": ["raw_text", "refined_text"], "draftsection": ["content"]})
 
 def get_session():
     return Session(engine)
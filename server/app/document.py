@@ -0,0 +1,152 @@
+"""
+Modelo de documento compartido: texto normalizado (un párrafo o título por
+línea, espacios colapsados) más tablas de offsets en arrays de numpy para
+párrafos y oraciones. Se calcula una vez por upload con una sola pasada de
+regex, se guarda en DOC_DIR/<hash>.npz y lo consumen el resumen, el refinado y
+el seccionado sin volver a normalizar ni a partir el texto.
+"""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .paths import DATA_DIR
+
+DOC_VERSION = 3  # subir si cambia la extracción, la normalización o el corte de oraciones
+DOC_DIR = os.getenv("DOC_CACHE_DIR", os.path.join(DATA_DIR, "documents"))
+# Quita encabezados, pies y números de página repetidos antes de seccionar (ver pdf_extract.BoilerplateFilter)
+STRIP_BOILERPLATE = os.getenv("STRIP_BOILERPLATE", "1") != "0"
+DOC_MEMORY_CACHE = int(os.getenv("DOC_MEMORY_CACHE", "8"))
+
+# Única definición del corte de oraciones (la reutilizan summarize, refine, chunker y g2p_cache)
+SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+# Sobre el texto normalizado los separadores son un espacio o el salto entre párrafos
+_BOUNDARY_RE = re.compile(r"(?<=[.!?…]) |\n")
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+def block_sentences(block: Dict, doc: Optional["Document"] = None) -> List[str]:
+    """Oraciones de un bloque: por offsets si viene del documento, si no con SENTENCE_RE."""
+    if doc is not None and "index" in block:
+        return doc.sentences(block["index"])
+    return [s for s in SENTENCE_RE.split(normalize(block["text"])) if s]
+
+class Document:
+    def __init__(self, text: str, para_starts: np.ndarray, para_ends: np.ndarray, para_levels: np.ndarray,
+                 sent_starts: np.ndarray, sent_ends: np.ndarray, boilerplate: Optional[Dict] = None):
+        self.text = text
+        self.para_starts = para_starts
+        self.para_ends = para_ends
+        self.para_levels = para_levels  # 0 = párrafo, n = título de nivel n
+        self.sent_starts = sent_starts
+        self.sent_ends = sent_ends
+        self.boilerplate = boilerplate or {}  # lo quitado en la extracción (BoilerplateFilter.report)
+        # Primera oración de cada párrafo (+ total al final): las oraciones del párrafo i
+        # son first_sentence[i]:first_sentence[i + 1]
+        self.first_sentence = np.append(np.searchsorted(sent_starts, para_starts), len(sent_starts)).astype(np.int32)
+
+    @classmethod
+    def from_blocks(cls, blocks: List[Dict]) -> "Document":
+        """A partir de los bloques de extract_structure / blocks_from_text."""
+        paras = [(normalize(b["text"]), b["level"] if b["type"] == "heading" else 0) for b in blocks]
+        paras = [(t, lvl) for t, lvl in paras if t]
+        text = "\n".join(t for t, _ in paras)
+        lengths = np.fromiter((len(t) for t, _ in paras), dtype=np.int64, count=len(paras))
+        para_ends = np.cumsum(lengths + 1) - 1
+        para_starts = para_ends - lengths
+        levels = np.fromiter((lvl for _, lvl in paras), dtype=np.int8, count=len(paras))
+
+        bounds = np.fromiter((p for m in _BOUNDARY_RE.finditer(text) for p in m.span()), dtype=np.int64)
+        sent_starts = np.concatenate(([0], bounds[1::2])) if text else np.zeros(0, dtype=np.int64)
+        sent_ends = np.concatenate((bounds[0::2], [len(text)])) if text else np.zeros(0, dtype=np.int64)
+        return cls(text, para_starts.astype(np.int32), para_ends.astype(np.int32), levels,
+                   sent_starts.astype(np.int32), sent_ends.astype(np.int32))
+
+    @classmethod
+    def from_text(cls, text: str) -> "Document":
+        """Texto plano o markdown (los "#" son títulos), como blocks_from_text."""
+        from .sections import blocks_from_text
+        return cls.from_blocks(blocks_from_text(text))
+
+    def __len__(self) -> int:
+        return len(self.para_starts)
+
+    def paragraph(self, i: int) -> str:
+        return self.text[self.para_starts[i]:self.para_ends[i]]
+
+    def sentences(self, i: Optional[int] = None) -> List[str]:
+        """Oraciones del párrafo `i` (o de todo el documento), por offsets, sin regex."""
+        if i is None:
+            lo, hi = 0, len(self.sent_starts)
+        else:
+            lo, hi = self.first_sentence[i], self.first_sentence[i + 1]
+        text, starts, ends = self.text, self.sent_starts[lo:hi].tolist(), self.sent_ends[lo:hi].tolist()
+        return [text[a:b] for a, b in zip(starts, ends)]
+
+    def blocks(self) -> List[Dict]:
+        """Bloques como los de extract_structure, con `index` para pedir sus oraciones."""
+        text = self.text
+        return [
+            {"type": "heading" if lvl else "paragraph", "level": lvl, "text": text[a:b], "index": i}
+            for i, (a, b, lvl) in enumerate(zip(self.para_starts.tolist(), self.para_ends.tolist(), self.para_levels.tolist()))
+        ]
+
+    def raw_text(self) -> str:
+        return self.text.replace("\n", "\n\n")
+
+    def save(self, path: str):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp, text=np.frombuffer(self.text.encode("utf-8"), dtype=np.uint8),
+                 para_starts=self.para_starts, para_ends=self.para_ends, para_levels=self.para_levels,
+                 sent_starts=self.sent_starts, sent_ends=self.sent_ends,
+                 boilerplate=np.frombuffer(json.dumps(self.boilerplate).encode("utf-8"), dtype=np.uint8))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Document":
+        with np.load(path) as z:
+            return cls(z["text"].tobytes().decode("utf-8"), z["para_starts"], z["para_ends"], z["para_levels"],
+                       z["sent_starts"], z["sent_ends"], json.loads(z["boilerplate"].tobytes() or b"{}"))
+
+_loaded: "OrderedDict[str, Document]" = OrderedDict()
+_lock = threading.Lock()
+
+def _remember(key: str, doc: Document):
+    with _lock:
+        _loaded[key] = doc
+        _loaded.move_to_end(key)
+        while len(_loaded) > DOC_MEMORY_CACHE:
+            _loaded.popitem(last=False)
+
+def for_upload(pdf_path: str, content_hash: str, on_page: Optional[Callable[[int, int], None]] = None) -> Document:
+    """
+    Documento del upload: de memoria, del .npz guardado o, la primera vez,
+    extrayendo el PDF (con OCR de las páginas escaneadas) y guardándolo.
+    Sin Tesseract las páginas escaneadas quedan vacías: ese resultado se guarda
+    con otra clave, así se vuelve a extraer cuando el OCR esté disponible.
+    """
+    from .ocr import tesseract_available
+    key = content_hash if tesseract_available() else f"{content_hash}-noocr"
+    with _lock:
+        doc = _loaded.get(key)
+        if doc is not None:
+            _loaded.move_to_end(key)
+            return doc
+    path = os.path.join(DOC_DIR, f"{key}-v{DOC_VERSION}{'' if STRIP_BOILERPLATE else '-raw'}.npz")
+    if os.path.exists(path):
+        doc = Document.load(path)
+    else:
+        from .pdf_extract import BoilerplateFilter, extract_structure
+        boilerplate = BoilerplateFilter() if STRIP_BOILERPLATE else None
+        doc = Document.from_blocks(extract_structure(pdf_path, ocr=True, on_page=on_page, boilerplate=boilerplate))
+        if boilerplate is not None:
+            doc.boilerplate = boilerplate.report()
+        os.makedirs(DOC_DIR, exist_ok=True)
+        doc.save(path)
+    _remember(key, doc)
+    return doc
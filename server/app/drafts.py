@@ -0,0 +1,119 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from .db import Draft, DraftSection
+
+# El texto refinado se parte en los títulos `## ...`; lo previo (título `# ...`) es la sección 0
+_SECTION_RE = re.compile(r"^## ", re.M)
+
+class VersionConflict(Exception):
+    def __init__(self, current: int):
+        super().__init__(f"El borrador cambió (versión actual {current})")
+        self.current = current
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """[(título, contenido)] con el contenido en markdown, incluida su línea `## título`."""
+    starts = [m.start() for m in _SECTION_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    out = []
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        chunk = text[start:end].strip()
+        if chunk or not out:
+            out.append((_title_of(chunk), chunk))
+    return out
+
+def _title_of(content: str) -> str:
+    first = content.split("\n", 1)[0]
+    return first[3:].strip() if first.startswith("## ") else ""
+
+def join_sections(contents: List[str]) -> str:
+    return "\n\n".join(c for c in contents if c)
+
+def _rows(s: Session, draft_id: int) -> List[DraftSection]:
+    return list(s.exec(select(DraftSection).where(DraftSection.draft_id == draft_id).order_by(DraftSection.position)).all())
+
+def sections(s: Session, draft: Draft) -> List[DraftSection]:
+    """Secciones del borrador; los borradores viejos se parten en el primer acceso."""
+    rows = _rows(s, draft.id)
+    if not rows and draft.refined_text:
+        rows = _insert(s, draft.id, split_sections(draft.refined_text), 0)
+        draft.refined_text = ""
+        s.add(draft); s.commit()
+        for row in rows:
+            s.refresh(row)
+    return rows
+
+def draft_text(s: Session, draft: Draft) -> str:
+    """Materializa el texto refinado completo a partir de las secciones."""
+    rows = _rows(s, draft.id)
+    return join_sections([r.content for r in rows]) if rows else draft.refined_text
+
+def _insert(s: Session, draft_id: int, parts: List[Tuple[str, str]], first: int) -> List[DraftSection]:
+    rows = [DraftSection(draft_id=draft_id, position=first + i, title=t, content=c) for i, (t, c) in enumerate(parts)]
+    s.add_all(rows)
+    return rows
+
+def _bump(s: Session, draft_id: int, expected: Optional[int]) -> int:
+    """Incrementa la versión solo si sigue siendo `expected` (UPDATE condicional, sin carrera)."""
+    stmt = update(Draft).where(Draft.id == draft_id).values(version=Draft.version + 1, updated_at=datetime.utcnow())
+    if expected is not None:
+        stmt = stmt.where(Draft.version == expected)
+    if s.exec(stmt).rowcount == 0:
+        s.rollback()
+        raise VersionConflict(s.get(Draft, draft_id).version)
+    return s.get(Draft, draft_id, populate_existing=True).version
+
+def create(s: Session, user_id: int, upload_id: int, raw_text: str, refined_text: str) -> Draft:
+    d = Draft(user_id=user_id, upload_id=upload_id, raw_text=raw_text)
+    s.add(d); s.commit(); s.refresh(d)
+    _insert(s, d.id, split_sections(refined_text), 0)
+    s.commit()
+    return d
+
+def replace_text(s: Session, draft: Draft, text: str, expected: Optional[int] = None) -> Dict:
+    """
+    Reemplazo completo (PUT): solo se reescriben las secciones que cambiaron;
+    las que sobran se borran y las nuevas se agregan al final.
+    """
+    rows = sections(s, draft)
+    parts = split_sections(text)
+    version = _bump(s, draft.id, expected)
+    written = 0
+    for row, (title, content) in zip(rows, parts):
+        if row.content != content or row.title != title:
+            row.title, row.content, row.updated_at = title, content, datetime.utcnow()
+            s.add(row)
+            written += 1
+    for row in rows[len(parts):]:
+        s.delete(row)
+    if len(parts) > len(rows):
+        written += len(_insert(s, draft.id, parts[len(rows):], len(rows)))
+    s.commit()
+    return {"version": version, "sections_written": written, "sections_deleted": max(0, len(rows) - len(parts))}
+
+def update_section(s: Session, draft: Draft, section_id: int, content: str, expected: int) -> DraftSection:
+    """
+    Reescribe una sola sección si la versión del borrador coincide con `expected`.
+    El contenido tiene que volver a partirse en exactamente esa sección (si no,
+    ValueError): sin `## ` intermedios y, salvo la primera, con su título `## `.
+    """
+    sections(s, draft)
+    row = s.get(DraftSection, section_id)
+    if not row or row.draft_id != draft.id:
+        raise LookupError("Sección no encontrada")
+    content = content.strip()
+    if not content:
+        raise ValueError("La sección no puede quedar vacía")
+    if len(split_sections(content)) != 1:
+        raise ValueError("El contenido tiene más de un título `## `; editar el borrador completo")
+    if row.position > 0 and not content.startswith("## "):
+        raise ValueError("La sección tiene que empezar con su título `## `")
+    _bump(s, draft.id, expected)
+    row.title, row.content, row.updated_at = _title_of(content), content, datetime.utcnow()
+    s.add(row); s.commit(); s.refresh(row)
+    return row
@@ -0,0 +1,80 @@
+"""
+Exportación de varios episodios en un ZIP armado al vuelo. El audio va sin
+recomprimir (ZIP_STORED) y el archivo se escribe sobre un buffer no seekable
+que se vacía después de cada bloque, así la memoria es constante aunque el
+ZIP pese varios GB (zipfile usa data descriptors y ZIP64 cuando hace falta).
+"""
+import json
+import os
+import re
+import zipfile
+from typing import Dict, Iterator, List
+
+from .media import CHUNK_SIZE
+
+# Cada episodio exportado tiene su archivo abierto mientras sale el ZIP
+EXPORT_MAX_EPISODES = int(os.getenv("EXPORT_MAX_EPISODES", "200"))
+
+class _Pipe:
+    """Destino de solo escritura para zipfile; `drain()` devuelve lo escrito desde la última vez."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+def _safe_name(title: str) -> str:
+    return re.sub(r"[^\w\- ]+", "", title, flags=re.UNICODE).strip()[:80] or "episodio"
+
+def entries_for(episodes: List[Dict]) -> List[Dict]:
+    """Nombres únicos dentro del ZIP para cada episodio (`NN - título.ext`)."""
+    out = []
+    for n, e in enumerate(episodes, 1):
+        base = f"{n:02d} - {_safe_name(e['title'])}"
+        ext = os.path.splitext(e["audio"].name)[1] or ".wav"
+        out.append(dict(e, file=base + ext, transcript_file=base + ".md" if e.get("transcript") else None))
+    return out
+
+def iter_zip(episodes: List[Dict]) -> Iterator[bytes]:
+    """
+    `episodes`: dicts con id, title, audio (archivo ya abierto, que se cierra
+    acá), created_at, duration_sec, sample_rate, chapters y transcript. Agrega
+    un `manifest.json` al final.
+    """
+    pipe = _Pipe()
+    entries = entries_for(episodes)
+    try:
+        with zipfile.ZipFile(pipe, "w") as zf:
+            for e in entries:
+                info = zipfile.ZipInfo(e["file"], date_time=e["created_at"].timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                # Con el tamaño conocido zipfile decide solo si la entrada necesita ZIP64
+                info.file_size = os.fstat(e["audio"].fileno()).st_size
+                with e["audio"] as src, zf.open(info, "w") as dst:
+                    for block in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        dst.write(block)
+                        yield pipe.drain()
+                yield pipe.drain()
+                if e["transcript_file"]:
+                    zf.writestr(e["transcript_file"], e["transcript"], compress_type=zipfile.ZIP_DEFLATED)
+            manifest = {"episodes": [
+                {"id": e["id"], "title": e["title"], "file": e["file"], "transcript": e["transcript_file"],
+                 "duration_sec": e["duration_sec"], "sample_rate": e["sample_rate"], "chapters": e["chapters"]}
+                for e in entries
+            ]}
+            zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+        yield pipe.drain()
+    finally:
+        # Si el cliente corta antes, los que no llegaron a copiarse se cierran igual
+        for e in entries:
+            e["audio"].close()
@@ -0,0 +1,113 @@
+import copy
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .document import SENTENCE_RE
+from .paths import DATA_DIR
+
+# Caché de grafema→fonema: LRU en memoria + tabla SQLite opcional que sobrevive reinicios
+G2P_CACHE_SIZE = int(os.getenv("G2P_CACHE_SIZE", "20000"))
+G2P_CACHE_PERSIST = os.getenv("G2P_CACHE_PERSIST", "1") == "1"
+G2P_CACHE_DB = os.getenv("G2P_CACHE_DB", os.path.join(DATA_DIR, "g2p_cache.sqlite"))
+
+class G2PCache:
+    def __init__(self, max_entries: int = G2P_CACHE_SIZE, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._mem: "OrderedDict" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_path = db_path
+        self._db = None
+        self.hits = self.disk_hits = self.misses = 0
+
+    def _conn(self):
+        # La tabla se abre en el primer uso, no al importar el módulo
+        if self._db is None and self._db_path:
+            self._db = sqlite3.connect(self._db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=OFF")
+            self._db.execute("CREATE TABLE IF NOT EXISTS g2p (lang TEXT, key TEXT, ps TEXT, PRIMARY KEY (lang, key))")
+        return self._db
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, lang: str, text: str, persistent: bool = True):
+        with self._lock:
+            value = self._mem.get((lang, text))
+            if value is not None:
+                self._mem.move_to_end((lang, text))
+                self.hits += 1
+                return value
+            if persistent and self._conn() is not None:
+                row = self._db.execute("SELECT ps FROM g2p WHERE lang=? AND key=?", (lang, self._key(text))).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    self._remember(lang, text, row[0])
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, lang: str, text: str, value, persistent: bool = True):
+        with self._lock:
+            self._remember(lang, text, value)
+            if persistent and self._conn() is not None:
+                self._db.execute("INSERT OR REPLACE INTO g2p (lang, key, ps) VALUES (?, ?, ?)", (lang, self._key(text), value))
+                self._db.commit()
+
+    def _remember(self, lang: str, text: str, value):
+        self._mem[(lang, text)] = value
+        self._mem.move_to_end((lang, text))
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._mem),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+cache = G2PCache(db_path=G2P_CACHE_DB if G2P_CACHE_PERSIST else None)
+
+class CachedG2P:
+    """
+    Envoltorio de `KPipeline.g2p` memoizado por (lang_code, texto). Para los
+    idiomas de espeak se memoiza por oración, así las frases repetidas (intro,
+    cierre, conectores) se reutilizan aunque caigan en fragmentos distintos.
+    Los tokens de inglés (misaki) no son texto plano: solo van a memoria y se
+    devuelven copiados porque el pipeline les agrega timestamps.
+    """
+
+    def __init__(self, g2p, lang_code: str, g2p_cache: G2PCache = cache):
+        self._g2p = g2p
+        self.lang_code = lang_code
+        self._cache = g2p_cache
+
+    def __call__(self, text: str):
+        if self.lang_code in "ab":
+            result = self._cache.get(self.lang_code, text, persistent=False)
+            if result is None:
+                result = self._g2p(text)
+                self._cache.put(self.lang_code, text, result, persistent=False)
+            return copy.deepcopy(result)
+
+        parts = []
+        for sentence in SENTENCE_RE.split(text.strip()):
+            if not sentence:
+                continue
+            ps = self._cache.get(self.lang_code, sentence)
+            if ps is None:
+                ps, _ = self._g2p(sentence)
+                self._cache.put(self.lang_code, sentence, ps or "")
+            if ps:
+                parts.append(ps)
+        return " ".join(parts), None
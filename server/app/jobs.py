@@ -0,0 +1,350 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from . import checkpoint, profiling, progress, waveform
+from .accounting import JobAccount
+from .cancellation import CancelToken, Cancelled
+from .db import get_session, Episode
+from .kokoro_provider import synthesize, wav_to_pcm
+from .paths import AUDIO_DIR
+from .script_cache import file_hash
+from .document import for_upload
+from .streaming import convert_pdf
+from .summarize import script_segments
+
+# Los trabajos largos (extracción + síntesis) corren fuera del request HTTP
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="episode-job")
+
+# Cada proceso renueva `heartbeat_at` de sus trabajos (encolados o corriendo); uno
+# sin latido hace más de JOB_STALE_SEC quedó huérfano y otro proceso lo retoma
+HEARTBEAT_SEC = int(os.getenv("JOB_HEARTBEAT_SEC", "30"))
+JOB_STALE_SEC = int(os.getenv("JOB_STALE_SEC", "120"))
+RESUME_JOBS = os.getenv("RESUME_JOBS", "1") != "0"
+# Límite de reloj por trabajo (0 = sin límite; /process puede pedir otro con timeout_sec)
+JOB_TIMEOUT_SEC = float(os.getenv("JOB_TIMEOUT_SEC", "0"))
+# Con cancel_on_disconnect, cuánto se espera a que el cliente se reconecte antes de cancelar
+DISCONNECT_GRACE_SEC = float(os.getenv("JOB_DISCONNECT_GRACE_SEC", "10"))
+
+class _Job:
+    def __init__(self):
+        self.token = CancelToken()
+        self.future: Optional[Future] = None
+
+_owned: Dict[int, _Job] = {}
+_owned_lock = threading.Lock()
+_watchers: Dict[int, int] = {}
+
+def submit_episode(episode_id: int, resume: bool = False, **kwargs) -> Future:
+    if not resume:
+        # Los parámetros quedan en disco para poder retomar el trabajo tras un reinicio
+        checkpoint.save_job(episode_id, kwargs)
+    job = _Job()
+    with _owned_lock:
+        _owned[episode_id] = job
+    _heartbeat([episode_id])
+    progress.publish(episode_id, "stage", stage="queued")
+    # Si el request que encola se perfila, el trabajo deja su propio perfil
+    job.future = _executor.submit(profiling.capture, profiling.current(), f"job-{episode_id}", _run_owned, episode_id, **kwargs)
+    return job.future
+
+def _run_owned(episode_id: int, timeout_sec: Optional[float] = None, **kwargs):
+    with _owned_lock:
+        job = _owned.get(episode_id) or _Job()
+    job.token.start(timeout_sec or JOB_TIMEOUT_SEC or None)
+    try:
+        run_episode_job(episode_id, cancel=job.token, **kwargs)
+    finally:
+        with _owned_lock:
+            _owned.pop(episode_id, None)
+
+def cancel_job(episode_id: int, reason: str = "cancelled") -> bool:
+    """
+    Cancela el trabajo encolado o en curso. El estado pasa a "cancelled" en la
+    base (así lo ve también el proceso dueño, en su próximo latido o checkpoint);
+    si el trabajo es de este proceso se corta ya: el encolado libera su lugar y
+    el que corre se detiene en el próximo fragmento de audio.
+    """
+    with get_session() as s:
+        result = s.exec(update(Episode).where(
+            Episode.id == episode_id, Episode.status.in_(("pending", "processing")),
+        ).values(status="cancelled"))
+        s.commit()
+        if result.rowcount != 1:
+            return False
+    with _owned_lock:
+        job = _owned.get(episode_id)
+    if job is not None:
+        job.token.cancel(reason)
+        if job.future is not None and job.future.cancel():
+            with _owned_lock:
+                _owned.pop(episode_id, None)
+            _cleanup(episode_id, Cancelled(reason))
+    return True
+
+def watch(episode_id: int):
+    """Un cliente sigue el trabajo (SSE con cancel_on_disconnect)."""
+    with _owned_lock:
+        _watchers[episode_id] = _watchers.get(episode_id, 0) + 1
+
+def unwatch(episode_id: int, cancel: bool = True, grace_sec: float = DISCONNECT_GRACE_SEC):
+    """El cliente se fue: si nadie vuelve a mirar en `grace_sec`, se cancela el trabajo."""
+    with _owned_lock:
+        left = _watchers.get(episode_id, 1) - 1
+        if left > 0:
+            _watchers[episode_id] = left
+            return
+        _watchers.pop(episode_id, None)
+    if not cancel:
+        return
+    timer = threading.Timer(grace_sec, _cancel_if_unwatched, (episode_id,))
+    timer.daemon = True
+    timer.start()
+
+def _cancel_if_unwatched(episode_id: int):
+    with _owned_lock:
+        if _watchers.get(episode_id):
+            return
+    if cancel_job(episode_id, "disconnected"):
+        print(f"Episodio {episode_id} cancelado: el cliente se desconectó")
+
+def _heartbeat(ids: List[int]):
+    with get_session() as s:
+        s.exec(update(Episode).where(Episode.id.in_(ids)).values(heartbeat_at=datetime.utcnow()))
+        s.commit()
+
+def _claim(episode_id: int, cutoff: datetime) -> bool:
+    """Toma un trabajo huérfano solo si nadie renovó su latido (UPDATE condicional entre procesos)."""
+    with get_session() as s:
+        result = s.exec(update(Episode).where(
+            Episode.id == episode_id, Episode.status.in_(("pending", "processing")),
+            Episode.heartbeat_at.is_(None) | (Episode.heartbeat_at < cutoff),
+        ).values(heartbeat_at=datetime.utcnow()))
+        s.commit()
+        return result.rowcount == 1
+
+def resume_interrupted(stale_sec: int = JOB_STALE_SEC) -> int:
+    """Reencola los trabajos pendientes o a medio hacer cuyo proceso murió; devuelve cuántos."""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_sec)
+    with get_session() as s:
+        ids = s.exec(select(Episode.id).where(
+            Episode.status.in_(("pending", "processing")),
+            Episode.heartbeat_at.is_(None) | (Episode.heartbeat_at < cutoff),
+        )).all()
+    resumed = 0
+    for episode_id in ids:
+        with _owned_lock:
+            if episode_id in _owned:
+                continue
+        if not _claim(episode_id, cutoff):
+            continue
+        params = checkpoint.load_job(episode_id)
+        if params is None:
+            _set_status(episode_id, "error")
+            progress.publish(episode_id, "error", message="Trabajo interrumpido sin checkpoint")
+            continue
+        print(f"Retomando episodio {episode_id}")
+        submit_episode(episode_id, resume=True, **params)
+        resumed += 1
+    return resumed
+
+def _cancelled_elsewhere(ids: List[int]):
+    """Trabajos propios que otro proceso marcó como cancelados."""
+    with get_session() as s:
+        cancelled = s.exec(select(Episode.id).where(Episode.id.in_(ids), Episode.status == "cancelled")).all()
+    for episode_id in cancelled:
+        with _owned_lock:
+            job = _owned.get(episode_id)
+        if job is not None:
+            job.token.cancel()
+
+def _loop():
+    while True:
+        with _owned_lock:
+            ids = list(_owned)
+        try:
+            if ids:
+                _heartbeat(ids)
+                _cancelled_elsewhere(ids)
+            resume_interrupted()
+        except Exception as e:
+            print(f"Error retomando trabajos: {e}")
+        time.sleep(HEARTBEAT_SEC)
+
+def start_background():
+    """Latido de los trabajos propios y reanudación de los huérfanos (al arrancar y periódicamente)."""
+    if RESUME_JOBS:
+        threading.Thread(target=_loop, name="job-resume", daemon=True).start()
+
+def _set_status(episode_id: int, status: str, **fields):
+    with get_session() as s:
+        e = s.get(Episode, episode_id)
+        e.status = status
+        for k, v in fields.items():
+            setattr(e, k, v)
+        s.add(e); s.commit()
+
+def _manifest(episode_id: int) -> Optional[Dict]:
+    with get_session() as s:
+        e = s.get(Episode, episode_id)
+        return json.loads(e.checkpoint_json) if e and e.checkpoint_json else None
+
+def _advance(episode_id: int, status: str = "processing", **fields):
+    """Actualiza el episodio solo si el trabajo sigue vivo; si lo cancelaron, corta con `Cancelled`."""
+    with get_session() as s:
+        result = s.exec(update(Episode).where(
+            Episode.id == episode_id, Episode.status.in_(("pending", "processing")),
+        ).values(status=status, **fields))
+        s.commit()
+    if result.rowcount != 1:
+        raise Cancelled()
+
+def _commit(episode_id: int, sink: checkpoint.CheckpointSink, units: int):
+    """Audio a disco primero, manifiesto después: el manifiesto nunca apunta a audio perdido."""
+    manifest = sink.commit(units)
+    _advance(episode_id, checkpoint_json=json.dumps(manifest, ensure_ascii=False), heartbeat_at=datetime.utcnow())
+
+def _finish(episode_id: int, sink: checkpoint.CheckpointSink, transcript: str = ""):
+    """
+    Mueve el WAV a su lugar, calcula la forma de onda y la vista previa, y marca
+    el episodio como listo con la duración real y los capítulos.
+    """
+    wav_path = os.path.join(AUDIO_DIR, f"{uuid.uuid4()}.wav")
+    sink.finalize(wav_path)
+    chapters = sink.chapters()
+    try:
+        waveform.build(episode_id, wav_path, chapters)
+    except Exception as e:
+        # No es crítico: /peaks y /preview lo recalculan al primer pedido
+        print(f"Waveform of episode {episode_id} failed: {e}")
+    try:
+        _advance(episode_id, "ready", audio_path=wav_path, duration_sec=round(sink.seconds),
+                 sample_rate=sink.sample_rate, chapters_json=json.dumps(chapters, ensure_ascii=False),
+                 transcript=transcript, checkpoint_json="")
+    except Cancelled:
+        os.remove(wav_path)
+        waveform.discard(episode_id)
+        raise
+    checkpoint.discard(episode_id)
+
+def _cleanup(episode_id: int, e: Cancelled):
+    """Trabajo cancelado o vencido: borra el audio parcial y deja el estado final."""
+    checkpoint.discard(episode_id)
+    if e.reason == "timeout":
+        _set_status(episode_id, "error", checkpoint_json="")
+        progress.publish(episode_id, "error", message="Se superó el tiempo máximo del trabajo", reason=e.reason)
+    else:
+        _set_status(episode_id, "cancelled", checkpoint_json="")
+        progress.publish(episode_id, "cancelled", reason=e.reason)
+
+def _on_page(episode_id: int):
+    return lambda done, total: progress.publish(episode_id, "progress", stage="extract", pages=done, total=total)
+
+def run_episode_job(episode_id: int, text_source: Optional[str], pdf_path: str, max_sentences: int, voice: Optional[str],
+                    full_document: bool = False, lang_code: Optional[str] = None, content_hash: str = "",
+                    cancel: Optional[CancelToken] = None):
+    """
+    Extrae (si hace falta), arma el guion por secciones y sintetiza cada una,
+    escribiendo el audio a medida que avanza y publicando eventos de progreso.
+    Con `full_document` convierte el PDF completo en streaming, sin resumir.
+    Cada segmento (o fragmento, en streaming) terminado queda en el checkpoint;
+    si el trabajo se retoma, sigue desde el último confirmado. `cancel` se
+    revisa entre fragmentos de audio (cancelación explícita o límite de tiempo).
+    Los recursos de cada etapa quedan en JobStats (ver accounting.py).
+    """
+    account = JobAccount()
+    status = "ok"
+    try:
+        manifest = _manifest(episode_id)
+        _advance(episode_id)
+        if manifest:
+            progress.publish(episode_id, "stage", stage="resume", units=manifest["units"])
+        if full_document and text_source is None:
+            progress.publish(episode_id, "stage", stage="stream")
+            with checkpoint.CheckpointSink(episode_id, manifest) as sink, account.stage("stream") as usage:
+                resumed_sec = sink.seconds
+                try:
+                    stats = convert_pdf(
+                        pdf_path, None, voice=voice, lang=lang_code, on_page=_on_page(episode_id),
+                        on_audio=lambda title, sec: progress.publish(episode_id, "progress", stage="synthesize", title=title, audio_sec=round(sec, 1)),
+                        sink=sink, skip=sink.units, on_commit=lambda n: _commit(episode_id, sink, n), cancel=cancel,
+                    )
+                    usage["chars"] = stats["chars"]
+                finally:
+                    usage["audio_sec"] = sink.seconds - resumed_sec
+                _finish(episode_id, sink)
+            progress.publish(episode_id, "done", audio_sec=stats["audio_sec"], sections=stats["sections"],
+                             boilerplate=stats["boilerplate"])
+            return
+
+        # El guion se fija en la primera corrida: al retomar se usan los mismos segmentos
+        segments = checkpoint.load_segments(episode_id) if manifest else None
+        if segments is None:
+            doc = None
+            if text_source is None:
+                # Los títulos del PDF dan los capítulos del episodio; el documento
+                # ya extraído por /drafts o /generate-script se reutiliza
+                progress.publish(episode_id, "stage", stage="extract")
+                with account.stage("extract") as usage:
+                    doc = for_upload(pdf_path, content_hash or file_hash(pdf_path), on_page=_on_page(episode_id))
+                    usage["chars"] = len(doc.text)
+                if not len(doc):
+                    raise ValueError("No hay texto disponible para procesar")
+                if doc.boilerplate.get("lines_removed"):
+                    progress.publish(episode_id, "progress", stage="extract", boilerplate=doc.boilerplate)
+
+            progress.publish(episode_id, "stage", stage="script")
+            with account.stage("script") as usage:
+                segments = script_segments(text_source or "", max_sentences=max_sentences, doc=doc)
+                usage["chars"] = sum(len(seg) for _, seg in segments)
+            checkpoint.save_segments(episode_id, segments)
+
+        progress.publish(episode_id, "stage", stage="synthesize", total=len(segments))
+        with checkpoint.CheckpointSink(episode_id, manifest) as sink, account.stage("synthesize") as usage:
+            resumed_sec = sink.seconds
+            for i, (title, seg) in enumerate(segments, 1):
+                if i <= sink.units:
+                    continue
+                usage["chars"] += len(seg)
+                seg_samples = 0
+                sink.mark(title)
+
+                def on_chunk(n: int):
+                    nonlocal seg_samples
+                    seg_samples += n
+                    progress.publish(episode_id, "progress", stage="synthesize", section=i, total=len(segments),
+                                     audio_sec=round((sink.samples + seg_samples) / (sink.sample_rate or 24000), 1))
+
+                data, sr = synthesize(seg, voice=voice, on_chunk=on_chunk, lang=lang_code, cancel=cancel)
+                pcm, sr = wav_to_pcm(data, sr)
+                if not pcm:
+                    raise RuntimeError("TTS no disponible")
+                sink.write(pcm, sr)
+                usage["audio_sec"] = sink.seconds - resumed_sec
+                _commit(episode_id, sink, i)
+                progress.publish(episode_id, "progress", stage="synthesize", section=i, total=len(segments),
+                                 title=title, audio_sec=round(sink.seconds, 1))
+            _finish(episode_id, sink, "\n\n".join(f"## {title}\n\n{seg}" for title, seg in segments))
+
+        progress.publish(episode_id, "done", audio_sec=round(sink.seconds, 1))
+    except Cancelled as e:
+        print(f"Episodio {episode_id} detenido: {e.reason}")
+        status = "error" if e.reason == "timeout" else "cancelled"
+        _cleanup(episode_id, e)
+    except Exception as e:
+        print(f"Error procesando episodio {episode_id}: {e}")
+        status = "error"
+        _set_status(episode_id, "error", checkpoint_json="")
+        checkpoint.discard(episode_id)
+        progress.publish(episode_id, "error", message=str(e))
+    finally:
+        account.save(episode_id, status)
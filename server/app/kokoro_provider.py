@@ -1,51 +1,327 @@
+import io
 import os
-from typing import List, Optional, Tuple
+import time
+import wave
+import zlib
+from collections import deque
+from multiprocessing import AuthenticationError
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 import numpy as np
 
+from .coalescer import SynthesisCoalescer
+from .cancellation import CancelToken, Cancelled, check as check_cancel
+from .chunker import pack_sentences
+from .paths import DATA_DIR
+from .pipeline_pool import PipelinePool
+from . import g2p_cache
+
 KOKORO_AVAILABLE = False
-_pipeline = None
+_pool: Optional[PipelinePool] = None
+
+# Si está definido, synthesize() es un cliente del servidor de modelos
+# (python -m app.model_server) y este proceso no carga Kokoro.
+KOKORO_SERVER_SOCKET = os.getenv("KOKORO_SERVER_SOCKET", "")
+# El protocolo usa pickle: sin clave no hay servidor. Si no se fija una, el
+# servidor genera una aleatoria al arrancar en KOKORO_SERVER_KEYFILE (modo 0600)
+KOKORO_SERVER_AUTHKEY = os.getenv("KOKORO_SERVER_AUTHKEY", "").encode()
+KOKORO_SERVER_KEYFILE = os.getenv("KOKORO_SERVER_KEYFILE", os.path.join(DATA_DIR, "kokoro_server.key"))
+# Errores con los que el servidor de modelos se da por no disponible
+REMOTE_ERRORS = (OSError, EOFError, AuthenticationError)
+FALLBACK_VOICES = ["em_santa", "em_gabriel", "em_diego", "pm_brazil", "pf_brazil"]
+
+# Cola compartida de segmentos entre trabajos concurrentes, por réplica (ver coalescer.py).
+# Solo la usa el servidor de modelos con --replicas > 1: con una réplica serializa los
+# segmentos de todos los trabajos en un hilo y agrega la espera, sin ganar throughput
+KOKORO_COALESCE = os.getenv("KOKORO_COALESCE", "0") == "1"
+KOKORO_COALESCE_MAX = int(os.getenv("KOKORO_COALESCE_MAX", "8"))
+KOKORO_COALESCE_WAIT_MS = int(os.getenv("KOKORO_COALESCE_WAIT_MS", "20"))
+# Hilos intra-op de torch para inferencia en CPU (0 = valor por defecto de torch)
+KOKORO_TORCH_THREADS = int(os.getenv("KOKORO_TORCH_THREADS", "0"))
+KOKORO_SPEED = 0.8
+# TTS falso y determinista para pruebas de carga (python -m app.loadtest): un tono
+# por segmento, con `KOKORO_FAKE_RTF` segundos de cómputo por segundo de audio
+KOKORO_FAKE = os.getenv("KOKORO_FAKE", "0") == "1"
+KOKORO_FAKE_RTF = float(os.getenv("KOKORO_FAKE_RTF", "0.02"))
+FAKE_SAMPLES_PER_CHAR = 1600  # ~15 caracteres por segundo a 24 kHz
+KOKORO_REPO_ID = os.getenv("KOKORO_REPO_ID", "hexgrad/Kokoro-82M")
+_coalescer: Optional[SynthesisCoalescer] = None
+
+# Idioma por defecto del despliegue; cada pedido puede elegir otro (ver PipelinePool)
+DEFAULT_LANG_CODE = os.getenv("KOKORO_LANG_CODE", "e")
+LANG_CODES = {
+    "es": "e", "pt": "p", "pt-br": "p", "en": "a", "en-us": "a", "en-gb": "b",
+    "fr": "f", "it": "i", "hi": "h", "ja": "j", "zh": "z",
+}
+DEFAULT_VOICES = {"e": "em_santa", "p": "pm_alex", "a": "af_heart", "b": "bf_emma",
+                  "f": "ff_siwis", "i": "im_nicola", "h": "hm_omega", "j": "jm_kumo", "z": "zm_yunxi"}
+
+def tune_threads(threads: int = KOKORO_TORCH_THREADS):
+    if threads > 0:
+        import torch  # type: ignore
+        torch.set_num_threads(threads)
+        print(f"torch intra-op threads: {threads}")
+
+def resolve_lang(language: Optional[str] = None, voice: Optional[str] = None) -> str:
+    """
+    lang_code de Kokoro para un idioma ("es", "pt-BR", "en" o ya "e", "p", "a").
+    Sin idioma se deduce de la voz (sus nombres empiezan por el lang_code).
+    """
+    if language:
+        code = language.strip().lower()
+        if code in LANG_CODES:
+            return LANG_CODES[code]
+        if code in DEFAULT_VOICES:
+            return code
+        raise ValueError(f"Idioma no soportado: {language}")
+    if voice and voice[0] in DEFAULT_VOICES and voice[1:2] in ("f", "m"):
+        return voice[0]
+    return DEFAULT_LANG_CODE
+
+def _voice_for(voice: Optional[str], lang_code: str) -> str:
+    if voice:
+        return voice
+    if lang_code == DEFAULT_LANG_CODE:
+        return os.getenv("KOKORO_DEFAULT_VOICE", DEFAULT_VOICES.get(lang_code, "em_santa"))
+    return DEFAULT_VOICES.get(lang_code, "em_santa")
+
+def _load_model():
+    import torch  # type: ignore
+    from kokoro import KModel  # type: ignore
+    tune_threads()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Loading Kokoro model on {device}")
+    return KModel(repo_id=KOKORO_REPO_ID).to(device).eval()
+
+def _new_pipeline(lang: str, model):
+    from kokoro import KPipeline  # type: ignore
+    print(f"Initializing Kokoro with lang_code: {lang}")
+    pipeline = KPipeline(lang_code=lang, repo_id=KOKORO_REPO_ID, model=model)
+    pipeline.g2p = g2p_cache.CachedG2P(pipeline.g2p, pipeline.lang_code)
+    return pipeline
+
+def _new_pool() -> PipelinePool:
+    """Una réplica: un modelo y sus pipelines por idioma (el del despliegue ya cargado)."""
+    pool = PipelinePool(_load_model, _new_pipeline)
+    pool.get(DEFAULT_LANG_CODE)
+    return pool
 
 def _try_import():
-    global KOKORO_AVAILABLE, _pipeline
-    if _pipeline is not None:
+    global KOKORO_AVAILABLE, _pool
+    if _pool is not None:
+        return
+    if KOKORO_FAKE:
+        KOKORO_AVAILABLE = True
         return
     try:
         print("Attempting to import Kokoro...")
-        from kokoro import KPipeline  # type: ignore
-        lang = os.getenv("KOKORO_LANG_CODE", "e")
-        print(f"Initializing Kokoro with lang_code: {lang}")
-        _pipeline = KPipeline(lang_code=lang)
+        _pool = _new_pool()
         KOKORO_AVAILABLE = True
         print("Kokoro initialized successfully!")
+        if KOKORO_COALESCE:
+            print("KOKORO_COALESCE solo aplica al servidor de modelos con --replicas > 1; se ignora")
     except Exception as e:
         print(f"Failed to import/initialize Kokoro: {e}")
         KOKORO_AVAILABLE = False
 
+def _voices_of(pipeline) -> List[str]:
+    if pipeline is not None and hasattr(pipeline, "voice_list"):
+        return list(getattr(pipeline, "voice_list", []))
+    return FALLBACK_VOICES
+
+def _fake_chunks(text: str) -> Iterator[np.ndarray]:
+    # Un fragmento por segmento empaquetado, como el camino real
+    for seg in pack_sentences(text):
+        n = len(seg) * FAKE_SAMPLES_PER_CHAR
+        freq = 180 + zlib.crc32(seg.encode("utf-8")) % 220
+        if KOKORO_FAKE_RTF > 0:
+            time.sleep(n / 24000 * KOKORO_FAKE_RTF)
+        yield (0.2 * np.sin(2 * np.pi * freq * np.arange(n) / 24000)).astype(np.float32)
+
+def _kokoro_segment(pipeline, segment: str, voice_name: str) -> Iterator[np.ndarray]:
+    # Sin split_pattern: el segmento ya viene empaquetado a la medida del modelo
+    for gs, ps, audio in pipeline(segment, voice=voice_name, speed=KOKORO_SPEED, split_pattern=None):
+        yield np.asarray(audio, dtype=np.float32)
+
+def _kokoro_chunks(pipeline, text: str, voice_name: str) -> Iterator[np.ndarray]:
+    for i, seg in enumerate(pack_sentences(text)):
+        for arr in _kokoro_segment(pipeline, seg, voice_name):
+            print(f"Generated chunk {i}: {len(arr)} samples")
+            yield arr
+
+def _run_group(pool: PipelinePool, key: Tuple[str, str, float], texts: List[str]) -> List[np.ndarray]:
+    """Corre un grupo de segmentos del mismo idioma y voz, uno tras otro, sobre una réplica."""
+    lang_code, voice_name, _speed = key
+    pipeline = pool.get(lang_code)
+    out = []
+    for text in texts:
+        arrs = list(_kokoro_segment(pipeline, text, voice_name))
+        out.append(np.concatenate(arrs) if arrs else np.zeros(0, dtype=np.float32))
+    return out
+
+def get_coalescer(pools: Sequence[PipelinePool]) -> SynthesisCoalescer:
+    """Cola del proceso con un hilo por réplica (las del servidor de modelos)."""
+    global _coalescer
+    if _coalescer is None:
+        _coalescer = SynthesisCoalescer(_run_group, list(pools), KOKORO_COALESCE_MAX, KOKORO_COALESCE_WAIT_MS)
+    return _coalescer
+
+def _coalesced_chunks(coalescer: SynthesisCoalescer, text: str, voice_name: str, lang_code: str) -> Iterator[np.ndarray]:
+    # Hasta KOKORO_COALESCE_MAX segmentos encolados por delante: alcanza para llenar un
+    # grupo sin cargar el texto entero en la cola
+    pending: "deque" = deque()
+    try:
+        for seg in pack_sentences(text):
+            pending.append(coalescer.submit((lang_code, voice_name, KOKORO_SPEED), seg))
+            if len(pending) >= KOKORO_COALESCE_MAX:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+def _to_pcm16(arr: np.ndarray) -> bytes:
+    return (np.clip(arr, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+def server_authkey() -> bytes:
+    """Clave del servidor de modelos; se relee en cada conexión porque cambia al reiniciarlo."""
+    if KOKORO_SERVER_AUTHKEY:
+        return KOKORO_SERVER_AUTHKEY
+    with open(KOKORO_SERVER_KEYFILE, "rb") as f:
+        return f.read().strip()
+
+def _remote(request: Dict) -> Iterator[Tuple]:
+    """Envía un pedido al servidor de modelos y devuelve sus mensajes en orden."""
+    from multiprocessing.connection import Client
+    with Client(KOKORO_SERVER_SOCKET, family="AF_UNIX", authkey=server_authkey()) as conn:
+        conn.send(request)
+        while True:
+            msg = conn.recv()
+            yield msg
+            if msg[0] != "chunk":
+                return
+
+def _synthesize_remote(text: str, voice_name: str, lang_code: str, sample_rate: int,
+                       on_chunk: Optional[Callable[[int], None]], cancel: Optional[CancelToken] = None) -> Tuple[bytes, int]:
+    audio_chunks = []
+    try:
+        # Al cortar el generador se cierra la conexión y el servidor deja de generar
+        for kind, payload in _remote({"op": "synthesize", "text": text, "voice": voice_name, "lang": lang_code,
+                                      "sample_rate": sample_rate}):
+            check_cancel(cancel)
+            if kind == "chunk":
+                audio_chunks.append(payload)
+                if on_chunk:
+                    on_chunk(len(payload) // 2)
+            elif kind == "end":
+                return (b"".join(audio_chunks), payload)
+            else:
+                print(f"Model server error: {payload}")
+                return (b"", 0)
+    except REMOTE_ERRORS as e:
+        print(f"Model server unreachable at {KOKORO_SERVER_SOCKET}: {e}")
+    return (b"", 0)
+
+def metrics() -> Dict:
+    """Métricas de la caché G2P y de la cola de segmentos (las del servidor de modelos si se usa)."""
+    if KOKORO_SERVER_SOCKET:
+        try:
+            for kind, payload in _remote({"op": "metrics"}):
+                if kind == "metrics":
+                    return payload
+        except REMOTE_ERRORS as e:
+            print(f"Model server unreachable at {KOKORO_SERVER_SOCKET}: {e}")
+        return {}
+    return {
+        "g2p_cache": g2p_cache.cache.stats(),
+        "coalescer": _coalescer.stats() if _coalescer is not None else None,
+        "pipelines": _pool.stats() if _pool is not None else None,
+    }
+
 def list_voices() -> List[str]:
+    global KOKORO_AVAILABLE
+    if KOKORO_SERVER_SOCKET:
+        try:
+            for kind, payload in _remote({"op": "voices"}):
+                if kind == "voices":
+                    KOKORO_AVAILABLE = True
+                    return payload
+        except REMOTE_ERRORS as e:
+            print(f"Model server unreachable at {KOKORO_SERVER_SOCKET}: {e}")
+        return FALLBACK_VOICES
     _try_import()
-    if KOKORO_AVAILABLE and hasattr(_pipeline, "voice_list"):
-        return list(getattr(_pipeline, "voice_list", []))
-    return ["em_santa", "em_gabriel", "em_diego", "pm_brazil", "pf_brazil"]
+    return _voices_of(_pool.get(DEFAULT_LANG_CODE) if _pool is not None else None)
+
+def wav_to_pcm(data: bytes, sr: int) -> Tuple[bytes, int]:
+    """El fallback pyttsx3 devuelve un WAV completo: se queda solo con las muestras."""
+    if data[:4] == b"RIFF":
+        with wave.open(io.BytesIO(data), "rb") as wf:
+            return wf.readframes(wf.getnframes()), wf.getframerate()
+    return data, sr
+
+def _local_chunks(text: str, voice_name: str, lang_code: str) -> Iterator[np.ndarray]:
+    if KOKORO_FAKE:
+        return _fake_chunks(text)
+    return _kokoro_chunks(_pool.get(lang_code), text, voice_name)
+
+def iter_synthesize(text: str, voice: Optional[str] = None, sample_rate: int = 24000,
+                    lang: Optional[str] = None, cancel: Optional[CancelToken] = None) -> Iterator[Tuple[bytes, int]]:
+    """
+    Como `synthesize` pero entrega (PCM16, sample_rate) a medida que se genera,
+    para escribir el audio sin juntarlo entero en memoria.
+    """
+    lang_code = resolve_lang(lang, voice)
+    voice_name = _voice_for(voice, lang_code)
+    if KOKORO_SERVER_SOCKET:
+        for kind, payload in _remote({"op": "synthesize", "text": text, "voice": voice_name, "lang": lang_code,
+                                      "sample_rate": sample_rate}):
+            check_cancel(cancel)
+            if kind == "chunk":
+                yield payload, sample_rate
+            elif kind == "error":
+                raise RuntimeError(f"Model server error: {payload}")
+        return
+    _try_import()
+    if KOKORO_AVAILABLE:
+        for arr in _local_chunks(text, voice_name, lang_code):
+            check_cancel(cancel)
+            yield _to_pcm16(arr), sample_rate
+        return
+    data, sr = synthesize(text, voice=voice, lang=lang, cancel=cancel)
+    if data:
+        yield wav_to_pcm(data, sr)
+
+def synthesize(text: str, voice: Optional[str] = None, sample_rate: int = 24000, on_chunk: Optional[Callable[[int], None]] = None,
+               lang: Optional[str] = None, cancel: Optional[CancelToken] = None) -> Tuple[bytes, int]:
+    """
+    Devuelve (PCM16 mono, sample_rate) con Kokoro, o un WAV completo con pyttsx3.
+    `lang` es el idioma ("es", "pt", "en" o un lang_code); sin él se deduce de la voz.
+    `on_chunk(samples)` se llama por cada fragmento generado por Kokoro.
+    `cancel` se revisa entre fragmentos: si se canceló (o venció) corta con `Cancelled`.
+    """
+    lang_code = resolve_lang(lang, voice)
+    voice_name = _voice_for(voice, lang_code)
+    check_cancel(cancel)
+    if KOKORO_SERVER_SOCKET:
+        return _synthesize_remote(text, voice_name, lang_code, sample_rate, on_chunk, cancel)
 
-def synthesize(text: str, voice: Optional[str] = None, sample_rate: int = 24000) -> Tuple[bytes, int]:
     _try_import()
     print(f"KOKORO_AVAILABLE: {KOKORO_AVAILABLE}")
     print(f"Voice requested: {voice}")
     
     if KOKORO_AVAILABLE:
-        voice_name = voice or os.getenv("KOKORO_DEFAULT_VOICE", "em_santa")
-        print(f"Using Kokoro voice: {voice_name}")
-        print(f"Pipeline available: {_pipeline is not None}")
+        print(f"Using Kokoro voice: {voice_name} (lang_code: {lang_code})")
         
         try:
             audio_chunks = []
-            generator = _pipeline(text, voice=voice_name, speed=0.8, split_pattern=r'\n+')
-            for i, (gs, ps, audio) in enumerate(generator):
-                print(f"Generated chunk {i}: {len(audio)} samples")
-                arr = np.asarray(audio, dtype=np.float32)
-                pcm16 = (np.clip(arr, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
-                audio_chunks.append(pcm16)
+            for arr in _local_chunks(text, voice_name, lang_code):
+                check_cancel(cancel)
+                audio_chunks.append(_to_pcm16(arr))
+                if on_chunk:
+                    on_chunk(len(arr))
             return (b"".join(audio_chunks), sample_rate)
+        except Cancelled:
+            raise
         except Exception as e:
             print(f"Kokoro synthesis error: {e}")
             return (b"", 0)
@@ -0,0 +1,295 @@
+"""
+Prueba de carga HTTP con un TTS falso y determinista. Uso:
+
+    python -m app.loadtest --concurrency 16 --duration 30
+    python -m app.loadtest --server uvicorn --workers 4 --concurrency 32
+    python -m app.loadtest --url http://127.0.0.1:8000 --mix episodes=5,audio=5
+
+Por defecto levanta la app en este proceso (uvicorn en un hilo) sobre un
+directorio temporal, con KOKORO_FAKE=1, así no toca app.db ni server/data.
+Cada cliente elige operaciones según `--mix` (pesos por ruta) y al final se
+informa throughput, latencias p50/p95/p99 y tasa de errores por ruta.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MIX = "uploads=1,drafts=1,script=2,process=1,episodes=4,audio=3"
+ROUTES = {
+    "uploads": "POST /uploads",
+    "drafts": "POST /drafts",
+    "script": "POST /generate-script",
+    "process": "POST /process",
+    "episodes": "GET /episodes",
+    "audio": "GET /episodes/{id}/audio",
+}
+
+PARAGRAPH = (
+    "La criptografía estudia técnicas para proteger la información frente a terceros. "
+    "Un algoritmo de cifrado transforma un mensaje legible en otro ilegible usando una clave. "
+    "Las funciones hash resumen datos de cualquier tamaño en un valor de longitud fija. "
+)
+
+def sample_pdf(pages: int = 4) -> bytes:
+    """PDF con títulos y párrafos, para que extracción y seccionado trabajen de verdad."""
+    import fitz  # PyMuPDF
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Capítulo {i + 1}", fontsize=18, fontname="hebo")
+        page.insert_textbox(fitz.Rect(72, 100, 520, 780), PARAGRAPH * 6, fontsize=11)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_samples: Dict[str, str] = {}
+
+    def record(self, route: str, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if error:
+                self.errors[route] += 1
+                self.error_samples.setdefault(route, error)
+
+    def report(self, elapsed: float) -> str:
+        lines = [f"{'route':<26} {'count':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"]
+        total = 0
+        for route in sorted(self.latencies):
+            lat = np.array(self.latencies[route]) * 1000
+            total += len(lat)
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+            err = self.errors[route] / len(lat)
+            lines.append(f"{route:<26} {len(lat):>6} {len(lat) / elapsed:>7.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {err:>6.1%}")
+        lines.append(f"{'total':<26} {total:>6} {total / elapsed:>7.1f}")
+        for route, sample in sorted(self.error_samples.items()):
+            lines.append(f"  first error on {route}: {sample}")
+        return "\n".join(lines)
+
+class Client:
+    def __init__(self, base_url: str, stats: Stats, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.stats = stats
+        self.timeout = timeout
+
+    def request(self, route: str, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                data = resp.read()
+                status = resp.status
+            self.stats.record(route, time.perf_counter() - start)
+            return status, data
+        except urllib.error.HTTPError as e:
+            self.stats.record(route, time.perf_counter() - start, f"HTTP {e.code}: {e.read()[:120]!r}")
+            return e.code, b""
+        except (urllib.error.URLError, OSError) as e:
+            self.stats.record(route, time.perf_counter() - start, repr(e))
+            return 0, b""
+
+    def post_json(self, route: str, path: str, payload: Dict) -> Optional[Dict]:
+        status, data = self.request(route, "POST", path, json.dumps(payload).encode(),
+                                    {"Content-Type": "application/json"})
+        return json.loads(data) if status == 200 else None
+
+    def upload(self, pdf: bytes) -> Optional[int]:
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"load.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n"
+        ).encode() + pdf + f"\r\n--{boundary}--\r\n".encode()
+        status, data = self.request(ROUTES["uploads"], "POST", "/uploads", body,
+                                    {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        return json.loads(data)["upload_id"] if status == 200 else None
+
+class Workload:
+    """Estado compartido entre clientes: uploads creados y episodios listos."""
+
+    def __init__(self, client: Client, mix: Dict[str, int], pdf: bytes, target_minutes: int):
+        self.client = client
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.pdf = pdf
+        self.target_minutes = target_minutes
+        self.uploads: List[int] = []
+        self.ready: List[int] = []
+        self._lock = threading.Lock()
+
+    def _upload_id(self, rnd: random.Random) -> Optional[int]:
+        with self._lock:
+            if self.uploads:
+                return rnd.choice(self.uploads)
+        return self.op_uploads(rnd)
+
+    def op_uploads(self, rnd: random.Random) -> Optional[int]:
+        upload_id = self.client.upload(self.pdf)
+        if upload_id is not None:
+            with self._lock:
+                self.uploads.append(upload_id)
+        return upload_id
+
+    def op_drafts(self, rnd: random.Random):
+        upload_id = self._upload_id(rnd)
+        if upload_id is not None:
+            self.client.post_json(ROUTES["drafts"], "/drafts", {"upload_id": upload_id, "language": "es"})
+
+    def op_script(self, rnd: random.Random):
+        upload_id = self._upload_id(rnd)
+        if upload_id is not None:
+            self.client.post_json(ROUTES["script"], "/generate-script",
+                                  {"upload_id": upload_id, "target_minutes": self.target_minutes})
+
+    def op_process(self, rnd: random.Random):
+        upload_id = self._upload_id(rnd)
+        if upload_id is not None:
+            self.client.post_json(ROUTES["process"], "/process",
+                                  {"upload_id": upload_id, "target_minutes": self.target_minutes, "voice": "em_santa"})
+
+    def op_episodes(self, rnd: random.Random):
+        status, data = self.client.request(ROUTES["episodes"], "GET", "/episodes")
+        if status == 200:
+            ready = [e["id"] for e in json.loads(data) if e["status"] == "ready"]
+            with self._lock:
+                self.ready = ready
+
+    def op_audio(self, rnd: random.Random):
+        with self._lock:
+            episode_id = rnd.choice(self.ready) if self.ready else None
+        if episode_id is None:
+            return self.op_episodes(rnd)
+        # La mitad de las descargas son saltos con Range, como un reproductor
+        headers = {"Range": f"bytes={rnd.randrange(44, 4096)}-"} if rnd.random() < 0.5 else {}
+        self.client.request(ROUTES["audio"], "GET", f"/episodes/{episode_id}/audio", headers=headers)
+
+    def run_client(self, seed: int, deadline: float):
+        rnd = random.Random(seed)
+        while time.monotonic() < deadline:
+            op = rnd.choices(self.ops, self.weights)[0]
+            getattr(self, f"op_{op}")(rnd)
+
+def _parse_mix(spec: str) -> Dict[str, int]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise SystemExit(f"Operación desconocida en --mix: {name} (opciones: {', '.join(ROUTES)})")
+        mix[name] = int(weight or 1)
+    return mix
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_ready(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/episodes", timeout=2):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise SystemExit(f"El servidor no respondió en {base_url}")
+
+def _isolated_env(workdir: str) -> Dict[str, str]:
+    env = {
+        "KOKORO_FAKE": "1",
+        "DATA_DIR": os.path.join(workdir, "data"),
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        "G2P_CACHE_PERSIST": "0",
+    }
+    os.environ.update(env)
+    return env
+
+def start_inprocess(workdir: str, jobs: int):
+    """uvicorn en un hilo de este proceso; las variables se fijan antes de importar la app."""
+    _isolated_env(workdir)
+    os.environ["JOB_WORKERS"] = str(jobs)
+    import uvicorn
+    from .main import app
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, name="loadtest-server", daemon=True).start()
+    base_url = f"http://127.0.0.1:{port}"
+    _wait_ready(base_url)
+    return base_url, lambda: setattr(server, "should_exit", True)
+
+def start_uvicorn(workdir: str, jobs: int, workers: int):
+    """uvicorn como subproceso con varios workers, como en producción."""
+    env = dict(os.environ, **_isolated_env(workdir), JOB_WORKERS=str(jobs))
+    port = _free_port()
+    server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=server_dir, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    _wait_ready(base_url)
+    return base_url, proc.terminate
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga HTTP con TTS falso")
+    parser.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--url", help="usar un servidor ya levantado en vez de iniciar uno")
+    parser.add_argument("--workers", type=int, default=2, help="workers de uvicorn (--server uvicorn)")
+    parser.add_argument("--jobs", type=int, default=2, help="JOB_WORKERS del servidor iniciado")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos de carga")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"pesos por operación (default {DEFAULT_MIX})")
+    parser.add_argument("--pages", type=int, default=4, help="páginas del PDF de prueba")
+    parser.add_argument("--minutes", type=int, default=2, help="target_minutes de los pedidos")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    mix = _parse_mix(args.mix)
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    stop = None
+    if args.url:
+        base_url = args.url
+    elif args.server == "uvicorn":
+        base_url, stop = start_uvicorn(workdir, args.jobs, args.workers)
+    else:
+        base_url, stop = start_inprocess(workdir, args.jobs)
+    print(f"Target: {base_url}  concurrency={args.concurrency} duration={args.duration}s  mix={args.mix}")
+
+    stats = Stats()
+    workload = Workload(Client(base_url, stats, args.timeout), mix, sample_pdf(args.pages), args.minutes)
+    deadline = time.monotonic() + args.duration
+    start = time.perf_counter()
+    threads = [threading.Thread(target=workload.run_client, args=(args.seed + i, deadline), daemon=True)
+               for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    print(stats.report(elapsed))
+    if stop:
+        stop()
+    print(f"Datos de la corrida en {workdir}")
+
+if __name__ == "__main__":
+    main()
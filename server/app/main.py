@@ -1,19 +1,25 @@
-import os, uuid, wave, io
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+import os, uuid, json, asyncio, hashlib
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from sqlmodel import select
 from passlib.hash import bcrypt
 
 from .db import init_db, get_session, User, Upload, Episode
 from .auth import create_token, verify_password, hash_password, get_current_user_id
-from .pdf_extract import extract_text
-from .summarize import summarize_text, script_from_summary
-from .kokoro_provider import list_voices, synthesize
+from .pdf_extract import extract_text, document_info, page_count
+from .kokoro_provider import list_voices, resolve_lang, metrics as tts_metrics
 from .refine import refine_with_llm_like
+from .sections import SECTIONER_VERSION, create_sections_from_text, sections_from_blocks, create_full_script
+from .paths import UPLOAD_DIR
+from .jobs import submit_episode
+from . import progress
+from .media import CompressionMiddleware, cached_json, file_etag, serve_file
+from . import accounting, cold_storage, document, drafts, export, jobs, profiling, script_cache, waveform
 
 app = FastAPI(title="PDF→Podcast MVP")
+app.router.route_class = profiling.ProfiledRoute
 
 origins = [o.strip() for o in os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",") if o.strip()]
 app.add_middleware(
@@ -22,15 +28,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(profiling.ProfilingMiddleware)
 
 init_db()
-
-DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
-UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
-AUDIO_DIR = os.path.join(DATA_DIR, "audio")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(AUDIO_DIR, exist_ok=True)
+cold_storage.start_background()
+jobs.start_background()
 
 class AuthIn(BaseModel):
     email: str
@@ -64,6 +69,37 @@ def voices():
         "note": note
     }
 
+@app.get("/metrics")
+def get_metrics():
+    return {"tts": tts_metrics(), "script_cache": script_cache.cache.stats()}
+
+@app.get("/stats/usage")
+def get_usage(days: int = Query(30, ge=1), user_id: int | None = None):
+    """Recursos consumidos por usuario y por día (CPU, RSS pico, caracteres, audio)."""
+    return {"days": days, "usage": accounting.usage(days, user_id)}
+
+@app.get("/stats/outliers")
+def get_outliers(factor: float = Query(10.0, gt=1), days: int = Query(30, ge=1)):
+    """Episodios que costaron `factor` veces o más la mediana de CPU por carácter."""
+    return accounting.outliers(factor, days)
+
+@app.get("/profiles")
+def get_profiles():
+    """Perfiles capturados (X-Profile: 1 o PROFILE_SAMPLE_RATE), del más reciente al más viejo."""
+    return profiling.list_profiles()
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = "json"):
+    """`format=json` (metadatos y funciones más costosas) o `format=prof` (pstats)."""
+    if format not in ("json", "prof"):
+        raise HTTPException(400, "format debe ser json o prof")
+    path = profiling.profile_path(profile_id, format)
+    if not path:
+        raise HTTPException(404, "Perfil no encontrado")
+    if format == "json":
+        return FileResponse(path, media_type="application/json")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
 @app.post("/uploads")
 def upload_file(file: UploadFile = File(...)):
     # validate type and size (basic)
@@ -78,16 +114,40 @@ def upload_file(file: UploadFile = File(...)):
     with open(path, "wb") as f:
         f.write(data)
     with get_session() as s:
-        up = Upload(user_id=1, filename=file.filename, path=path)  # user_id fijo para testing
+        up = Upload(user_id=1, filename=file.filename, path=path,
+                    content_hash=hashlib.sha256(data).hexdigest())  # user_id fijo para testing
         s.add(up); s.commit(); s.refresh(up)
     return {"upload_id": up.id}
 
+@app.get("/uploads/{upload_id}/info")
+def upload_info(upload_id: int):
+    """Páginas del PDF y cuáles no tienen capa de texto (irán a OCR), sin extraer texto."""
+    with get_session() as s:
+        up = s.get(Upload, upload_id)
+        if not up:
+            raise HTTPException(404, "Upload no encontrado")
+    if not up.filename.lower().endswith(".pdf"):
+        raise HTTPException(415, "Solo hay metadatos de páginas para PDFs")
+    return {"upload_id": upload_id, "filename": up.filename, **document_info(up.path)}
+
+def _upload_hash(s, up: Upload) -> str:
+    # Los uploads anteriores a content_hash se hashean la primera vez que se usan
+    if not up.content_hash:
+        up.content_hash = script_cache.file_hash(up.path)
+        s.add(up); s.commit(); s.refresh(up)
+    return up.content_hash
+
 class DraftCreateIn(BaseModel):
     upload_id: int
     language: str = "es"
 
 class DraftUpdateIn(BaseModel):
     refined_text: str
+    version: int | None = None  # si se envía, se rechaza (409) cuando el borrador cambió
+
+class DraftSectionPatchIn(BaseModel):
+    content: str
+    version: int
 
 @app.post("/drafts")
 def create_draft(body: DraftCreateIn):
@@ -96,13 +156,19 @@ def create_draft(body: DraftCreateIn):
         up = s.get(Upload, body.upload_id)
         if not up:
             raise HTTPException(404, "Upload no encontrado")
-        raw_text = extract_text(up.path)
+        # El documento del upload (extraído una vez y guardado) alimenta el refinado
+        doc = document.for_upload(up.path, _upload_hash(s, up))
+        raw_text = doc.raw_text()
         if not raw_text.strip():
-            raise HTTPException(400, "No se pudo extraer texto (¿PDF escaneado?)")
-        title, refined = refine_with_llm_like(raw_text, language=body.language)
-        d = Draft(user_id=1, upload_id=up.id, raw_text=raw_text, refined_text=f"# {title}\n\n{refined}")  # user_id fijo para testing
-        s.add(d); s.commit(); s.refresh(d)
-        return {"draft_id": d.id, "title": title, "refined_text": d.refined_text}
+            raise HTTPException(400, "No se pudo extraer texto (¿PDF escaneado sin Tesseract instalado?)")
+        title, refined = refine_with_llm_like(raw_text, language=body.language, doc=doc)
+        refined_text = f"# {title}\n\n{refined}"
+        d = drafts.create(s, 1, up.id, raw_text, refined_text)  # user_id fijo para testing
+        return {"draft_id": d.id, "title": title, "refined_text": refined_text, "version": d.version,
+                "boilerplate": doc.boilerplate}
+
+def _section_out(sec) -> dict:
+    return {"id": sec.id, "position": sec.position, "title": sec.title, "content": sec.content}
 
 @app.get("/drafts/{draft_id}")
 def get_draft(draft_id: int):
@@ -111,18 +177,50 @@ def get_draft(draft_id: int):
         d = s.get(Draft, draft_id)
         if not d:
             raise HTTPException(404, "Draft no encontrado")
-        return {"draft_id": d.id, "refined_text": d.refined_text, "upload_id": d.upload_id}
+        secs = drafts.sections(s, d)
+        return {
+            "draft_id": d.id,
+            "refined_text": drafts.join_sections([sec.content for sec in secs]),
+            "upload_id": d.upload_id,
+            "version": d.version,
+            "sections": [_section_out(sec) for sec in secs],
+        }
 
 @app.put("/drafts/{draft_id}")
 def update_draft(draft_id: int, body: DraftUpdateIn):
+    """Reemplaza el texto completo; solo se reescriben las secciones que cambiaron."""
     from .db import Draft
     with get_session() as s:
         d = s.get(Draft, draft_id)
         if not d:
             raise HTTPException(404, "Draft no encontrado")
-        d.refined_text = body.refined_text
-        s.add(d); s.commit(); s.refresh(d)
-        return {"ok": True}
+        try:
+            result = drafts.replace_text(s, d, body.refined_text, expected=body.version)
+        except drafts.VersionConflict as e:
+            raise HTTPException(409, {"message": str(e), "version": e.current})
+        return {"ok": True, **result}
+
+@app.patch("/drafts/{draft_id}/sections/{section_id}")
+def patch_draft_section(draft_id: int, section_id: int, body: DraftSectionPatchIn):
+    """
+    Actualiza una sola sección. `version` debe ser la última leída del borrador;
+    si otro guardado la cambió se responde 409 con la versión actual. Un
+    contenido que no es exactamente una sección se rechaza con 422.
+    """
+    from .db import Draft
+    with get_session() as s:
+        d = s.get(Draft, draft_id)
+        if not d:
+            raise HTTPException(404, "Draft no encontrado")
+        try:
+            sec = drafts.update_section(s, d, section_id, body.content, body.version)
+        except LookupError as e:
+            raise HTTPException(404, str(e))
+        except ValueError as e:
+            raise HTTPException(422, str(e))
+        except drafts.VersionConflict as e:
+            raise HTTPException(409, {"message": str(e), "version": e.current})
+        return {"ok": True, "version": body.version + 1, "section": _section_out(sec)}
 
 class ProcessIn(BaseModel):
     upload_id: int
@@ -131,12 +229,20 @@ class ProcessIn(BaseModel):
     target_minutes: int = 10
     style: str = "conversational"
     voice: str | None = None
+    full_document: bool = False  # /process: convertir el PDF completo en streaming, sin resumir
+    language: str | None = None  # "es", "pt", "en"...; sin idioma se deduce de la voz
+    timeout_sec: int | None = None  # /process: límite de reloj del trabajo (por defecto JOB_TIMEOUT_SEC)
 
 @app.post("/generate-script")
-def generate_script(body: ProcessIn):
+def generate_script(body: ProcessIn, parts: str = "all"):
     """
-    Genera solo el script con secciones, sin generar audio
+    Genera solo el script con secciones, sin generar audio. El resultado se
+    memoiza por (fuente, minutos, estilo, versión del seccionado), así repetir
+    la vista previa no vuelve a extraer ni a seccionar. `parts=sections|script`
+    devuelve solo una de las dos representaciones.
     """
+    if parts not in ("all", "sections", "script"):
+        raise HTTPException(400, "parts debe ser all, sections o script")
     with get_session() as s:
         up = s.get(Upload, body.upload_id)
         if not up:
@@ -150,35 +256,55 @@ def generate_script(body: ProcessIn):
             d = s.get(Draft, body.draft_id)
             if not d or d.upload_id != up.id:
                 raise HTTPException(404, "Draft no válido")
-            text_source = d.refined_text
+            text_source = drafts.draft_text(s, d)
         else:
-            text_source = extract_text(up.path)
-        if not text_source.strip():
+            text_source = None
+        if text_source is not None and not text_source.strip():
             raise HTTPException(400, "No hay texto disponible para procesar")
 
-        # Dividir el texto en secciones basadas en títulos y subtítulos
-        sections = create_sections_from_text(text_source, body.target_minutes)
-        
-        # Crear el script completo combinando todas las secciones
-        script_content = create_full_script(sections)
+        source = ("text", script_cache.text_hash(text_source)) if text_source is not None else ("upload", _upload_hash(s, up))
+        key = (source, body.target_minutes, body.style, SECTIONER_VERSION)
+        cached = script_cache.cache.get(key)
+        if cached is not None:
+            sections, script_content = cached
+        else:
+            # Dividir el texto en secciones basadas en títulos y subtítulos
+            if text_source is None:
+                doc = document.for_upload(up.path, up.content_hash)
+                if not len(doc):
+                    raise HTTPException(400, "No hay texto disponible para procesar")
+                sections = sections_from_blocks(doc.blocks(), body.target_minutes, doc)
+            else:
+                sections = create_sections_from_text(text_source, body.target_minutes)
+            # Crear el script completo combinando todas las secciones
+            script_content = create_full_script(sections)
+            script_cache.cache.put(key, (sections, script_content))
 
-        return {
+        out = {
             "upload_id": body.upload_id,
             "title": up.filename,
-            "script_content": script_content,
-            "sections": sections,
             "target_minutes": body.target_minutes,
             "style": body.style,
             "voice": body.voice or "em_santa"
         }
+        if parts != "sections":
+            out["script_content"] = script_content
+        if parts != "script":
+            out["sections"] = sections
+        return out
 
 @app.post("/process")
 def process(body: ProcessIn):
+    """
+    Crea el episodio y encola la extracción + síntesis; el progreso se sigue
+    con GET /episodes/{id}/events.
+    """
     with get_session() as s:
         up = s.get(Upload, body.upload_id)
         if not up:
             raise HTTPException(404, "Upload no encontrado")
-        # source: text_override > draft > extract
+        # source: text_override > draft > extract (la extracción corre en el trabajo)
+        text_source = None
         if body.text_override:
             text_source = body.text_override
         elif body.draft_id:
@@ -186,36 +312,128 @@ def process(body: ProcessIn):
             d = s.get(Draft, body.draft_id)
             if not d or d.upload_id != up.id:
                 raise HTTPException(404, "Draft no válido")
-            text_source = d.refined_text
-        else:
-            text_source = extract_text(up.path)
-        if not text_source.strip():
+            text_source = drafts.draft_text(s, d)
+        if text_source is not None and not text_source.strip():
             raise HTTPException(400, "No hay texto disponible para procesar")
+        try:
+            lang_code = resolve_lang(body.language, body.voice)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
 
-        from .summarize import summarize_text, script_from_summary
-        summary = summarize_text(text_source, max_sentences=min(18, 3*body.target_minutes))
-        script = script_from_summary(summary)
+        ep = Episode(user_id=1, upload_id=up.id, title=up.filename, voice=body.voice or "default", lang_code=lang_code, duration_sec=body.target_minutes*60, status="pending")  # user_id fijo para testing
+        s.add(ep); s.commit(); s.refresh(ep)
+        pdf_path = up.path
+        content_hash = _upload_hash(s, up)
 
-        pcm_or_wav, sr = synthesize(script, voice=body.voice)
-        if not pcm_or_wav:
-            raise HTTPException(500, "TTS no disponible")
+    submit_episode(ep.id, text_source=text_source, pdf_path=pdf_path, content_hash=content_hash,
+                   max_sentences=min(18, 3*body.target_minutes), voice=body.voice,
+                   full_document=body.full_document, lang_code=lang_code, timeout_sec=body.timeout_sec)
+    return {"episode_id": ep.id, "status": ep.status}
 
-        eid = str(uuid.uuid4())
-        wav_path = os.path.join(AUDIO_DIR, f"{eid}.wav")
-        # If we received a full WAV (fallback), just write it. If PCM16, wrap it.
-        if pcm_or_wav[:4] == b'RIFF':
-            with open(wav_path, "wb") as f:
-                f.write(pcm_or_wav)
-        else:
-            with wave.open(wav_path, 'wb') as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(sr or 24000)
-                wf.writeframes(pcm_or_wav)
+@app.delete("/episodes/{episode_id}/job")
+def cancel_episode_job(episode_id: int):
+    """Cancela el trabajo encolado o en curso del episodio y borra el audio parcial."""
+    with get_session() as s:
+        e = s.get(Episode, episode_id)
+        if not e:
+            raise HTTPException(404, "Episodio no encontrado")
+    if not jobs.cancel_job(episode_id):
+        with get_session() as s:
+            raise HTTPException(409, {"message": "El episodio no tiene un trabajo en curso",
+                                      "status": s.get(Episode, episode_id).status})
+    return {"ok": True, "status": "cancelled"}
 
-        ep = Episode(user_id=1, upload_id=up.id, title=up.filename, voice=body.voice or "default", lang_code=os.getenv("KOKORO_LANG_CODE","e"), duration_sec=body.target_minutes*60, status="ready", audio_path=wav_path)  # user_id fijo para testing
-        s.add(ep); s.commit(); s.refresh(ep)
-        return {"episode_id": ep.id}
+def _sse(event: str, data: dict, event_id: int | None = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Estado guardado que cierra el stream → evento terminal equivalente al del trabajo
+_STATUS_EVENTS = {"ready": "done", "error": "error", "cancelled": "cancelled"}
+
+def _stored_progress(episode_id: int):
+    """(estado, avance) del episodio según la base, o None si ya no existe."""
+    with get_session() as s:
+        e = s.get(Episode, episode_id)
+        if not e:
+            return None
+        if e.status in _STATUS_EVENTS:
+            data = {"audio_sec": e.duration_sec} if e.status == "ready" else {}
+            if e.status == "error":
+                data["message"] = "El trabajo terminó con error"
+            return e.status, data
+        manifest = json.loads(e.checkpoint_json) if e.checkpoint_json else None
+        if not manifest:
+            return e.status, None
+        sr = manifest.get("sample_rate") or 24000
+        marks = manifest.get("marks") or []
+        return e.status, {"stage": "synthesize", "units": manifest.get("units", 0),
+                          "title": marks[-1][0] if marks else None,
+                          "audio_sec": round(manifest.get("samples", 0) / sr, 1)}
+
+@app.get("/episodes/{episode_id}/events")
+async def episode_events(episode_id: int, request: Request, cancel_on_disconnect: bool = False):
+    """
+    Server-Sent Events con las etapas y el progreso del trabajo del episodio.
+    Soporta reconexión con Last-Event-ID. Con `cancel_on_disconnect` el trabajo
+    se cancela si el cliente se va y no vuelve en JOB_DISCONNECT_GRACE_SEC.
+    Si el trabajo corre en otro proceso (otro worker, o se retomó tras un
+    reinicio) se sigue el estado y el checkpoint guardados en la base, con un
+    avance más grueso, hasta que el episodio termina.
+    """
+    with get_session() as s:
+        if not s.get(Episode, episode_id):
+            raise HTTPException(404, "Episodio no encontrado")
+    try:
+        start = int(request.headers.get("last-event-id", "-1")) + 1
+    except ValueError:
+        start = 0
+
+    async def stream():
+        index, idle = start, 0.0
+        finished = False
+        stored = (None, None)
+        if cancel_on_disconnect:
+            jobs.watch(episode_id)
+        try:
+            while not await request.is_disconnected():
+                events = progress.events_since(episode_id, index)
+                if events is None:
+                    snapshot = await asyncio.to_thread(_stored_progress, episode_id)
+                    if snapshot is None:
+                        finished = True
+                        yield _sse("error", {"message": "Episodio no encontrado"})
+                        return
+                    status, data = snapshot
+                    if status in _STATUS_EVENTS:
+                        finished = True
+                        yield _sse(_STATUS_EVENTS[status], data)
+                        return
+                    events = []
+                    if status != stored[0]:
+                        events.append((None, "status", {"status": status}))
+                    if data is not None and data != stored[1]:
+                        events.append((None, "progress", data))
+                    stored = snapshot
+                for i, ev, data in events:
+                    yield _sse(ev, data, i)
+                    if i is not None:
+                        index = i + 1
+                    if ev in progress.TERMINAL_EVENTS:
+                        finished = True
+                        return
+                if events:
+                    idle = 0.0
+                elif idle >= 15:
+                    yield ": keepalive\n\n"
+                    idle = 0.0
+                await asyncio.sleep(0.5)
+                idle += 0.5
+        finally:
+            if cancel_on_disconnect:
+                jobs.unwatch(episode_id, cancel=not finished)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/episodes")
 def list_episodes():
@@ -223,6 +441,38 @@ def list_episodes():
         eps = s.exec(select(Episode).where(Episode.user_id==1).order_by(Episode.created_at.desc())).all()  # user_id fijo para testing
         return [{"id": e.id, "title": e.title, "status": e.status, "duration_sec": e.duration_sec} for e in eps]
 
+@app.get("/episodes/export.zip")
+def export_episodes(ids: str = Query(..., description="ids separados por coma")):
+    """ZIP con el audio (sin recomprimir), el guion y un manifest.json de capítulos, armado en streaming."""
+    try:
+        wanted = [int(x) for x in ids.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(400, "ids inválidos")
+    if not wanted:
+        raise HTTPException(400, "Sin episodios")
+    wanted = list(dict.fromkeys(wanted))
+    if len(wanted) > export.EXPORT_MAX_EPISODES:
+        raise HTTPException(400, f"Como mucho {export.EXPORT_MAX_EPISODES} episodios por exportación")
+    with get_session() as s:
+        rows = {e.id: e for e in s.exec(select(Episode).where(Episode.id.in_(wanted), Episode.user_id == 1)).all()}  # user_id fijo para testing
+    # Todo el audio se abre antes de mandar los headers: si cold storage lo pasa a FLAC
+    # (o lo restaura) mientras sale el ZIP, el archivo abierto se sigue leyendo entero.
+    # Los episodios en frío van como FLAC, tal cual están guardados
+    audio = {i: cold_storage.open_audio(i) for i in wanted if i in rows and rows[i].status == "ready"}
+    missing = [i for i in wanted if audio.get(i) is None]
+    if missing:
+        for f in audio.values():
+            if f is not None:
+                f.close()
+        raise HTTPException(404, f"Episodios no disponibles: {missing}")
+    episodes = [{
+        "id": e.id, "title": e.title, "audio": audio[e.id], "created_at": e.created_at,
+        "duration_sec": e.duration_sec, "sample_rate": e.sample_rate,
+        "chapters": json.loads(e.chapters_json or "[]"), "transcript": e.transcript,
+    } for e in (rows[i] for i in wanted)]
+    return StreamingResponse(export.iter_zip(episodes), media_type="application/zip",
+                             headers={"Content-Disposition": 'attachment; filename="episodios.zip"'})
+
 @app.get("/debug-text/{upload_id}")
 def debug_text(upload_id: int):
     """Endpoint de debug para ver el texto extraído"""
@@ -231,227 +481,81 @@ def debug_text(upload_id: int):
         if not up:
             raise HTTPException(404, "Upload no encontrado")
         
-        text = extract_text(up.path)
+        # Solo se abren las páginas necesarias para los primeros 1000 caracteres
+        text = extract_text(up.path, max_chars=1001)
         return {
             "upload_id": upload_id,
             "filename": up.filename,
             "raw_text": text[:1000] + "..." if len(text) > 1000 else text,
-            "text_length": len(text)
+            "page_count": page_count(up.path),
         }
 
 @app.get("/episodes/{episode_id}/audio")
-def get_audio(episode_id: int):
+def get_audio(episode_id: int, request: Request):
     with get_session() as s:
         e = s.get(Episode, episode_id)
-        if not e or not os.path.exists(e.audio_path):
+        if not e or not e.audio_path:
             raise HTTPException(404, "Audio no disponible")
-        return FileResponse(e.audio_path, media_type="audio/wav", filename=os.path.basename(e.audio_path))
+    cold_storage.touch(e)
+    # Los episodios en frío (FLAC) se restauran a WAV en el primer acceso. Si el
+    # archivo desaparece entre la lectura de la fila y la apertura (se pasó a
+    # FLAC o lo restauró otro worker), se vuelve a leer la fila una vez
+    for attempt in range(2):
+        path = cold_storage.ensure_wav(episode_id) if attempt or e.storage != "wav" else e.audio_path
+        try:
+            return serve_file(request, path, "audio/wav", filename=os.path.basename(path))
+        except FileNotFoundError:
+            continue
+    raise HTTPException(404, "Audio no disponible")
 
-def create_sections_from_text(text: str, target_minutes: int) -> list:
-    """
-    Divide el texto en secciones lógicas basadas en títulos y subtítulos
-    """
-    import re
-    
-    # Limpiar el texto
-    text = re.sub(r'\s+', ' ', text.strip())
-    
-    sections = []
-    section_id = 1
-    
-    # Dividir por títulos principales (UNIDAD, CAPÍTULO, etc.)
-    main_sections = re.split(r'(UNIDAD\s+\d+[:\s]*[^.]*?|CAPÍTULO\s+\d+[:\s]*[^.]*?|\d+\.\s*[A-Z][^.]*?)', text, flags=re.IGNORECASE)
-    
-    if len(main_sections) > 1:
-        # Procesar cada sección principal
-        for i in range(0, len(main_sections), 2):
-            if i + 1 < len(main_sections):
-                title = main_sections[i].strip()
-                content = main_sections[i + 1].strip()
-                
-                if len(content) > 50:
-                    # Dividir la sección en subsecciones si es muy larga
-                    subsections = split_large_section(content, title)
-                    for subsection in subsections:
-                        cleaned_content = clean_and_enhance_content(subsection['content'])
-                        sections.append({
-                            "id": section_id,
-                            "title": subsection['title'][:100],
-                            "content": cleaned_content,
-                            "estimated_duration": max(1, len(cleaned_content.split()) // 150)
-                        })
-                        section_id += 1
-    
-    # Si no se encontraron secciones, dividir por párrafos largos
-    if not sections:
-        # Buscar subtítulos específicos del contenido de criptografía (manejar caracteres especiales)
-        crypto_sections = re.split(r'(CRIPTOGRAF[IÍ]A[^.]*?|CRIPTOAN[ÁA]LISIS[^.]*?|BLOCKCHAIN[^.]*?|HASH[^.]*?|P2P[^.]*?|CONTRATOS INTELIGENTES[^.]*?|SERVICIOS DE LA CRIPTOGRAF[IÍ]A[^.]*?|PRIMITIVAS CRIPTOGR[ÁA]FICAS[^.]*?|UNIDAD\s+\d+[^.]*?|INTRODUCCI[ÓO]N[^.]*?)', text, flags=re.IGNORECASE)
-        
-        if len(crypto_sections) > 1:
-            for i in range(0, len(crypto_sections), 2):
-                if i + 1 < len(crypto_sections):
-                    title = crypto_sections[i].strip()
-                    content = crypto_sections[i + 1].strip()
-                    
-                    if len(content) > 50:
-                        cleaned_content = clean_and_enhance_content(content)
-                        sections.append({
-                            "id": section_id,
-                            "title": title[:100] if title else f"Sección {section_id}",
-                            "content": cleaned_content,
-                            "estimated_duration": max(1, len(cleaned_content.split()) // 150)
-                        })
-                        section_id += 1
-        
-        # Si aún no hay secciones, dividir por párrafos
-        if not sections:
-            paragraphs = re.split(r'\.\s+(?=[A-Z])', text)  # Dividir por oraciones que empiecen con mayúscula
-            current_content = ""
-            
-            for para in paragraphs:
-                para = para.strip()
-                if len(para) > 100:
-                    current_content += para + ". "
-                    
-                    # Crear sección cada ~300 palabras
-                    if len(current_content.split()) > 300:
-                        cleaned_content = clean_and_enhance_content(current_content)
-                        sections.append({
-                            "id": section_id,
-                            "title": f"Sección {section_id}",
-                            "content": cleaned_content,
-                            "estimated_duration": max(1, len(cleaned_content.split()) // 150)
-                        })
-                        section_id += 1
-                        current_content = ""
-            
-            # Agregar contenido restante
-            if current_content.strip():
-                cleaned_content = clean_and_enhance_content(current_content)
-                sections.append({
-                    "id": section_id,
-                    "title": f"Sección {section_id}",
-                    "content": cleaned_content,
-                    "estimated_duration": max(1, len(cleaned_content.split()) // 150)
-                })
-    
-    # Si aún no hay secciones, crear una sección con todo el contenido
-    if not sections:
-        cleaned_content = clean_and_enhance_content(text)
-        sections.append({
-            "id": 1,
-            "title": "Contenido Principal",
-            "content": cleaned_content,
-            "estimated_duration": max(1, len(cleaned_content.split()) // 150)
-        })
-    
-    return sections
-
-def split_large_section(content: str, base_title: str) -> list:
-    """
-    Divide una sección grande en subsecciones más pequeñas
-    """
-    import re
-    
-    subsections = []
-    
-    # Buscar subtítulos dentro de la sección
-    sub_patterns = [
-        r'(CRIPTOGRAFÍA[^.]*?|CRIPTOANÁLISIS[^.]*?|BLOCKCHAIN[^.]*?|HASH[^.]*?|P2P[^.]*?|CONTRATOS INTELIGENTES[^.]*?|SERVICIOS DE LA CRIPTOGRAFÍA[^.]*?|PRIMITIVAS CRIPTOGRÁFICAS[^.]*?)',
-        r'([A-Z][A-Z\s]{10,}?)(?=[A-Z][A-Z\s]{10,}|$)',
-    ]
-    
-    for pattern in sub_patterns:
-        parts = re.split(pattern, content, flags=re.IGNORECASE)
-        if len(parts) > 1:
-            for i in range(0, len(parts), 2):
-                if i + 1 < len(parts):
-                    title = parts[i].strip()
-                    subcontent = parts[i + 1].strip()
-                    
-                    if len(subcontent) > 50:
-                        subsections.append({
-                            "title": title[:100] if title else f"{base_title} - Parte {len(subsections) + 1}",
-                            "content": subcontent
-                        })
-            break
-    
-    # Si no se encontraron subtítulos, dividir por párrafos
-    if not subsections:
-        paragraphs = re.split(r'\.\s+(?=[A-Z])', content)
-        current_content = ""
-        part_num = 1
-        
-        for para in paragraphs:
-            para = para.strip()
-            if len(para) > 100:
-                current_content += para + ". "
-                
-                if len(current_content.split()) > 200:
-                    subsections.append({
-                        "title": f"{base_title} - Parte {part_num}",
-                        "content": current_content
-                    })
-                    part_num += 1
-                    current_content = ""
-        
-        if current_content.strip():
-            subsections.append({
-                "title": f"{base_title} - Parte {part_num}",
-                "content": current_content
-            })
-    
-    return subsections
-
-def clean_and_enhance_content(content: str) -> str:
-    """
-    Limpia y mejora el contenido para que sea más comprensible
-    """
-    import re
-    
-    # Limpiar el texto
-    content = re.sub(r'\s+', ' ', content.strip())
-    
-    # Agregar contexto y explicaciones para términos técnicos (manejar caracteres especiales)
-    enhancements = {
-        r'\bCRIPTOGRAF[IÍ]A\b': 'La criptografía',
-        r'\bCRIPTOAN[ÁA]LISIS\b': 'el criptoanálisis',
-        r'\bBLOCKCHAIN\b': 'la tecnología blockchain',
-        r'\bHASH\b': 'la función hash',
-        r'\bP2P\b': 'las redes peer-to-peer',
-        r'\bCONTRATOS INTELIGENTES\b': 'los contratos inteligentes',
-        r'\bUNIDAD\s+\d+\b': 'En esta unidad',
-        r'\bINTRODUCCI[ÓO]N\b': 'Para introducir',
-    }
-    
-    for pattern, replacement in enhancements.items():
-        content = re.sub(pattern, replacement, content, flags=re.IGNORECASE)
-    
-    # Agregar conectores para mejorar la fluidez
-    content = re.sub(r'([.!?])\s*([A-Z])', r'\1 Además, \2', content)
-    content = re.sub(r'([.!?])\s*([A-Z])', r'\1 Por otro lado, \2', content)
-    
-    # Limpiar dobles conectores
-    content = re.sub(r'(Además, )+', 'Además, ', content)
-    content = re.sub(r'(Por otro lado, )+', 'Por otro lado, ', content)
-    
-    return content
-
-def create_full_script(sections: list) -> str:
-    """
-    Crea el script completo combinando todas las secciones
-    """
-    intro = "Bienvenidos. Hoy repasamos los puntos clave de la clase. "
-    outro = " Gracias por escuchar. Repite este episodio para consolidar y consulta tus apuntes."
-    
-    script_parts = [intro]
-    
-    for i, section in enumerate(sections):
-        script_parts.append(f"## {section['title']}")
-        script_parts.append(section['content'])
-        if i < len(sections) - 1:
-            script_parts.append("Ahora pasemos al siguiente tema.")
-    
-    script_parts.append(outro)
-    
-    return " ".join(script_parts)
+@app.get("/episodes/{episode_id}/chapters")
+def get_chapters(episode_id: int):
+    """Índice de capítulos: inicio de cada sección en muestras y segundos."""
+    with get_session() as s:
+        e = s.get(Episode, episode_id)
+        if not e or e.status != "ready":
+            raise HTTPException(404, "Episodio no disponible")
+        return {
+            "episode_id": e.id,
+            "duration_sec": e.duration_sec,
+            "sample_rate": e.sample_rate,
+            # start_byte asume el header PCM de 44 bytes que escribe `wave`
+            "chapters": [dict(c, start_byte=44 + 2 * c["start_sample"]) for c in json.loads(e.chapters_json or "[]")],
+        }
+
+def _waveform_ready(episode_id: int):
+    """Asegura los picos y la vista previa; los episodios ya en FLAC sin ellos no se restauran por esto."""
+    with get_session() as s:
+        e = s.get(Episode, episode_id)
+        if not e or e.status != "ready" or not e.audio_path:
+            raise HTTPException(404, "Episodio no disponible")
+        chapters = json.loads(e.chapters_json or "[]")
+    if not (os.path.exists(waveform.peaks_path(episode_id)) and os.path.exists(waveform.preview_path(episode_id))):
+        if e.storage != "wav" or not os.path.exists(e.audio_path):
+            raise HTTPException(404, "Forma de onda no disponible")
+        waveform.ensure(episode_id, e.audio_path, chapters)
+
+@app.get("/episodes/{episode_id}/peaks")
+def get_peaks(episode_id: int, request: Request, bins: int = Query(0, ge=0)):
+    """Picos min/max (formato audiowaveform, 8 bits); `bins` baja la resolución para miniaturas."""
+    _waveform_ready(episode_id)
+    path = waveform.peaks_path(episode_id)
+    with open(path, "rb") as f:
+        body = f.read()
+    if bins:
+        body = json.dumps(waveform.reduce(json.loads(body), bins), separators=(",", ":")).encode()
+    return cached_json(request, body, file_etag(path)[:-1] + f'-{bins}"')
+
+@app.get("/episodes/{episode_id}/preview")
+def get_preview(episode_id: int, request: Request):
+    """Fragmento corto del episodio (WAV liviano) para escuchar sin bajar el audio completo."""
+    _waveform_ready(episode_id)
+    return serve_file(request, waveform.preview_path(episode_id), "audio/wav")
+
+@app.get("/episodes/{episode_id}/stats")
+def get_episode_stats(episode_id: int):
+    """Recursos de cada etapa del trabajo (una fila por etapa y por corrida, si se retomó)."""
+    with get_session() as s:
+        if not s.get(Episode, episode_id):
+            raise HTTPException(404, "Episodio no encontrado")
+    return accounting.episode_stats(episode_id)
@@ -0,0 +1,173 @@
+import gzip
+import os
+import re
+from email.utils import formatdate
+from typing import Iterator, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # brotli es opcional; gzip siempre está disponible
+    brotli = None
+
+CHUNK_SIZE = 256 * 1024
+AUDIO_MAX_AGE = int(os.getenv("AUDIO_MAX_AGE", "86400"))
+COMPRESS_MIN_SIZE = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html", "text/markdown")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$", re.I)
+
+def _etag(st: os.stat_result) -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+def file_etag(path: str) -> str:
+    """ETag fuerte a partir de tamaño y mtime (los audios no se reescriben en el lugar)."""
+    return _etag(os.stat(path))
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Rango único `bytes=a-b`, `bytes=a-` o `bytes=-n`. None si el header no es
+    válido (se ignora y se sirve el archivo entero, RFC 9110 §14.2); 416 si es
+    válido pero no se puede satisfacer (empieza después del final o `-0`).
+    """
+    m = _RANGE_RE.match(header.strip())
+    if not m or m.group(1) == m.group(2) == "":
+        return None
+    first, last = m.groups()
+    if first == "":
+        length = int(last)
+        if length == 0 or size == 0:
+            raise HTTPException(416, headers={"Content-Range": f"bytes */{size}"})
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    end = int(last) if last else size - 1
+    if start >= size:
+        raise HTTPException(416, headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+def _iter_file(f, start: int, end: int) -> Iterator[bytes]:
+    with f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = f.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+def serve_file(request: Request, path: str, media_type: str, filename: Optional[str] = None,
+               max_age: int = AUDIO_MAX_AGE) -> Response:
+    """
+    Sirve un archivo con ETag fuerte, Cache-Control, 304 por If-None-Match y
+    respuestas 206 para `Range` (respetando If-Range). El archivo se abre acá:
+    si después lo borran (p. ej. al pasarlo a FLAC) la respuesta igual sale
+    completa; si ya no existe, FileNotFoundError.
+    """
+    f = open(path, "rb")
+    try:
+        return _serve_open(request, f, media_type, filename, max_age)
+    except BaseException:
+        f.close()
+        raise
+
+def _serve_open(request: Request, f, media_type: str, filename: Optional[str], max_age: int) -> Response:
+    st = os.fstat(f.fileno())
+    size = st.st_size
+    etag = _etag(st)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"public, max-age={max_age}",
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+    }
+    if filename:
+        headers["Content-Disposition"] = f'inline; filename="{filename}"'
+
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]):
+        f.close()
+        return Response(status_code=304, headers=headers)
+
+    rng = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if rng and if_range and if_range.strip() != etag:
+        rng = None
+    span = _parse_range(rng, size) if rng else None
+    if span is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_iter_file(f, 0, size - 1), media_type=media_type, headers=headers)
+    start, end = span
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_iter_file(f, start, end), status_code=206, media_type=media_type, headers=headers)
+
+def cached_json(request: Request, body: bytes, etag: str, max_age: int = AUDIO_MAX_AGE) -> Response:
+    """JSON ya serializado con ETag y Cache-Control; un solo cuerpo, así lo comprime el middleware."""
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def _encoding_for(accept: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+class CompressionMiddleware:
+    """
+    Comprime con brotli (si está instalado) o gzip las respuestas JSON/texto de
+    un solo cuerpo. El audio, los rangos y el SSE pasan sin tocar, a diferencia
+    de GZipMiddleware que comprimiría también los StreamingResponse.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept-encoding"), "")
+        encoding = _encoding_for(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                ctype = headers.get(b"content-type", b"").decode("latin-1")
+                if ctype.startswith(COMPRESSIBLE_TYPES) and b"content-encoding" not in headers:
+                    start = message  # se envía junto con el cuerpo, ya comprimido
+                    return
+                await send(message)
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            held, start = start, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(held)
+                await send(message)
+                return
+            body = brotli.compress(body, quality=5) if encoding == "br" else gzip.compress(body, compresslevel=6)
+            vary = b", ".join([v for k, v in held.get("headers", []) if k.lower() == b"vary"] + [b"Accept-Encoding"])
+            headers = [(k, v) for k, v in held.get("headers", []) if k.lower() not in (b"content-length", b"vary")]
+            headers += [(b"content-encoding", encoding.encode()), (b"content-length", str(len(body)).encode()),
+                        (b"vary", vary)]
+            await send({**held, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,149 @@
+"""
+Servidor local de modelos Kokoro.
+
+Carga una o varias réplicas del modelo Kokoro en un único proceso y atiende a
+los workers HTTP por un socket Unix, así N workers de uvicorn no cargan N copias
+del modelo. Cada réplica tiene sus pipelines por idioma (ver PipelinePool). Uso:
+
+    KOKORO_SERVER_SOCKET=data/run/kokoro.sock python -m app.model_server --replicas 2
+    KOKORO_SERVER_SOCKET=data/run/kokoro.sock uvicorn app.main:app --workers 8
+
+El protocolo usa pickle, así que solo se aceptan clientes autenticados: con
+KOKORO_SERVER_AUTHKEY vacío el servidor genera una clave aleatoria en
+KOKORO_SERVER_KEYFILE (0600) que los clientes leen. El socket queda en modo
+0600 y su directorio, si lo crea el servidor, en 0700.
+
+Protocolo (multiprocessing.connection): el cliente envía un dict
+{"op": "synthesize" | "voices" | "metrics", ...} ("synthesize" lleva "text",
+"voice" y opcionalmente "lang") y recibe tuplas ("chunk", pcm16) ...
+("end", sample_rate), ("voices", [...]), ("metrics", {...}) o ("error", mensaje).
+"""
+import argparse
+import os
+import queue
+import secrets
+import threading
+from multiprocessing.connection import Listener, answer_challenge, deliver_challenge
+
+from . import g2p_cache
+from . import kokoro_provider as kp
+from .paths import DATA_DIR
+
+DEFAULT_SOCKET = os.path.join(DATA_DIR, "run", "kokoro.sock")
+
+def _server_authkey() -> bytes:
+    """KOKORO_SERVER_AUTHKEY, o una clave nueva escrita en KOKORO_SERVER_KEYFILE solo para este usuario."""
+    if kp.KOKORO_SERVER_AUTHKEY:
+        return kp.KOKORO_SERVER_AUTHKEY
+    key = secrets.token_hex(32).encode()
+    tmp = f"{kp.KOKORO_SERVER_KEYFILE}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    os.replace(tmp, kp.KOKORO_SERVER_KEYFILE)
+    return key
+
+def _metrics(replicas) -> dict:
+    # Estado local: kp.metrics() con KOKORO_SERVER_SOCKET se consultaría a sí mismo
+    return {
+        "g2p_cache": g2p_cache.cache.stats(),
+        "coalescer": kp._coalescer.stats() if kp._coalescer is not None else None,
+        "pipelines": [r.stats() for r in replicas],
+    }
+
+def _authenticate(conn, authkey: bytes) -> bool:
+    # El handshake corre en el hilo del cliente: uno lento no frena al resto
+    try:
+        deliver_challenge(conn, authkey)
+        answer_challenge(conn, authkey)
+        return True
+    except Exception as e:
+        print(f"Rejected connection: {e}")
+        conn.close()
+        return False
+
+def _handle(conn, authkey: bytes, pool: "queue.Queue", replicas, voices):
+    if not _authenticate(conn, authkey):
+        return
+    with conn:
+        try:
+            req = conn.recv()
+            if req.get("op") == "voices":
+                conn.send(("voices", voices))
+                return
+            if req.get("op") == "metrics":
+                conn.send(("metrics", _metrics(replicas)))
+                return
+            lang_code = kp.resolve_lang(req.get("lang"), req["voice"])
+            if kp._coalescer is not None:
+                # Las réplicas las maneja la cola de segmentos; este hilo solo espera sus segmentos
+                for arr in kp._coalesced_chunks(kp._coalescer, req["text"], req["voice"], lang_code):
+                    conn.send(("chunk", kp._to_pcm16(arr)))
+            else:
+                replica = pool.get()
+                try:
+                    for arr in kp._kokoro_chunks(replica.get(lang_code), req["text"], req["voice"]):
+                        conn.send(("chunk", kp._to_pcm16(arr)))
+                finally:
+                    pool.put(replica)
+            conn.send(("end", req.get("sample_rate", 24000)))
+        except (EOFError, OSError) as e:
+            # El cliente cortó la conexión: se libera la réplica y se descarta el trabajo
+            print(f"Client disconnected: {e}")
+        except Exception as e:
+            print(f"Synthesis error: {e}")
+            try:
+                conn.send(("error", str(e)))
+            except OSError:
+                pass
+
+def serve(socket_path: str, replicas: int):
+    # Este proceso es el servidor: nada de lo que llame debe usar el cliente
+    kp.KOKORO_SERVER_SOCKET = ""
+    authkey = _server_authkey()
+    if kp.KOKORO_TORCH_THREADS <= 0:
+        # Repartir los núcleos entre réplicas para no sobresuscribir la CPU
+        kp.tune_threads(max(1, (os.cpu_count() or 1) // replicas))
+    pool: "queue.Queue" = queue.Queue()
+    for i in range(replicas):
+        print(f"Loading Kokoro replica {i + 1}/{replicas}...")
+        pool.put(kp._new_pool())
+    replicas_list = list(pool.queue)
+    voices = kp._voices_of(replicas_list[0].get(kp.DEFAULT_LANG_CODE))
+    if kp.KOKORO_COALESCE and replicas > 1:
+        kp.get_coalescer(replicas_list)
+    elif kp.KOKORO_COALESCE:
+        # Con una sola réplica la cola no reparte nada: solo agregaría KOKORO_COALESCE_WAIT_MS por grupo
+        print("KOKORO_COALESCE requiere --replicas > 1; se ignora")
+
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    if not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, mode=0o700)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    # umask durante el bind para que el socket nunca exista con permisos abiertos
+    old_umask = os.umask(0o177)
+    try:
+        listener = Listener(socket_path, family="AF_UNIX")
+    finally:
+        os.umask(old_umask)
+    os.chmod(socket_path, 0o600)
+    with listener:
+        print(f"Kokoro model server listening on {socket_path} ({replicas} replicas)")
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError as e:
+                print(f"Accept failed: {e}")
+                continue
+            threading.Thread(target=_handle, args=(conn, authkey, pool, replicas_list, voices), daemon=True).start()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de modelos Kokoro")
+    parser.add_argument("--socket", default=kp.KOKORO_SERVER_SOCKET or DEFAULT_SOCKET)
+    parser.add_argument("--replicas", type=int, default=int(os.getenv("KOKORO_SERVER_REPLICAS", "1")))
+    args = parser.parse_args()
+    serve(args.socket, max(1, args.replicas))
+
+if __name__ == "__main__":
+    main()
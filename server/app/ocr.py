@@ -0,0 +1,136 @@
+import hashlib
+import itertools
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+import fitz  # PyMuPDF
+
+from .paths import DATA_DIR
+
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_LANG = os.getenv("OCR_LANG", "spa")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+# Páginas encargadas por delante del consumidor (iter_ocr_pages); por defecto, dos por worker
+OCR_AHEAD = int(os.getenv("OCR_AHEAD", "0")) or 2 * max(1, OCR_WORKERS)
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", os.path.join(DATA_DIR, "ocr_cache"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Documento abierto en cada worker: las páginas de un mismo PDF llegan seguidas
+_worker_doc: Optional[Tuple[str, "fitz.Document"]] = None
+
+def tesseract_available() -> bool:
+    return shutil.which("tesseract") is not None
+
+def _cache_path(key: str) -> str:
+    return os.path.join(OCR_CACHE_DIR, key[:2], key + ".txt")
+
+def _run_tesseract(png: bytes, lang: str) -> str:
+    # Cada tesseract corre con un solo hilo: el paralelismo lo da el pool
+    env = dict(os.environ, OMP_THREAD_LIMIT="1")
+    out = subprocess.run(["tesseract", "stdin", "stdout", "-l", lang], input=png, capture_output=True, check=True, env=env)
+    return out.stdout.decode("utf-8", "replace")
+
+def _write_cache(key: str, text: str):
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Nombre único: dos trabajos pueden hacer OCR de la misma página a la vez
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def _page_png(pdf_path: str, pno: int, dpi: int) -> bytes:
+    global _worker_doc
+    if _worker_doc is None or _worker_doc[0] != pdf_path:
+        if _worker_doc is not None:
+            _worker_doc[1].close()
+        _worker_doc = (pdf_path, fitz.open(pdf_path))
+    return _worker_doc[1].load_page(pno).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes("png")
+
+def _ocr_page(pdf_path: str, pno: int, dpi: int, lang: str) -> Tuple[str, bool]:
+    """Corre en un worker: rasteriza la página, la busca en caché y si no, le hace OCR. (texto, desde caché)."""
+    png = _page_png(pdf_path, pno, dpi)
+    key = hashlib.sha256(png + f"|{lang}|{dpi}".encode()).hexdigest()
+    try:
+        with open(_cache_path(key), encoding="utf-8") as f:
+            return f.read(), True
+    except FileNotFoundError:
+        pass
+    text = _run_tesseract(png, lang)
+    _write_cache(key, text)
+    return text, False
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: el proceso que llama tiene hilos (servidor, trabajos) y fork con hilos no es seguro
+            _pool = ProcessPoolExecutor(max_workers=max(1, OCR_WORKERS), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _reset_pool(pool: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def iter_ocr_pages(pdf_path: str, page_numbers: Iterable[int], dpi: int = OCR_DPI, lang: str = OCR_LANG,
+                   ahead: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    (página, texto) en el orden pedido. La rasterización y el OCR corren en un
+    pool de procesos con a lo sumo `ahead` (OCR_AHEAD) páginas encargadas por delante del
+    consumidor, así la memoria no depende de la cantidad de páginas escaneadas.
+    El resultado se cachea en disco por hash de la imagen de la página, así que
+    reprocesar el mismo documento (o páginas repetidas) no vuelve a hacer OCR.
+    """
+    page_numbers = iter(page_numbers)
+    first = next(page_numbers, None)
+    if first is None:
+        return
+    if not tesseract_available():
+        print("Tesseract no está instalado; se omite el OCR de páginas escaneadas")
+        return
+
+    pool = _get_pool()
+    pending: "deque" = deque()
+    counts = {"processed": 0, "cached": 0}
+
+    def collect() -> Tuple[int, str]:
+        pno, fut = pending.popleft()
+        try:
+            text, from_cache = fut.result()
+        except BrokenProcessPool as e:
+            # Un worker murió (p. ej. sin memoria): el pool no se recupera, el próximo pedido arma otro
+            print(f"OCR error en página {pno}: {e}")
+            _reset_pool(pool)
+            raise
+        except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+            print(f"OCR error en página {pno}: {e}")
+            return pno, ""
+        counts["cached" if from_cache else "processed"] += 1
+        return pno, text
+
+    try:
+        for pno in itertools.chain([first], page_numbers):
+            pending.append((pno, pool.submit(_ocr_page, pdf_path, pno, dpi, lang)))
+            if len(pending) >= max(1, ahead or OCR_AHEAD):
+                yield collect()
+        while pending:
+            yield collect()
+    finally:
+        for _, fut in pending:
+            fut.cancel()
+        print(f"OCR: {counts['processed']} páginas procesadas, {counts['cached']} desde caché")
+
+def ocr_pages(pdf_path: str, page_numbers: Iterable[int], dpi: int = OCR_DPI, lang: str = OCR_LANG) -> Dict[int, str]:
+    """Rasteriza solo las páginas indicadas y las pasa por Tesseract en paralelo (ver iter_ocr_pages)."""
+    return dict(iter_ocr_pages(pdf_path, page_numbers, dpi, lang))
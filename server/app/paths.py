@@ -0,0 +1,7 @@
+import os
+
+DATA_DIR = os.path.abspath(os.getenv("DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "data")))
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
+AUDIO_DIR = os.path.join(DATA_DIR, "audio")
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(AUDIO_DIR, exist_ok=True)
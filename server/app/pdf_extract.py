@@ -1,8 +1,313 @@
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import fitz  # PyMuPDF
 
-def extract_text(pdf_path: str) -> str:
-    doc = fitz.open(pdf_path)
+from .ocr import iter_ocr_pages, ocr_pages
+
+BOLD_FLAG = 16  # bit de negrita en span["flags"]
+HEADING_SIZE_RATIO = 1.15
+MAX_HEADING_CHARS = 120
+
+# Encabezados, pies, números de página y marcas de agua: líneas cortas que se
+# repiten en al menos esa fracción de las páginas. Las líneas cortas con números
+# se comparan con los números normalizados ("Página 3 de 40" ~ "Página 4 de 40")
+BOILERPLATE_MIN_RATIO = float(os.getenv("BOILERPLATE_MIN_RATIO", "0.5"))
+BOILERPLATE_MIN_PAGES = int(os.getenv("BOILERPLATE_MIN_PAGES", "3"))
+BOILERPLATE_MAX_CHARS = 120
+BOILERPLATE_NUMBERED_MAX_CHARS = 60
+# Si lo repetido supera esta fracción del texto, el documento es repetitivo de por sí y no se filtra
+BOILERPLATE_MAX_SHARE = float(os.getenv("BOILERPLATE_MAX_SHARE", "0.5"))
+# En streaming el índice se arma con las primeras páginas antes de empezar a producir bloques
+BOILERPLATE_SAMPLE_PAGES = int(os.getenv("BOILERPLATE_SAMPLE_PAGES", "12"))
+_DIGITS_RE = re.compile(r"\d+")
+
+def line_keys(text: str) -> List[str]:
+    """Claves de una línea en el índice: el texto canónico y, si es corta y tiene números, su patrón."""
+    key = " ".join(text.lower().split()).strip(" -–—|·•")
+    if len(text) > BOILERPLATE_NUMBERED_MAX_CHARS or not _DIGITS_RE.search(key):
+        return [key]
+    return [key, "#:" + _DIGITS_RE.sub("#", key)]
+
+class BoilerplateFilter:
+    """
+    Índice de frecuencia de líneas por página. `add_page` registra las líneas de
+    una página (cada clave cuenta una vez por página) y `keep` descarta las que
+    el índice marca como repetidas, acumulando lo ahorrado para `report()`.
+    `numbered=False` compara solo el texto exacto (títulos como "Capítulo 3",
+    que cambian de página en página pero no son encabezados).
+    """
+
+    def __init__(self, min_ratio: float = BOILERPLATE_MIN_RATIO, min_pages: int = BOILERPLATE_MIN_PAGES):
+        self.min_ratio = min_ratio
+        self.min_pages = min_pages
+        self.pages = 0
+        self.page_counts: Counter = Counter()
+        self.lines_removed = self.chars_removed = self.words_removed = 0
+        self.enabled = True
+
+    def add_page(self, lines: Iterable[str]):
+        self.pages += 1
+        self.page_counts.update({k for t in lines if len(t) <= BOILERPLATE_MAX_CHARS for k in line_keys(t)})
+
+    def is_boilerplate(self, text: str, numbered: bool = True) -> bool:
+        if not self.enabled or len(text) > BOILERPLATE_MAX_CHARS:
+            return False
+        keys = line_keys(text) if numbered else line_keys(text)[:1]
+        n = max(self.page_counts[k] for k in keys)
+        return n >= self.min_pages and n >= self.min_ratio * self.pages
+
+    def calibrate(self, lines: Iterable[Tuple[str, bool]]):
+        """Con (texto, numbered) de las páginas indexadas: se apaga si quitaría demasiado."""
+        total = removed = 0
+        for text, numbered in lines:
+            total += len(text)
+            if self.is_boilerplate(text, numbered):
+                removed += len(text)
+        if total and removed > BOILERPLATE_MAX_SHARE * total:
+            self.enabled = False
+
+    def keep(self, text: str, numbered: bool = True) -> bool:
+        if not self.is_boilerplate(text, numbered):
+            return True
+        self.lines_removed += 1
+        self.chars_removed += len(text)
+        self.words_removed += len(text.split())
+        return False
+
+    def report(self) -> Dict:
+        from .sections import WORDS_PER_MINUTE
+        return {
+            "enabled": self.enabled,
+            "pages": self.pages,
+            "lines_removed": self.lines_removed,
+            "chars_removed": self.chars_removed,
+            # Segundos de audio que no hace falta sintetizar (ni escuchar)
+            "est_seconds_saved": round(self.words_removed / WORDS_PER_MINUTE * 60, 1),
+        }
+
+def _page_numbers(doc, pages: Optional[Tuple[int, Optional[int]]]) -> range:
+    """Rango de páginas (inicio inclusivo, fin exclusivo o None: hasta el final) acotado al documento."""
+    if pages is None:
+        return range(doc.page_count)
+    start, end = pages
+    start = max(0, start)
+    end = doc.page_count if end is None else min(end, doc.page_count)
+    return range(start, end)
+
+def _scanned_pages(doc, page_range: range) -> List[int]:
+    """Páginas del rango sin capa de texto (no referencian ninguna fuente)."""
+    return [pno for pno in page_range if not doc.get_page_fonts(pno)]
+
+def _next_ocr(ocr_iter: Iterator[Tuple[int, str]], pno: int, scanned: set) -> Optional[str]:
+    """Texto OCR de `pno` si es escaneada; `ocr_iter` entrega las de `scanned` en orden."""
+    if pno not in scanned:
+        return None
+    for done, text in ocr_iter:
+        if done == pno:
+            return text
+    return None
+
+ProgressHook = Callable[[int, int], None]  # (páginas procesadas, total)
+
+def extract_text(pdf_path: str, max_chars: Optional[int] = None, pages: Optional[Tuple[int, Optional[int]]] = None, ocr: bool = False,
+                 on_page: Optional[ProgressHook] = None, boilerplate: Optional[BoilerplateFilter] = None) -> str:
+    """
+    Extrae el texto del documento. Con `max_chars` deja de abrir páginas en cuanto
+    se alcanza el límite, así una vista previa no depende del tamaño del PDF.
+    Con `ocr=True` las páginas sin capa de texto se pasan por OCR.
+    Con `boilerplate` se quitan las líneas repetidas entre las páginas leídas.
+    """
     texts = []
-    for page in doc:
-        texts.append(page.get_text("text"))
-    return "\n".join(texts)
+    total = 0
+    with fitz.open(pdf_path) as doc:
+        page_range = _page_numbers(doc, pages)
+        # El OCR se encarga por delante y se corta junto con la lectura si se llega a max_chars
+        scanned = _scanned_pages(doc, page_range) if ocr else []
+        ocr_iter = iter_ocr_pages(pdf_path, scanned)
+        scanned = set(scanned)
+        try:
+            for pno in page_range:
+                page_text = _next_ocr(ocr_iter, pno, scanned) or doc.load_page(pno).get_text("text")
+                texts.append(page_text)
+                total += len(page_text) + 1
+                if on_page:
+                    on_page(len(texts), len(page_range))
+                if max_chars is not None and total >= max_chars:
+                    break
+        finally:
+            ocr_iter.close()
+    if boilerplate is not None:
+        page_lines = [[ln.strip() for ln in t.splitlines()] for t in texts]
+        for lines in page_lines:
+            boilerplate.add_page(ln for ln in lines if ln)
+        boilerplate.calibrate((ln, True) for lines in page_lines for ln in lines)
+        texts = ["\n".join(ln for ln in lines if not ln or boilerplate.keep(ln)) for lines in page_lines]
+    text = "\n".join(texts)
+    return text[:max_chars] if max_chars is not None else text
+
+def page_count(pdf_path: str) -> int:
+    """Cantidad de páginas, leída del índice del PDF sin abrir ninguna página."""
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+def document_info(pdf_path: str) -> Dict:
+    """
+    Metadatos del documento sin extraer texto: cantidad de páginas y si cada
+    página tiene capa de texto (se mira si la página referencia fuentes). Recorre
+    todas las páginas; si solo hace falta la cantidad, usar `page_count`.
+    """
+    with fitz.open(pdf_path) as doc:
+        scanned = _scanned_pages(doc, range(doc.page_count))
+        scanned_set = set(scanned)
+        return {
+            "page_count": doc.page_count,
+            "has_text_layer": [pno not in scanned_set for pno in range(doc.page_count)],
+            "pages_without_text": scanned,
+        }
+
+def _page_lines(doc, pno: int, ocr_text: Dict[int, str]) -> List[Tuple[str, Optional[float], bool, Tuple[int, int]]]:
+    """Líneas de una página como (texto, tamaño, negrita, id de bloque)."""
+    lines = []
+    if pno in ocr_text:
+        # El OCR no tiene tipografía: cada párrafo es un bloque de cuerpo
+        for i, para in enumerate(ocr_text[pno].split("\n\n")):
+            for line in para.splitlines():
+                if line.strip():
+                    lines.append((line.strip(), None, False, (pno, i)))
+        return lines
+    for block in doc.load_page(pno).get_text("dict")["blocks"]:
+        if block.get("type", 0) != 0:
+            continue
+        for line in block["lines"]:
+            spans = [sp for sp in line["spans"] if sp["text"].strip()]
+            if not spans:
+                continue
+            text = "".join(sp["text"] for sp in spans).strip()
+            size = round(max(sp["size"] for sp in spans), 1)
+            bold = all(sp["flags"] & BOLD_FLAG for sp in spans)
+            lines.append((text, size, bold, (pno, block["number"])))
+    return lines
+
+def _classify(lines, chars_by_size: Counter) -> List[Dict]:
+    """Convierte líneas en bloques de título/párrafo según el tamaño de cuerpo."""
+    # El tamaño de cuerpo es el que acumula más caracteres; los mayores son títulos
+    body_size = _body_size(chars_by_size)
+    heading_sizes = sorted((sz for sz in chars_by_size if sz >= body_size * HEADING_SIZE_RATIO), reverse=True) if body_size else []
+    levels = {sz: i + 1 for i, sz in enumerate(heading_sizes)}
+
+    blocks: List[Dict] = []
+    prev_key = None
+    for text, size, bold, key in lines:
+        level = levels.get(size)
+        if level is None and bold and len(text) <= MAX_HEADING_CHARS and not text.endswith((".", ":")):
+            level = len(heading_sizes) + 1
+        kind = "heading" if level is not None and len(text) <= MAX_HEADING_CHARS * 2 else "paragraph"
+        last = blocks[-1] if blocks else None
+        if last is not None and key == prev_key and last["type"] == kind and last["level"] == (level if kind == "heading" else 0):
+            # Misma caja de texto: se une la línea (títulos en varias líneas o párrafos)
+            if last["text"].endswith("-"):
+                last["text"] = last["text"][:-1] + text
+            else:
+                last["text"] += " " + text
+        else:
+            blocks.append({"type": kind, "level": level if kind == "heading" else 0, "text": text})
+        prev_key = key
+    return blocks
+
+def _count_sizes(lines, chars_by_size: Counter):
+    for text, size, _bold, _key in lines:
+        if size is not None:
+            chars_by_size[size] += len(text)
+
+def _body_size(chars_by_size: Counter) -> float:
+    return chars_by_size.most_common(1)[0][0] if chars_by_size else 0
+
+def _numbered(size: Optional[float], body_size: float) -> bool:
+    # Las líneas más grandes que el cuerpo (títulos) solo se quitan si se repiten textuales
+    return size is None or not body_size or size <= body_size
+
+def _drop_boilerplate(lines, boilerplate: Optional[BoilerplateFilter], body_size: float):
+    if boilerplate is None:
+        return lines
+    return [ln for ln in lines if boilerplate.keep(ln[0], _numbered(ln[1], body_size))]
+
+def _calibrate(boilerplate: BoilerplateFilter, pages_lines) -> float:
+    """Ajusta el filtro con las páginas retenidas; devuelve el tamaño de cuerpo visto en ellas."""
+    sizes: Counter = Counter()
+    for page in pages_lines:
+        _count_sizes(page, sizes)
+    body_size = _body_size(sizes)
+    boilerplate.calibrate((ln[0], _numbered(ln[1], body_size)) for page in pages_lines for ln in page)
+    return body_size
+
+def extract_structure(pdf_path: str, pages: Optional[Tuple[int, Optional[int]]] = None, ocr: bool = False, on_page: Optional[ProgressHook] = None,
+                      boilerplate: Optional[BoilerplateFilter] = None) -> List[Dict]:
+    """
+    Extrae el documento como una lista plana de bloques {"type", "level", "text"}
+    (type = "heading" | "paragraph") usando tamaños de fuente y negritas de
+    `page.get_text("dict")`. El nivel 1 corresponde al título más grande.
+    Con `ocr=True` las páginas escaneadas se agregan como párrafos del OCR.
+    Con `boilerplate` se quitan encabezados, pies y demás líneas repetidas.
+    """
+    pages_lines = []
+    chars_by_size: Counter = Counter()
+    with fitz.open(pdf_path) as doc:
+        page_range = _page_numbers(doc, pages)
+        ocr_text = ocr_pages(pdf_path, _scanned_pages(doc, page_range)) if ocr else {}
+        for done, pno in enumerate(page_range, 1):
+            if on_page:
+                on_page(done, len(page_range))
+            page = _page_lines(doc, pno, ocr_text)
+            if boilerplate is not None:
+                boilerplate.add_page(ln[0] for ln in page)
+            pages_lines.append(page)
+    body_size = _calibrate(boilerplate, pages_lines) if boilerplate is not None else 0
+    lines = [ln for page in pages_lines for ln in _drop_boilerplate(page, boilerplate, body_size)]
+    _count_sizes(lines, chars_by_size)
+    return _classify(lines, chars_by_size)
+
+def iter_blocks(pdf_path: str, ocr: bool = False, on_page: Optional[ProgressHook] = None,
+                boilerplate: Optional[BoilerplateFilter] = None) -> Iterator[Dict]:
+    """
+    Variante en streaming de `extract_structure`: abre una página por vez y
+    clasifica sus líneas contra el tamaño de cuerpo visto hasta ese momento,
+    así la memoria no depende de la cantidad de páginas. Con `boilerplate` las
+    primeras BOILERPLATE_SAMPLE_PAGES páginas se retienen para armar el índice
+    de líneas repetidas; después se sigue actualizando página a página.
+    """
+    chars_by_size: Counter = Counter()
+    held: List[List] = []
+
+    def emit(lines, body_size: float):
+        lines = _drop_boilerplate(lines, boilerplate, body_size)
+        _count_sizes(lines, chars_by_size)
+        return _classify(lines, chars_by_size)
+
+    with fitz.open(pdf_path) as doc:
+        # Las páginas escaneadas se encargan al pool de OCR por delante de la que se está leyendo
+        scanned = _scanned_pages(doc, range(doc.page_count)) if ocr else []
+        ocr_iter = iter_ocr_pages(pdf_path, scanned)
+        scanned = set(scanned)
+        try:
+            for pno in range(doc.page_count):
+                text = _next_ocr(ocr_iter, pno, scanned)
+                lines = _page_lines(doc, pno, {pno: text} if text is not None else {})
+                if on_page:
+                    on_page(pno + 1, doc.page_count)
+                if boilerplate is None:
+                    yield from emit(lines, 0)
+                    continue
+                boilerplate.add_page(ln[0] for ln in lines)
+                if pno >= BOILERPLATE_SAMPLE_PAGES:
+                    yield from emit(lines, _body_size(chars_by_size))
+                    continue
+                held.append(lines)
+                if pno + 1 == min(BOILERPLATE_SAMPLE_PAGES, doc.page_count):
+                    body_size = _calibrate(boilerplate, held)
+                    for page in held:
+                        yield from emit(page, body_size)
+                    held = []
+        finally:
+            ocr_iter.close()
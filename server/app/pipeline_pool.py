@@ -0,0 +1,81 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# Presupuesto de memoria para los pipelines por idioma (el modelo compartido no cuenta)
+KOKORO_PIPELINE_BUDGET_MB = int(os.getenv("KOKORO_PIPELINE_BUDGET_MB", "1024"))
+KOKORO_MAX_PIPELINES = int(os.getenv("KOKORO_MAX_PIPELINES", "4"))
+# Estimación cuando no se puede medir el RSS (fuera de Linux)
+KOKORO_PIPELINE_MB = int(os.getenv("KOKORO_PIPELINE_MB", "150"))
+
+def rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            resident = int(f.read().split()[1])
+        return resident * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+class PipelinePool:
+    """
+    Pipelines de Kokoro por lang_code creados a demanda sobre un único modelo.
+    Todos comparten el KModel y el diccionario de voces; lo que cambia por idioma
+    es el G2P. Si la suma estimada supera `budget_mb` (o hay más de
+    `max_pipelines`) se descarta el idioma usado hace más tiempo. El costo de
+    cada pipeline es el aumento de RSS al crearlo, así que es aproximado.
+    """
+
+    def __init__(self, load_model: Callable[[], Any], new_pipeline: Callable[[str, Any], Any],
+                 budget_mb: int = KOKORO_PIPELINE_BUDGET_MB, max_pipelines: int = KOKORO_MAX_PIPELINES):
+        self._load_model = load_model
+        self._new_pipeline = new_pipeline
+        self.budget_mb = budget_mb
+        self.max_pipelines = max(1, max_pipelines)
+        self.model = None
+        self.voices: Dict[str, Any] = {}
+        self._pipelines: "OrderedDict[str, Any]" = OrderedDict()
+        self._cost: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.loads = self.evictions = 0
+
+    def get(self, lang_code: str):
+        with self._lock:
+            pipeline = self._pipelines.get(lang_code)
+            if pipeline is not None:
+                self._pipelines.move_to_end(lang_code)
+                return pipeline
+            if self.model is None:
+                self.model = self._load_model()
+            before = rss_mb()
+            pipeline = self._new_pipeline(lang_code, self.model)
+            after = rss_mb()
+            # Las voces ya cargadas sirven para cualquier idioma
+            pipeline.voices = self.voices
+            self._pipelines[lang_code] = pipeline
+            self._cost[lang_code] = max(0.0, after - before) if before is not None and after is not None else KOKORO_PIPELINE_MB
+            self.loads += 1
+            self._evict()
+            return pipeline
+
+    def _evict(self):
+        # El pipeline recién creado nunca se descarta; los trabajos en curso
+        # conservan su referencia hasta terminar.
+        while len(self._pipelines) > 1 and (
+            len(self._pipelines) > self.max_pipelines or sum(self._cost.values()) > self.budget_mb
+        ):
+            lang_code, _ = self._pipelines.popitem(last=False)
+            self._cost.pop(lang_code, None)
+            self.evictions += 1
+            print(f"Evicted Kokoro pipeline for lang_code: {lang_code}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "languages": list(self._pipelines),
+                "estimated_mb": round(sum(self._cost.values()), 1),
+                "budget_mb": self.budget_mb,
+                "voices": len(self.voices),
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,239 @@
+"""
+Perfilado opcional por request.
+
+Se activa con el header `X-Profile: 1` o por muestreo (`PROFILE_SAMPLE_RATE`,
+p. ej. 0.01). El middleware marca el request en un contextvar; el endpoint
+corre bajo cProfile en su propio hilo (ver `ProfiledRoute`) y, si encola un
+trabajo (POST /process), el trabajo se perfila aparte (`capture`). También se
+registra el pico de memoria con tracemalloc, que es global al proceso: cada
+corrida mide contra su propia línea de base y, si se solapa con otra, su pico
+es aproximado. Desde Python 3.12 cProfile admite un solo perfilador activo por
+proceso; lo que arranca mientras otro está activo corre sin perfilar.
+
+Cada request deja `<id>.json` (metadatos y funciones más costosas) y `<id>.prof`
+(pstats, abrir con `python -m pstats` o snakeviz) en PROFILE_DIR. Sin perfilar,
+el costo es leer un contextvar por request.
+"""
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+
+from .paths import DATA_DIR
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "x-profile").lower()  # vacío: ignorar el header
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_TOP = 25
+
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}(-job-\d+)?$")
+
+_current: "contextvars.ContextVar[Optional[ProfileRun]]" = contextvars.ContextVar("profile_run", default=None)
+_trace_lock = threading.Lock()
+_tracing = 0
+
+def _trace_start() -> Tuple[int, int]:
+    """Línea de base de la corrida: (memoria actual, pico global) al empezar."""
+    global _tracing
+    with _trace_lock:
+        if _tracing == 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # Solo la primera corrida reinicia el pico: hacerlo en cada una pisaría el de las otras
+            tracemalloc.reset_peak()
+        _tracing += 1
+        return tracemalloc.get_traced_memory()
+
+def _trace_stop(baseline: Tuple[int, int]) -> int:
+    """Bytes por encima de la línea de base en el pico de la corrida."""
+    global _tracing
+    with _trace_lock:
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        _tracing -= 1
+        if _tracing == 0:
+            tracemalloc.stop()
+    start_current, start_peak = baseline
+    # Si el pico global subió, ocurrió durante esta corrida; si no, el pico propio no se
+    # distingue del anterior y se usa la memoria al terminar
+    top = peak if peak > start_peak else current
+    return max(0, top - start_current)
+
+def _enable(profile: cProfile.Profile) -> bool:
+    """False si ya hay otro perfilador activo (Python ≥ 3.12, sys.monitoring)."""
+    try:
+        profile.enable()
+        return True
+    except ValueError:
+        return False
+
+class ProfileRun:
+    def __init__(self, profile_id: str, method: str, path: str):
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self._profiles: List[cProfile.Profile] = []
+
+    def add(self, profile: cProfile.Profile):
+        self._profiles.append(profile)
+
+    def finish(self, status: int, peak_bytes: int):
+        _write(self.profile_id, {
+            "id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "started": self.started,
+            "wall_ms": round((time.perf_counter() - self._t0) * 1000, 1),
+            "peak_mem_kb": peak_bytes // 1024,
+        }, self._profiles)
+
+def current() -> Optional[ProfileRun]:
+    return _current.get()
+
+def _top(profiles: List[cProfile.Profile]) -> List[str]:
+    out = io.StringIO()
+    stats = pstats.Stats(*profiles, stream=out)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+    return [line for line in out.getvalue().splitlines() if line.strip()]
+
+def _write(profile_id: str, meta: Dict, profiles: List[cProfile.Profile]):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if profiles:
+        pstats.Stats(*profiles).dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+        meta["top"] = _top(profiles)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    _prune()
+
+def _prune():
+    metas = sorted((e for e in os.scandir(PROFILE_DIR) if e.name.endswith(".json")), key=lambda e: e.stat().st_mtime)
+    for entry in metas[:max(0, len(metas) - PROFILE_KEEP)]:
+        stem = entry.name[:-len(".json")]
+        for ext in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, stem + ext))
+            except FileNotFoundError:
+                pass
+
+def list_profiles() -> List[Dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.name.endswith(".json"):
+            with open(entry.path, encoding="utf-8") as f:
+                meta = json.load(f)
+            meta.pop("top", None)
+            meta["has_prof"] = os.path.exists(entry.path[:-len(".json")] + ".prof")
+            out.append(meta)
+    return sorted(out, key=lambda m: m["started"], reverse=True)
+
+def profile_path(profile_id: str, ext: str) -> Optional[str]:
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.{ext}")
+    return path if os.path.exists(path) else None
+
+def capture(run: Optional[ProfileRun], label: str, fn: Callable, *args, **kwargs) -> Any:
+    """Corre `fn` perfilada como `<id>-<label>` si el request que la originó se perfila."""
+    if run is None:
+        return fn(*args, **kwargs)
+    profile = cProfile.Profile()
+    baseline = _trace_start()
+    t0, started, status = time.perf_counter(), time.time(), "ok"
+    enabled = False
+    try:
+        # El trabajo corre igual aunque no se pueda perfilar (p. ej. el request sigue perfilado)
+        enabled = _enable(profile)
+        return fn(*args, **kwargs)
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        if enabled:
+            profile.disable()
+        _write(f"{run.profile_id}-{label}", {
+            "id": f"{run.profile_id}-{label}",
+            "method": run.method,
+            "path": run.path,
+            "status": status,
+            "started": started,
+            "wall_ms": round((time.perf_counter() - t0) * 1000, 1),
+            "peak_mem_kb": _trace_stop(baseline) // 1024,
+            "profiled": enabled,
+        }, [profile] if enabled else [])
+
+def profiled(endpoint: Callable) -> Callable:
+    """Perfila el endpoint en el hilo donde corre; los async solo registran tiempo y memoria."""
+    if inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        run = _current.get()
+        if run is None:
+            return endpoint(*args, **kwargs)
+        profile = cProfile.Profile()
+        if not _enable(profile):
+            return endpoint(*args, **kwargs)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile.disable()
+            run.add(profile)
+    return wrapper
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+def _wanted(scope) -> bool:
+    if PROFILE_HEADER:
+        for name, value in scope.get("headers", ()):
+            if name.decode("latin-1") == PROFILE_HEADER:
+                return value.strip() not in (b"", b"0")
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+class ProfilingMiddleware:
+    """Middleware ASGI: decide si perfilar y agrega `X-Profile-Id` a la respuesta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        run = ProfileRun(uuid.uuid4().hex, scope["method"], scope["path"])
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", run.profile_id.encode())]
+            await send(message)
+
+        token = _current.set(run)
+        baseline = _trace_start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            run.finish(status, _trace_stop(baseline))
@@ -0,0 +1,45 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Eventos de progreso por episodio, en memoria del proceso que corre el trabajo.
+# Cada evento tiene un índice creciente que sirve de `id` SSE (Last-Event-ID).
+# De los "progress" (uno por bloque de audio) solo se guarda el último desde la
+# etapa anterior: un cliente nuevo recibe las etapas y el avance actual, no miles
+# de eventos viejos. Los índices de los reemplazados quedan sin usar.
+RETENTION_SEC = 15 * 60
+TERMINAL_EVENTS = ("done", "error", "cancelled")
+
+class _Log:
+    def __init__(self):
+        self.events: List[Tuple[int, str, Dict]] = []
+        self.next_index = 0
+        self.finished_at: Optional[float] = None
+
+_logs: Dict[int, _Log] = {}
+_lock = threading.Lock()
+
+def _prune():
+    now = time.time()
+    for eid in [k for k, v in _logs.items() if v.finished_at and now - v.finished_at > RETENTION_SEC]:
+        del _logs[eid]
+
+def publish(episode_id: int, event: str, **data):
+    """Registra un evento ("stage", "progress", "done", "error", "cancelled") para el episodio."""
+    with _lock:
+        log = _logs.setdefault(episode_id, _Log())
+        if event == "progress" and log.events and log.events[-1][1] == "progress":
+            log.events.pop()
+        log.events.append((log.next_index, event, data))
+        log.next_index += 1
+        if event in TERMINAL_EVENTS:
+            log.finished_at = time.time()
+            _prune()
+
+def events_since(episode_id: int, index: int) -> Optional[List[Tuple[int, str, Dict]]]:
+    """Eventos con índice >= `index`, o None si este proceso no conoce el episodio."""
+    with _lock:
+        log = _logs.get(episode_id)
+        if log is None:
+            return None
+        return [e for e in log.events if e[0] >= index]
@@ -1,27 +1,58 @@
-from typing import Tuple
-import re
+from typing import Dict, List, Optional, Tuple
 
-def refine_with_llm_like(text: str, language: str = "es") -> Tuple[str, str]:
-    """Devuelve (title, refined_text) mejorado y formateado (MVP heurístico)."""
-    t = re.sub(r"\s+", " ", text).strip()
-    sentences = re.split(r"(?<=[.!?])\s+", t)
+from .document import SENTENCE_RE, Document, block_sentences, normalize
+from .sections import blocks_from_text, group_sections
+
+def _bullets(sentences: List[str]) -> List[str]:
+    parts = []
+    for s in sentences:
+        s = s.strip()
+        if not s: continue
+        if any(k in s.lower() for k in ["es ", "son ", "define", "significa"]):
+            parts.append(f"- **Idea clave:** {s}")
+        else:
+            parts.append(f"- {s}")
+    return parts
+
+def _split(text: str) -> List[str]:
+    return SENTENCE_RE.split(normalize(text))
+
+def refine_with_llm_like(text: str, language: str = "es", blocks: Optional[List[Dict]] = None,
+                         doc: Optional[Document] = None) -> Tuple[str, str]:
+    """
+    Devuelve (title, refined_text) mejorado y formateado (MVP heurístico).
+    Si el documento trae títulos (`doc` del upload, `blocks` de extract_structure
+    o markdown) se respetan como secciones; si no, se arman 3–5 bloques de oraciones.
+    """
+    title = "Resumen y guía de estudio" if language.startswith("es") else "Improved study outline"
+    if doc is not None:
+        blocks = doc.blocks()
+    elif blocks is None:
+        blocks = blocks_from_text(text)
+    groups = [(t, body) for t, body in group_sections(blocks) if any(b["type"] == "paragraph" for b in body)]
+
+    parts = ["# Resumen mejorado", ""]
+    if len(groups) > 1:
+        for i, (heading, body) in enumerate(groups, 1):
+            parts.append(f"## {heading or f'Sección {i}'}")
+            for b in body:
+                if b["type"] == "heading":
+                    parts.append(f"### {b['text']}")
+                else:
+                    parts.extend(_bullets(block_sentences(b, doc)))
+            parts.append("")
+        return title, "\n".join(parts).strip()
+
+    sentences = doc.sentences() if doc is not None else _split(text)
     # Crear 3–5 bloques
     n = max(3, min(5, max(1, len(sentences)//6)))
     size = max(1, len(sentences)//n)
-    blocks = [sentences[i*size:(i+1)*size] for i in range(n)]
-    if sum(len(b) for b in blocks) < len(sentences):
-        blocks[-1].extend(sentences[n*size:])
+    chunks = [sentences[i*size:(i+1)*size] for i in range(n)]
+    if sum(len(b) for b in chunks) < len(sentences):
+        chunks[-1].extend(sentences[n*size:])
 
-    parts = ["# Resumen mejorado", ""]
-    for i, b in enumerate(blocks, 1):
+    for i, b in enumerate(chunks, 1):
         parts.append(f"## Sección {i}")
-        for s in b:
-            s = s.strip()
-            if not s: continue
-            if any(k in s.lower() for k in ["es ", "son ", "define", "significa"]):
-                parts.append(f"- **Idea clave:** {s}")
-            else:
-                parts.append(f"- {s}")
+        parts.extend(_bullets(b))
         parts.append("")
-    title = "Resumen y guía de estudio" if language.startswith("es") else "Improved study outline"
     return title, "\n".join(parts).strip()
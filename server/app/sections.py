@@ -0,0 +1,243 @@
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import re
+
+from .document import Document, block_sentences
+from .summarize import INTRO, OUTRO
+
+WORDS_PER_MINUTE = 150
+# Subir cuando cambie la salida de la extracción o del seccionado (invalida el memo de /generate-script)
+SECTIONER_VERSION = 3
+SECTION_WORDS = 300  # tamaño aproximado de una parte cuando no hay subtítulos
+
+def blocks_from_text(text: str) -> List[Dict]:
+    """
+    Convierte texto plano o markdown en la misma lista de bloques que
+    `pdf_extract.extract_structure`: las líneas "#" son títulos (nivel = cantidad
+    de "#") y las líneas en blanco separan párrafos.
+    """
+    blocks: List[Dict] = []
+    para: List[str] = []
+
+    def flush():
+        if para:
+            blocks.append({"type": "paragraph", "level": 0, "text": " ".join(para)})
+            para.clear()
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            flush()
+            continue
+        if line.startswith("#"):
+            flush()
+            level = len(line) - len(line.lstrip("#"))
+            title = line[level:].strip()
+            if title:
+                blocks.append({"type": "heading", "level": level, "text": title})
+            continue
+        para.append(line)
+    flush()
+    return blocks
+
+def _section_level(blocks: List[Dict]) -> Optional[int]:
+    """
+    Nivel de título que separa secciones: el menos profundo que aparece más de
+    una vez seguido de contenido (un título único suele ser el del documento).
+    """
+    with_body: Counter = Counter()
+    for cur, nxt in zip(blocks, blocks[1:]):
+        if cur["type"] == "heading" and nxt["type"] == "paragraph":
+            with_body[cur["level"]] += 1
+    if not with_body:
+        return None
+    for level in sorted(with_body):
+        if with_body[level] > 1:
+            return level
+    return max(with_body)
+
+def group_sections(blocks: List[Dict]) -> List[Tuple[Optional[str], List[Dict]]]:
+    """
+    Agrupa los bloques en (título, bloques del cuerpo). Los títulos más profundos
+    que el nivel de sección quedan dentro del cuerpo como subtítulos.
+    """
+    level = _section_level(blocks)
+    groups: List[Tuple[Optional[str], List[Dict]]] = []
+    title: Optional[str] = None
+    body: List[Dict] = []
+    for b in blocks:
+        if b["type"] == "heading" and level is not None and b["level"] <= level:
+            if body:
+                groups.append((title, body))
+            title, body = b["text"], []
+        else:
+            body.append(b)
+    if body:
+        groups.append((title, body))
+    return groups
+
+def _words(blocks: List[Dict]) -> int:
+    return sum(len(b["text"].split()) for b in blocks)
+
+def split_large_section(body: List[Dict], base_title: str, doc: Optional[Document] = None) -> List[Tuple[str, List[Dict]]]:
+    """
+    Divide el cuerpo de una sección en subsecciones: primero por subtítulos y,
+    si no los hay, en partes de ~SECTION_WORDS palabras respetando párrafos y oraciones.
+    Con `doc` las oraciones salen de su tabla de offsets.
+    """
+    if any(b["type"] == "heading" for b in body):
+        parts: List[Tuple[str, List[Dict]]] = []
+        title, current = base_title, []
+        for b in body:
+            if b["type"] == "heading":
+                if current:
+                    parts.append((title, current))
+                title, current = b["text"], []
+            else:
+                current.append(b)
+        if current:
+            parts.append((title, current))
+        return parts
+
+    if _words(body) <= SECTION_WORDS * 2:
+        return [(base_title, body)]
+
+    # Sin subtítulos: cortar en párrafos (o en oraciones si el párrafo es enorme)
+    pieces: List[Dict] = []
+    for b in body:
+        if len(b["text"].split()) > SECTION_WORDS:
+            pieces.extend({"type": "paragraph", "level": 0, "text": s} for s in block_sentences(b, doc) if s.strip())
+        else:
+            pieces.append(b)
+    chunks: List[List[Dict]] = [[]]
+    for p in pieces:
+        chunks[-1].append(p)
+        if _words(chunks[-1]) >= SECTION_WORDS:
+            chunks.append([])
+    chunks = [c for c in chunks if c]
+    return [(f"{base_title} - Parte {i}", c) for i, c in enumerate(chunks, 1)]
+
+def _section(section_id: int, title: str, content: str) -> Dict:
+    return {
+        "id": section_id,
+        "title": title[:100],
+        "content": content,
+        "estimated_duration": max(1, len(content.split()) // WORDS_PER_MINUTE)
+    }
+
+def sections_from_blocks(blocks: List[Dict], target_minutes: int, doc: Optional[Document] = None) -> List[Dict]:
+    """
+    Arma las secciones del script a partir del árbol de títulos/párrafos
+    (los `blocks` de `doc.blocks()` cuando se tiene el documento del upload)
+    """
+    sections: List[Dict] = []
+    for title, body in group_sections(blocks):
+        base_title = title or f"Sección {len(sections) + 1}"
+        for part_title, part in split_large_section(body, base_title, doc):
+            text = " ".join(b["text"] for b in part if b["type"] == "paragraph")
+            if len(text.strip()) <= 50:
+                continue
+            sections.append(_section(len(sections) + 1, part_title, clean_and_enhance_content(text)))
+
+    # Si no se encontraron secciones, crear una sección con todo el contenido
+    if not sections and blocks:
+        cleaned_content = clean_and_enhance_content(" ".join(b["text"] for b in blocks))
+        sections.append(_section(1, "Contenido Principal", cleaned_content))
+    return sections
+
+def iter_sections(blocks: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Seccionador incremental: emite cada sección en cuanto llega el título
+    siguiente o el cuerpo supera ~2×SECTION_WORDS palabras, sin ver el documento
+    completo. Cualquier título abre sección (no se conoce el nivel global).
+    """
+    section_id = 0
+    title: Optional[str] = None
+    base: Optional[str] = None  # título de la primera parte del cuerpo en curso
+    part = 0
+    body: List[str] = []
+    words = 0
+
+    def emit():
+        nonlocal section_id, base, part, body, words
+        text = " ".join(body)
+        body, words = [], 0
+        if len(text.strip()) <= 50:
+            return None
+        section_id += 1
+        part += 1
+        # Un cuerpo sin título se numera por su primera sección: "Sección 3", "Sección 3 - Parte 2"
+        base = base or title or f"Sección {section_id}"
+        return _section(section_id, base if part == 1 else f"{base} - Parte {part}", clean_and_enhance_content(text))
+
+    for b in blocks:
+        if b["type"] == "heading":
+            section = emit()
+            if section:
+                yield section
+            title, base, part = b["text"], None, 0
+            continue
+        body.append(b["text"])
+        words += len(b["text"].split())
+        if words >= SECTION_WORDS * 2:
+            section = emit()
+            if section:
+                yield section
+    section = emit()
+    if section:
+        yield section
+
+def create_sections_from_text(text: str, target_minutes: int, doc: Optional[Document] = None) -> list:
+    """
+    Divide el texto en secciones lógicas basadas en títulos y subtítulos
+    """
+    doc = doc or Document.from_text(text)
+    return sections_from_blocks(doc.blocks(), target_minutes, doc)
+
+def clean_and_enhance_content(content: str) -> str:
+    """
+    Limpia y mejora el contenido para que sea más comprensible
+    """
+    # Limpiar el texto
+    content = re.sub(r'\s+', ' ', content.strip())
+
+    # Agregar contexto y explicaciones para términos técnicos (manejar caracteres especiales)
+    enhancements = {
+        r'\bCRIPTOGRAF[IÍ]A\b': 'La criptografía',
+        r'\bCRIPTOAN[ÁA]LISIS\b': 'el criptoanálisis',
+        r'\bBLOCKCHAIN\b': 'la tecnología blockchain',
+        r'\bHASH\b': 'la función hash',
+        r'\bP2P\b': 'las redes peer-to-peer',
+        r'\bCONTRATOS INTELIGENTES\b': 'los contratos inteligentes',
+        r'\bUNIDAD\s+\d+\b': 'En esta unidad',
+        r'\bINTRODUCCI[ÓO]N\b': 'Para introducir',
+    }
+
+    for pattern, replacement in enhancements.items():
+        content = re.sub(pattern, replacement, content, flags=re.IGNORECASE)
+
+    # Agregar conectores para mejorar la fluidez
+    content = re.sub(r'([.!?])\s*([A-Z])', r'\1 Además, \2', content)
+    content = re.sub(r'([.!?])\s*([A-Z])', r'\1 Por otro lado, \2', content)
+
+    # Limpiar dobles conectores
+    content = re.sub(r'(Además, )+', 'Además, ', content)
+    content = re.sub(r'(Por otro lado, )+', 'Por otro lado, ', content)
+
+    return content
+
+def create_full_script(sections: list) -> str:
+    """
+    Crea el script completo combinando todas las secciones
+    """
+    script_parts = [INTRO]
+
+    for i, section in enumerate(sections):
+        script_parts.append(f"## {section['title']}")
+        script_parts.append(section['content'])
+        if i < len(sections) - 1:
+            script_parts.append("Ahora pasemos al siguiente tema.")
+
+    script_parts.append(OUTRO)
+
+    return " ".join(script_parts)
@@ -0,0 +1,160 @@
+"""
+Pipeline en streaming de PDF a WAV con memoria constante:
+
+    páginas (iter_blocks) → secciones (iter_sections) → fragmentos de oraciones
+    → síntesis (iter_synthesize) → WavSink
+
+Cada etapa consume de la anterior; la extracción corre en un hilo aparte con
+una cola acotada, así el audio empieza a escribirse antes de terminar de leer
+el PDF y nunca hay más de `PREFETCH` fragmentos en memoria.
+"""
+import os
+import queue
+import threading
+import wave
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .kokoro_provider import iter_synthesize
+from .cancellation import CancelToken, check as check_cancel
+from .chunker import KOKORO_CHUNK_CHARS, pack_sentences
+from .document import STRIP_BOILERPLATE
+from .pdf_extract import BoilerplateFilter, iter_blocks
+from .sections import iter_sections
+
+PREFETCH = int(os.getenv("STREAM_PREFETCH", "8"))
+# Cada fragmento es también la unidad de checkpoint; por defecto, el tamaño óptimo para Kokoro
+CHUNK_CHARS = int(os.getenv("STREAM_CHUNK_CHARS", str(KOKORO_CHUNK_CHARS)))
+
+_END = object()
+
+def prefetch(items: Iterable, maxsize: int = PREFETCH) -> Iterator:
+    """Produce `items` en un hilo aparte con una cola de a lo sumo `maxsize` elementos."""
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Nunca bloquea para siempre: si el consumidor se fue, la cola puede no vaciarse más
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_END)
+        except BaseException as e:
+            put(e)
+
+    threading.Thread(target=producer, name="stream-prefetch", daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def iter_sentence_chunks(sections: Iterable[Dict], max_chars: int = CHUNK_CHARS) -> Iterator[Tuple[str, str]]:
+    """(título de sección, fragmento) con oraciones completas de hasta ~max_chars."""
+    for section in sections:
+        for chunk in pack_sentences(section["content"], max_chars):
+            yield section["title"], chunk
+
+class WavSink:
+    """
+    Escribe PCM16 mono a un WAV a medida que llega; el header se cierra al final.
+    `mark(título)` registra el inicio de un capítulo en la muestra actual.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._wf = None
+        self.sample_rate = 0
+        self.samples = 0
+        self._marks: List[Tuple[str, int]] = []
+
+    def mark(self, title: str):
+        self._marks.append((title, self.samples))
+
+    def chapters(self) -> List[Dict]:
+        sr = self.sample_rate or 24000
+        return [{"title": t, "start_sample": n, "start_sec": round(n / sr, 3)} for t, n in self._marks]
+
+    def write(self, pcm: bytes, sample_rate: int):
+        if self._wf is None:
+            self.sample_rate = sample_rate or 24000
+            self._wf = wave.open(self.path, "wb")
+            self._wf.setnchannels(1)
+            self._wf.setsampwidth(2)
+            self._wf.setframerate(self.sample_rate)
+        self._wf.writeframes(pcm)
+        self.samples += len(pcm) // 2
+
+    @property
+    def seconds(self) -> float:
+        return self.samples / self.sample_rate if self.sample_rate else 0.0
+
+    def close(self):
+        if self._wf is not None:
+            self._wf.close()
+            self._wf = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def convert_pdf(pdf_path: str, wav_path: Optional[str], voice: Optional[str] = None, ocr: bool = True, lang: Optional[str] = None,
+                on_page: Optional[Callable[[int, int], None]] = None,
+                on_audio: Optional[Callable[[str, float], None]] = None,
+                sink: Optional[WavSink] = None, skip: int = 0,
+                on_commit: Optional[Callable[[int], None]] = None, cancel: Optional[CancelToken] = None) -> Dict:
+    """
+    Convierte el documento completo (sin resumir) a WAV en streaming.
+    `on_audio(título de sección, segundos escritos)` se llama por cada bloque de audio.
+    Con `sink` escribe ahí (y no lo cierra) en vez de en `wav_path`; los primeros
+    `skip` fragmentos se saltean (ya están en el sink) y `on_commit(n)` se llama
+    al terminar el fragmento n. `cancel` se revisa entre fragmentos de audio.
+    """
+    boilerplate = BoilerplateFilter() if STRIP_BOILERPLATE else None
+    chunks = prefetch(iter_sentence_chunks(iter_sections(iter_blocks(pdf_path, ocr=ocr, on_page=on_page, boilerplate=boilerplate))))
+    n_chunks = n_sections = n_chars = 0
+    last_title = None
+    own = sink is None
+    sink = sink if sink is not None else WavSink(wav_path)
+    try:
+        for title, text in chunks:
+            n_chunks += 1
+            if title != last_title:
+                n_sections += 1
+                last_title = title
+                if n_chunks > skip:
+                    sink.mark(title)
+            if n_chunks <= skip:
+                continue
+            check_cancel(cancel)
+            n_chars += len(text)
+            for pcm, sr in iter_synthesize(text, voice=voice, lang=lang, cancel=cancel):
+                sink.write(pcm, sr)
+                if on_audio:
+                    on_audio(title, sink.seconds)
+            if on_commit:
+                on_commit(n_chunks)
+    finally:
+        if own:
+            sink.close()
+    if not sink.samples:
+        raise RuntimeError("No se generó audio (¿documento sin texto o TTS no disponible?)")
+    return {"chunks": n_chunks, "sections": n_sections, "chars": n_chars, "audio_sec": round(sink.seconds, 1),
+            "sample_rate": sink.sample_rate, "chapters": sink.chapters(),
+            "boilerplate": boilerplate.report() if boilerplate else {}}
@@ -1,15 +1,42 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
 import re
 
+from .document import SENTENCE_RE, Document, block_sentences
+
+INTRO = "Bienvenidos. Hoy repasamos los puntos clave de la clase. "
+OUTRO = " Gracias por escuchar. Repite este episodio para consolidar y consulta tus apuntes."
+
 def split_sentences(text: str) -> List[str]:
     text = re.sub(r"\s+", " ", text)
-    return re.split(r"(?<=[.!?])\s+", text)
+    return SENTENCE_RE.split(text)
 
 def summarize_text(text: str, max_sentences: int = 12) -> str:
     sents = [s.strip() for s in split_sentences(text) if len(s.strip()) > 0]
     return " ".join(sents[:max_sentences])
 
 def script_from_summary(summary: str) -> str:
-    intro = "Bienvenidos. Hoy repasamos los puntos clave de la clase. "
-    outro = " Gracias por escuchar. Repite este episodio para consolidar y consulta tus apuntes."
-    return intro + summary + outro
+    return INTRO + summary + OUTRO
+
+def script_segments(text: str, max_sentences: int = 12, blocks: Optional[List[Dict]] = None,
+                    doc: Optional[Document] = None) -> List[Tuple[str, str]]:
+    """
+    Guion en segmentos (título, texto): la intro, las primeras `max_sentences`
+    oraciones agrupadas por la sección de la que vienen, y el cierre.
+    Acepta el `doc` del upload (o los `blocks` de extract_structure) para no re-parsear el texto.
+    """
+    from .sections import group_sections
+    if doc is None and blocks is None:
+        doc = Document.from_text(text)
+    if doc is not None:
+        blocks = doc.blocks()
+    segments = [("Introducción", INTRO.strip())]
+    remaining = max_sentences
+    for title, body in group_sections(blocks):
+        if remaining <= 0:
+            break
+        sents = [s for b in body if b["type"] == "paragraph" for s in block_sentences(b, doc)][:remaining]
+        if sents:
+            segments.append((title or "Resumen", " ".join(sents)))
+            remaining -= len(sents)
+    segments.append(("Cierre", OUTRO.strip()))
+    return segments
@@ -0,0 +1,133 @@
+"""
+Forma de onda y vista previa de cada episodio, para que el reproductor y las
+listas no tengan que bajar el WAV entero. Al terminar la síntesis se hace una
+pasada vectorizada sobre el WAV (memmap, sin cargarlo en memoria) y se guardan
+en WAVEFORM_DIR:
+
+    <id>.json          picos min/max por bin, en el formato JSON de audiowaveform
+                       (8 bits, `data` = [min0, max0, min1, max1, ...])
+    <id>.preview.wav   PREVIEW_SEC segundos desde el primer capítulo después de
+                       la intro, remuestreados a PREVIEW_SAMPLE_RATE con fundido
+
+Los episodios anteriores se calculan la primera vez que se piden.
+"""
+import json
+import os
+import uuid
+import wave
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .paths import DATA_DIR
+
+WAVEFORM_DIR = os.getenv("WAVEFORM_DIR", os.path.join(DATA_DIR, "waveforms"))
+WAVEFORM_BINS = int(os.getenv("WAVEFORM_BINS", "1000"))
+PREVIEW_SEC = float(os.getenv("PREVIEW_SEC", "15"))
+PREVIEW_SAMPLE_RATE = int(os.getenv("PREVIEW_SAMPLE_RATE", "16000"))
+PREVIEW_FADE_SEC = 0.5
+
+os.makedirs(WAVEFORM_DIR, exist_ok=True)
+
+def peaks_path(episode_id: int) -> str:
+    return os.path.join(WAVEFORM_DIR, f"{episode_id}.json")
+
+def preview_path(episode_id: int) -> str:
+    return os.path.join(WAVEFORM_DIR, f"{episode_id}.preview.wav")
+
+def _samples(wav_path: str):
+    """(muestras int16 en memmap, sample_rate) de un WAV PCM16 mono."""
+    with wave.open(wav_path, "rb") as wf:
+        if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+            raise ValueError("Se esperaba PCM16 mono")
+        frames, sr = wf.getnframes(), wf.getframerate()
+    if not frames:
+        return np.zeros(0, dtype=np.int16), sr
+    offset = os.path.getsize(wav_path) - frames * 2
+    return np.memmap(wav_path, dtype="<i2", mode="r", offset=offset, shape=(frames,)), sr
+
+def compute_peaks(samples: np.ndarray, bins: int = WAVEFORM_BINS) -> np.ndarray:
+    """Matriz (bins, 2) int8 con el mínimo y el máximo de cada tramo de muestras."""
+    if not len(samples):
+        return np.zeros((0, 2), dtype=np.int8)
+    spp = -(-len(samples) // max(1, bins))  # muestras por bin, redondeado hacia arriba
+    full = len(samples) // spp * spp
+    parts = [samples[:full].reshape(-1, spp)]
+    if full < len(samples):
+        parts.append(samples[full:].reshape(1, -1))
+    lo = np.concatenate([p.min(axis=1) for p in parts])
+    hi = np.concatenate([p.max(axis=1) for p in parts])
+    return (np.stack([lo, hi], axis=1) >> 8).astype(np.int8)
+
+def reduce(payload: Dict, bins: int) -> Dict:
+    """Copia de `payload` con a lo sumo `bins` pares min/max (para miniaturas en listas)."""
+    pairs = np.asarray(payload["data"], dtype=np.int8).reshape(-1, 2)
+    if bins <= 0 or len(pairs) <= bins:
+        return payload
+    group = -(-len(pairs) // bins)
+    pad = -len(pairs) % group
+    # Relleno neutro: no cambia ni el mínimo ni el máximo del último grupo
+    lo = np.concatenate([pairs[:, 0], np.full(pad, 127, dtype=np.int8)]).reshape(-1, group).min(axis=1)
+    hi = np.concatenate([pairs[:, 1], np.full(pad, -128, dtype=np.int8)]).reshape(-1, group).max(axis=1)
+    return dict(payload, samples_per_pixel=payload["samples_per_pixel"] * group, length=len(lo),
+                data=np.stack([lo, hi], axis=1).reshape(-1).tolist())
+
+def _preview(samples: np.ndarray, sr: int, start_sample: int) -> np.ndarray:
+    clip = np.asarray(samples[start_sample:start_sample + int(PREVIEW_SEC * sr)], dtype=np.float32)
+    if not len(clip):
+        return np.zeros(0, dtype=np.int16)
+    if sr != PREVIEW_SAMPLE_RATE:
+        n = max(1, int(len(clip) * PREVIEW_SAMPLE_RATE / sr))
+        clip = np.interp(np.arange(n) * (sr / PREVIEW_SAMPLE_RATE), np.arange(len(clip)), clip).astype(np.float32)
+    fade = min(int(PREVIEW_FADE_SEC * PREVIEW_SAMPLE_RATE), len(clip) // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+        clip[:fade] *= ramp
+        clip[-fade:] *= ramp[::-1]
+    return np.clip(clip, -32768, 32767).astype(np.int16)
+
+def _write_atomic(path: str, write):
+    # Nombre único: dos pedidos pueden calcular el mismo episodio a la vez
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+def build(episode_id: int, wav_path: str, chapters: Optional[List[Dict]] = None) -> Dict:
+    """Calcula y guarda los picos y la vista previa del episodio; devuelve los picos."""
+    samples, sr = _samples(wav_path)
+    peaks = compute_peaks(samples)
+    spp = -(-len(samples) // WAVEFORM_BINS) if len(samples) else 0
+    payload = {
+        "version": 2, "channels": 1, "sample_rate": sr, "samples_per_pixel": spp, "bits": 8,
+        "length": len(peaks), "duration_sec": round(len(samples) / sr, 2) if sr else 0.0,
+        "data": peaks.reshape(-1).tolist(),
+    }
+
+    def write_peaks(tmp):
+        with open(tmp, "w") as f:
+            json.dump(payload, f, separators=(",", ":"))
+
+    # La intro es igual en todos los episodios: la vista previa arranca en el primer capítulo propio
+    start = chapters[1]["start_sample"] if chapters and len(chapters) > 1 else 0
+    clip = _preview(samples, sr, start)
+
+    def write_preview(tmp):
+        with wave.open(tmp, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(PREVIEW_SAMPLE_RATE)
+            wf.writeframes(clip.tobytes())
+
+    _write_atomic(peaks_path(episode_id), write_peaks)
+    _write_atomic(preview_path(episode_id), write_preview)
+    return payload
+
+def ensure(episode_id: int, wav_path: str, chapters: Optional[List[Dict]] = None):
+    """Calcula los archivos si faltan (episodios generados antes de esta función)."""
+    if not (os.path.exists(peaks_path(episode_id)) and os.path.exists(preview_path(episode_id))):
+        build(episode_id, wav_path, chapters)
+
+def discard(episode_id: int):
+    for path in (peaks_path(episode_id), preview_path(episode_id)):
+        if os.path.exists(path):
+            os.remove(path)
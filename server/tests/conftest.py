@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+# La configuración se lee al importar los módulos de la app: va antes que cualquier import
+_DATA_DIR = tempfile.mkdtemp(prefix="pdf-podcast-tests-")
+os.environ.update({
+    "DATA_DIR": _DATA_DIR,
+    "DATABASE_URL": f"sqlite:///{os.path.join(_DATA_DIR, 'app.db')}",
+    "KOKORO_FAKE": "1",
+    "KOKORO_SERVER_SOCKET": "",
+    "RESUME_JOBS": "0",
+})
+
+import pytest
+
+@pytest.fixture(scope="session", autouse=True)
+def db():
+    from app.db import init_db
+    init_db()
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as c:
+        yield c
+
+@pytest.fixture(scope="session")
+def sample_pdf():
+    from app.loadtest import sample_pdf
+    return sample_pdf
+
+@pytest.fixture
+def upload_id(client, sample_pdf):
+    r = client.post("/uploads", files={"file": ("doc.pdf", sample_pdf(4), "application/pdf")})
+    assert r.status_code == 200
+    return r.json()["upload_id"]
+
+def pytest_sessionfinish(session, exitstatus):
+    import shutil
+    shutil.rmtree(_DATA_DIR, ignore_errors=True)
@@ -0,0 +1,47 @@
+import fitz
+import pytest
+
+from app.pdf_extract import BoilerplateFilter, extract_structure, iter_blocks
+
+PAGES = 6
+TOPICS = ["cifrado simétrico", "claves públicas", "funciones hash", "firmas digitales", "certificados", "protocolos"]
+
+def _pdf(tmp_path) -> str:
+    doc = fitz.open()
+    for i in range(PAGES):
+        page = doc.new_page()
+        page.insert_text((72, 40), "Universidad Nacional - Apuntes de Criptografía", fontsize=9)
+        page.insert_text((72, 90), f"Capítulo {i + 1}", fontsize=18, fontname="hebo")
+        page.insert_textbox(fitz.Rect(72, 110, 520, 700), f"Sobre {TOPICS[i]}: explicación y ejemplos. " * 12, fontsize=11)
+        page.insert_text((72, 800), f"Página {i + 1} de {PAGES}", fontsize=9)
+    path = tmp_path / "apunte.pdf"
+    doc.save(path)
+    return str(path)
+
+@pytest.mark.parametrize("extract", [extract_structure, lambda p, boilerplate: list(iter_blocks(p, boilerplate=boilerplate))],
+                         ids=["extract_structure", "iter_blocks"])
+def test_drops_header_and_footer_keeps_chapter_headings(tmp_path, extract):
+    bp = BoilerplateFilter()
+    blocks = extract(_pdf(tmp_path), boilerplate=bp)
+    text = " ".join(b["text"] for b in blocks)
+    assert "Universidad Nacional" not in text
+    assert "Página" not in text
+    # "Capítulo N" también se repite con otro número en cada página, pero es un título
+    assert [b["text"] for b in blocks if b["type"] == "heading"] == [f"Capítulo {i + 1}" for i in range(PAGES)]
+    assert "Sobre protocolos: explicación" in text
+    report = bp.report()
+    assert report["enabled"] and report["lines_removed"] == 2 * PAGES
+
+def test_without_filter_keeps_everything(tmp_path):
+    text = " ".join(b["text"] for b in extract_structure(_pdf(tmp_path)))
+    assert "Universidad Nacional" in text and "Página 3 de 6" in text
+
+def test_repetitive_document_is_not_emptied():
+    # Si lo repetido es la mayor parte del texto el filtro se apaga en vez de vaciar el documento
+    bp = BoilerplateFilter()
+    pages = [["Firmar aquí", f"Formulario {i}"] for i in range(PAGES)]
+    for lines in pages:
+        bp.add_page(lines)
+    bp.calibrate((t, True) for lines in pages for t in lines)
+    assert not bp.enabled
+    assert all(bp.keep(t) for lines in pages for t in lines)
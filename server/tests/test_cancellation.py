@@ -0,0 +1,45 @@
+import pytest
+
+from app import cancellation, kokoro_provider
+from app.cancellation import CancelToken, Cancelled
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cancellation.time, "monotonic", lambda: now[0])
+    return now
+
+def test_deadline_expires_as_timeout(clock):
+    token = CancelToken()
+    token.start(5)
+    token.check()
+    clock[0] += 4.9
+    assert not token.cancelled
+    clock[0] += 0.1
+    with pytest.raises(Cancelled) as exc:
+        token.check()
+    assert exc.value.reason == token.reason == "timeout"
+
+def test_explicit_cancel_keeps_its_reason(clock):
+    token = CancelToken()
+    token.start(5)
+    token.cancel("disconnected")
+    clock[0] += 10
+    with pytest.raises(Cancelled) as exc:
+        token.check()
+    assert exc.value.reason == "disconnected"
+
+def test_no_timeout_never_expires(clock):
+    token = CancelToken()
+    token.start(None)
+    clock[0] += 1e9
+    token.check()
+    cancellation.check(None)
+
+def test_synthesis_stops_at_deadline(clock):
+    token = CancelToken()
+    token.start(1)
+    chunks = kokoro_provider.iter_synthesize("Una oración. Otra oración.", cancel=token)
+    clock[0] += 2
+    with pytest.raises(Cancelled):
+        next(chunks)
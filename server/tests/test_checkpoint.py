@@ -0,0 +1,47 @@
+import os
+import wave
+
+import numpy as np
+
+from app import checkpoint
+from app.checkpoint import WAV_HEADER_BYTES, CheckpointSink
+
+def _pcm(n: int, value: int) -> bytes:
+    return np.full(n, value, dtype="<i2").tobytes()
+
+def test_resume_truncates_uncommitted_audio(tmp_path):
+    eid = 9001
+    sink = CheckpointSink(eid)
+    sink.mark("Intro")
+    sink.write(_pcm(100, 1), 24000)
+    manifest = sink.commit(1)
+    # Unidad a medio escribir cuando se cae el proceso: audio y capítulo sin confirmar
+    sink.mark("Parte 2")
+    sink.write(_pcm(50, 2), 24000)
+    sink._f.flush()
+    sink.close()
+    assert os.path.getsize(sink.path) == WAV_HEADER_BYTES + 150 * 2
+
+    resumed = CheckpointSink(eid, manifest)
+    assert os.path.getsize(resumed.path) == WAV_HEADER_BYTES + 100 * 2
+    assert (resumed.units, resumed.samples, resumed.last_title) == (1, 100, "Intro")
+    resumed.mark("Parte 2")
+    resumed.write(_pcm(10, 3), 24000)
+    out = str(tmp_path / "ep.wav")
+    resumed.finalize(out)
+    checkpoint.discard(eid)
+
+    with wave.open(out) as wf:
+        assert wf.getframerate() == 24000
+        pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype="<i2")
+    assert pcm.tolist() == [1] * 100 + [3] * 10
+    assert [(c["title"], c["start_sample"]) for c in resumed.chapters()] == [("Intro", 0), ("Parte 2", 100)]
+
+def test_manifest_without_audio_starts_over():
+    eid = 9002
+    checkpoint.discard(eid)
+    sink = CheckpointSink(eid, {"units": 3, "samples": 500, "sample_rate": 24000, "marks": [["Intro", 0]]})
+    assert (sink.units, sink.samples, sink.last_title) == (0, 0, None)
+    assert os.path.getsize(sink.path) == WAV_HEADER_BYTES
+    sink.close()
+    checkpoint.discard(eid)
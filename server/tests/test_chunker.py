@@ -0,0 +1,16 @@
+from app.chunker import _iter_sentences, pack_sentences
+from app.document import Document
+
+TEXT = ("Primera oración.  Segunda\noración con salto!  ¿Tercera?  Cuarta… quinta sigue. "
+        "Una oración larga, con comas, que no entra en el tope y se parte por cláusulas.")
+
+def test_sentences_match_document_model():
+    doc = Document.from_text(TEXT)
+    assert list(_iter_sentences(TEXT)) == doc.sentences()
+    assert "Cuarta…" in doc.sentences()
+
+def test_pack_sentences_respects_targets():
+    segments = list(pack_sentences(TEXT, target=40, max_chars=50))
+    assert all(len(s) <= 50 for s in segments)
+    assert " ".join(segments).split() == TEXT.split()
+    assert segments[0] == "Primera oración."
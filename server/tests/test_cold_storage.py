@@ -0,0 +1,40 @@
+import json
+import os
+import wave
+
+import numpy as np
+import pytest
+
+from app import cold_storage
+from app.db import Episode, get_session
+from app.media import file_etag
+
+pytestmark = pytest.mark.skipif(not cold_storage.available(), reason="soundfile no instalado")
+
+def _wav(path, seconds: float = 1.0) -> str:
+    pcm = (np.sin(np.arange(int(24000 * seconds)) / 10) * 8000).astype("<i2")
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(24000)
+        wf.writeframes(pcm.tobytes())
+    os.utime(path, ns=(1_600_000_000_000_000_000, 1_600_000_000_123_456_789))
+    return str(path)
+
+def test_restore_keeps_bytes_and_etag(tmp_path):
+    wav = _wav(tmp_path / "ep.wav")
+    original, etag = open(wav, "rb").read(), file_etag(wav)
+    with get_session() as s:
+        e = Episode(user_id=1, upload_id=0, title="frío", voice="default", lang_code="e", status="ready",
+                    audio_path=wav, chapters_json=json.dumps([{"title": "Intro", "start_sample": 0}]))
+        s.add(e); s.commit(); s.refresh(e)
+        eid = e.id
+
+    assert cold_storage.transcode_episode(eid) is not None
+    assert not os.path.exists(wav)
+    restored = cold_storage.ensure_wav(eid)
+    assert restored == wav
+    assert open(restored, "rb").read() == original
+    assert file_etag(restored) == etag
+    with get_session() as s:
+        assert s.get(Episode, eid).storage == "wav"
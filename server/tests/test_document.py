@@ -0,0 +1,23 @@
+import uuid
+
+from app import document, ocr, pdf_extract
+
+def test_upload_without_ocr_is_extracted_again_once_tesseract_exists(tmp_path, monkeypatch, sample_pdf):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(sample_pdf(2))
+    calls = []
+    extract = pdf_extract.extract_structure
+    monkeypatch.setattr(pdf_extract, "extract_structure", lambda *a, **kw: calls.append(a) or extract(*a, **kw))
+    content_hash = uuid.uuid4().hex
+
+    monkeypatch.setattr(ocr, "tesseract_available", lambda: False)
+    first = document.for_upload(str(path), content_hash)
+    assert document.for_upload(str(path), content_hash) is first
+    assert len(calls) == 1
+
+    # Con OCR disponible el resultado sin OCR no sirve: se extrae de nuevo con otra clave
+    monkeypatch.setattr(ocr, "tesseract_available", lambda: True)
+    second = document.for_upload(str(path), content_hash)
+    assert second is not first
+    assert len(calls) == 2
+    assert second.raw_text() == first.raw_text()
@@ -0,0 +1,44 @@
+import pytest
+
+from app import drafts
+from app.db import get_session
+
+TEXT = "# Apunte\n\nIntro.\n\n## Uno\n\nPrimera parte.\n\n## Dos\n\nSegunda parte."
+
+@pytest.fixture
+def draft(client):
+    with get_session() as s:
+        d = drafts.create(s, 1, 0, "crudo", TEXT)
+        draft_id = d.id
+    return client.get(f"/drafts/{draft_id}").json()
+
+def _patch(client, draft, position, content, version=None):
+    sec = draft["sections"][position]
+    return client.patch(f"/drafts/{draft['draft_id']}/sections/{sec['id']}",
+                        json={"content": content, "version": draft["version"] if version is None else version})
+
+def test_patch_updates_one_section(client, draft):
+    r = _patch(client, draft, 1, "## Uno bis\n\nOtra cosa.")
+    assert r.status_code == 200
+    after = client.get(f"/drafts/{draft['draft_id']}").json()
+    assert after["version"] == draft["version"] + 1 == r.json()["version"]
+    assert [s["title"] for s in after["sections"]] == ["", "Uno bis", "Dos"]
+    assert after["refined_text"] == TEXT.replace("## Uno\n\nPrimera parte.", "## Uno bis\n\nOtra cosa.")
+
+def test_stale_version_is_409(client, draft):
+    assert _patch(client, draft, 1, "## Uno\n\nCambio.").status_code == 200
+    r = _patch(client, draft, 2, "## Dos\n\nOtro cambio.")
+    assert r.status_code == 409
+    assert r.json()["detail"]["version"] == draft["version"] + 1
+    assert client.get(f"/drafts/{draft['draft_id']}").json()["sections"][2]["content"] == "## Dos\n\nSegunda parte."
+
+@pytest.mark.parametrize("position,content", [
+    (1, "   "),  # vacía
+    (1, "## Uno\n\nTexto.\n\n## Intrusa\n\nMás."),  # dos secciones
+    (2, "Sin título."),  # pierde su `## `
+])
+def test_content_that_is_not_one_section_is_422(client, draft, position, content):
+    assert _patch(client, draft, position, content).status_code == 422
+    after = client.get(f"/drafts/{draft['draft_id']}").json()
+    assert after["version"] == draft["version"]
+    assert after["refined_text"] == TEXT
@@ -0,0 +1,72 @@
+import io
+import json
+import os
+import wave
+import zipfile
+
+import numpy as np
+import pytest
+
+from app import cold_storage, export
+from app.db import Episode, get_session
+
+def _episode(tmp_path, name: str, seconds: float = 2.0) -> int:
+    path = str(tmp_path / f"{name}.wav")
+    pcm = (np.sin(np.arange(int(24000 * seconds)) / 10) * 8000).astype("<i2")
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(24000)
+        wf.writeframes(pcm.tobytes())
+    with get_session() as s:
+        e = Episode(user_id=1, upload_id=0, title=name, voice="default", lang_code="e", status="ready",
+                    audio_path=path, transcript=f"# {name}", chapters_json=json.dumps([{"title": "Intro", "start_sample": 0}]))
+        s.add(e); s.commit(); s.refresh(e)
+        return e.id
+
+def _episodes(ids):
+    with get_session() as s:
+        rows = [s.get(Episode, i) for i in ids]
+    return [{"id": e.id, "title": e.title, "audio": cold_storage.open_audio(e.id), "created_at": e.created_at,
+             "duration_sec": e.duration_sec, "sample_rate": e.sample_rate, "chapters": [], "transcript": e.transcript}
+            for e in rows]
+
+def test_export_endpoint(client, tmp_path):
+    ids = [_episode(tmp_path, "uno"), _episode(tmp_path, "dos")]
+    r = client.get(f"/episodes/export.zip?ids={ids[0]},{ids[1]}")
+    assert r.status_code == 200
+    zf = zipfile.ZipFile(io.BytesIO(r.content))
+    assert zf.testzip() is None
+    assert sorted(zf.namelist()) == ["01 - uno.md", "01 - uno.wav", "02 - dos.md", "02 - dos.wav", "manifest.json"]
+
+def test_export_missing_audio_is_404(client, tmp_path):
+    eid = _episode(tmp_path, "borrado")
+    with get_session() as s:
+        os.remove(s.get(Episode, eid).audio_path)
+    assert client.get(f"/episodes/export.zip?ids={eid}").status_code == 404
+
+def test_export_survives_deleted_audio(tmp_path):
+    # Los archivos se abren antes de empezar: borrarlos a mitad del ZIP no lo corta
+    ids = [_episode(tmp_path, "uno"), _episode(tmp_path, "dos")]
+    originals = [open(str(tmp_path / n) + ".wav", "rb").read() for n in ("uno", "dos")]
+    stream = export.iter_zip(_episodes(ids))
+    body = [next(stream)]
+    for n in ("uno", "dos"):
+        os.remove(str(tmp_path / n) + ".wav")
+    body.extend(stream)
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(body)))
+    assert [zf.read("01 - uno.wav"), zf.read("02 - dos.wav")] == originals
+
+@pytest.mark.skipif(not cold_storage.available(), reason="soundfile no instalado")
+def test_export_during_cold_storage(tmp_path):
+    eid = _episode(tmp_path, "frio")
+    original = open(str(tmp_path / "frio.wav"), "rb").read()
+    stream = export.iter_zip(_episodes([eid]))
+    body = [next(stream)]
+    assert cold_storage.transcode_episode(eid) is not None
+    body.extend(stream)
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(body)))
+    assert zf.read("01 - frio.wav") == original
+    # Ya en frío, la exportación siguiente lleva el FLAC
+    with _episodes([eid])[0]["audio"] as f:
+        assert f.name.endswith(".flac")
@@ -0,0 +1,16 @@
+from app.chunker import _iter_sentences
+from app.g2p_cache import CachedG2P, G2PCache
+
+def test_cached_g2p_splits_like_the_chunker():
+    seen = []
+
+    def g2p(sentence):
+        seen.append(sentence)
+        return f"/{sentence}/", None
+
+    cached = CachedG2P(g2p, "e", G2PCache(db_path=None))
+    text = "Hola… empezamos. Un tema nuevo! Hola… empezamos."
+    ps, _ = cached(text)
+    assert seen == ["Hola…", "empezamos.", "Un tema nuevo!"]
+    assert seen == list(_iter_sentences(text))[:3]
+    assert ps == "/Hola…/ /empezamos./ /Un tema nuevo!/ /Hola…/ /empezamos./"
@@ -0,0 +1,61 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.media import serve_file
+
+DATA = bytes(range(256)) * 4  # 1024 bytes
+
+@pytest.fixture
+def media(tmp_path):
+    path = tmp_path / "audio.wav"
+    path.write_bytes(DATA)
+    app = FastAPI()
+
+    @app.get("/audio")
+    def audio(request: Request):
+        return serve_file(request, str(path), "audio/wav")
+
+    return TestClient(app)
+
+def test_full_response(media):
+    r = media.get("/audio")
+    assert r.status_code == 200 and r.content == DATA
+    assert r.headers["accept-ranges"] == "bytes" and r.headers["content-length"] == "1024"
+
+@pytest.mark.parametrize("spec, start, end", [
+    ("bytes=100-199", 100, 199),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-10", 1014, 1023),
+    ("bytes=-5000", 0, 1023),  # sufijo más largo que el archivo: el archivo entero
+    ("bytes=1000-99999", 1000, 1023),
+])
+def test_partial_content(media, spec, start, end):
+    r = media.get("/audio", headers={"Range": spec})
+    assert r.status_code == 206
+    assert r.headers["content-range"] == f"bytes {start}-{end}/1024"
+    assert r.content == DATA[start:end + 1]
+
+def test_not_modified(media):
+    etag = media.get("/audio").headers["etag"]
+    r = media.get("/audio", headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.content == b""
+    assert media.get("/audio", headers={"If-None-Match": '"otro"'}).status_code == 200
+
+def test_if_range(media):
+    etag = media.get("/audio").headers["etag"]
+    assert media.get("/audio", headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+    # Otra versión del archivo: se ignora el rango y va entero
+    r = media.get("/audio", headers={"Range": "bytes=0-9", "If-Range": '"viejo"'})
+    assert r.status_code == 200 and r.content == DATA
+
+@pytest.mark.parametrize("spec", ["bytes=1024-", "bytes=5000-6000", "bytes=-0"])
+def test_unsatisfiable(media, spec):
+    r = media.get("/audio", headers={"Range": spec})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == "bytes */1024"
+
+@pytest.mark.parametrize("spec", ["bytes=500-100", "bytes=0-1,5-6", "items=0-1", "bytes=-", "bytes=--5", "bytes=a-b"])
+def test_invalid_range_is_ignored(media, spec):
+    r = media.get("/audio", headers={"Range": spec})
+    assert r.status_code == 200 and r.content == DATA
@@ -0,0 +1,54 @@
+import os
+import stat
+
+import fitz
+import pytest
+
+from app import ocr
+from app.pdf_extract import extract_text, iter_blocks
+
+@pytest.fixture
+def fake_tesseract(tmp_path, monkeypatch):
+    """`tesseract` de mentira en el PATH: responde con el hash de la imagen y anota cada llamada."""
+    calls = tmp_path / "calls.log"
+    script = tmp_path / "bin" / "tesseract"
+    script.parent.mkdir()
+    script.write_text(f'#!/bin/sh\nh=$(sha1sum | cut -c1-8)\necho x >> "{calls}"\necho "Texto escaneado {{$h}}."\n')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{script.parent}{os.pathsep}{os.environ['PATH']}")
+    # El OCR corre en un pool de procesos nuevo, que toma PATH y la caché de este entorno
+    monkeypatch.setenv("OCR_CACHE_DIR", str(tmp_path / "ocr_cache"))
+    ocr._reset_pool(ocr._get_pool())
+    yield lambda: len(calls.read_text().splitlines()) if calls.exists() else 0
+    ocr._reset_pool(ocr._get_pool())
+
+def _scanned_pdf(path, pages: int) -> str:
+    """PDF mixto: la primera página con texto, el resto solo imágenes (sin fuentes)."""
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Página con capa de texto.")
+    for i in range(pages):
+        src = fitz.open()
+        src.new_page().insert_text((72, 72 + 20 * i), f"Hoja escaneada {i}", fontsize=20)
+        pix = src[0].get_pixmap(dpi=40)
+        doc.new_page().insert_image(fitz.Rect(0, 0, 595, 842), pixmap=pix)
+    doc.save(path)
+    return str(path)
+
+def test_iter_blocks_ocrs_scanned_pages_in_order(tmp_path, fake_tesseract):
+    pdf = _scanned_pdf(tmp_path / "mixto.pdf", 5)
+    texts = [b["text"] for b in iter_blocks(pdf, ocr=True)]
+    scanned = [t for t in texts if t.startswith("Texto escaneado")]
+    assert "Página con capa de texto." in texts[0]
+    assert len(scanned) == 5 and len(set(scanned)) == 5
+    assert fake_tesseract() == 5
+    # La segunda vez todo sale de la caché, en el mismo orden
+    assert [b["text"] for b in iter_blocks(pdf, ocr=True)] == texts
+    assert fake_tesseract() == 5
+
+def test_extract_text_stops_ocr_at_max_chars(tmp_path, fake_tesseract, monkeypatch):
+    monkeypatch.setattr(ocr, "OCR_AHEAD", 4)
+    pdf = _scanned_pdf(tmp_path / "largo.pdf", 30)
+    text = extract_text(pdf, max_chars=60, ocr=True)
+    assert "Texto escaneado" in text
+    # Solo se encargan las páginas por delante del consumidor, no las 30
+    assert fake_tesseract() <= 4
@@ -0,0 +1,36 @@
+import fitz
+
+from app.pdf_extract import document_info, extract_text
+
+def _pdf(tmp_path, pages: int, blank: int = 0) -> str:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_textbox(fitz.Rect(72, 72, 520, 780), f"Página {i}. " + "Texto de relleno. " * 40)
+    for _ in range(blank):
+        doc.new_page()
+    path = tmp_path / "doc.pdf"
+    doc.save(path)
+    return str(path)
+
+def test_extract_text_stops_opening_pages_at_max_chars(tmp_path, monkeypatch):
+    path = _pdf(tmp_path, 50)
+    opened = []
+    load_page = fitz.Document.load_page
+    monkeypatch.setattr(fitz.Document, "load_page", lambda self, pno, *a: opened.append(pno) or load_page(self, pno, *a))
+    text = extract_text(path, max_chars=1000)
+    assert len(text) == 1000
+    assert opened == [0, 1]
+
+def test_extract_text_page_range(tmp_path):
+    text = extract_text(_pdf(tmp_path, 5), pages=(3, None))
+    assert text.startswith("Página 3.") and "Página 2." not in text
+
+def test_document_info_flags_pages_without_text(tmp_path):
+    info = document_info(_pdf(tmp_path, 2, blank=1))
+    assert info == {"page_count": 3, "has_text_layer": [True, True, False], "pages_without_text": [2]}
+
+def test_upload_info_endpoint(client, upload_id):
+    r = client.get(f"/uploads/{upload_id}/info")
+    assert r.status_code == 200
+    assert r.json()["page_count"] == 4 and r.json()["pages_without_text"] == []
+    assert client.get("/uploads/999999/info").status_code == 404
@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+
+from app import progress
+from app.db import Episode, get_session
+
+def _events(client, episode_id, headers=None):
+    """(evento, datos) del stream SSE hasta que el servidor lo cierra."""
+    out, ev = [], None
+    with client.stream("GET", f"/episodes/{episode_id}/events", headers=headers or {}) as r:
+        assert r.status_code == 200
+        for line in r.iter_lines():
+            if line.startswith("event: "):
+                ev = line[len("event: "):]
+            elif line.startswith("data: "):
+                out.append((ev, json.loads(line[len("data: "):])))
+    return out
+
+def test_progress_keeps_only_latest_progress_per_stage():
+    eid = 10_001
+    progress.publish(eid, "stage", stage="synthesize")
+    for n in range(500):
+        progress.publish(eid, "progress", audio_sec=n)
+    progress.publish(eid, "stage", stage="finish")
+    progress.publish(eid, "done", audio_sec=499)
+    events = progress.events_since(eid, 0)
+    assert [(ev, d) for _, ev, d in events] == [
+        ("stage", {"stage": "synthesize"}), ("progress", {"audio_sec": 499}),
+        ("stage", {"stage": "finish"}), ("done", {"audio_sec": 499}),
+    ]
+    ids = [i for i, _, _ in events]
+    assert ids == sorted(ids)
+    # Last-Event-ID: se retoma después del último visto
+    assert [ev for _, ev, _ in progress.events_since(eid, ids[1] + 1)] == ["stage", "done"]
+
+def test_events_stream_until_done(client, upload_id):
+    eid = client.post("/process", json={"upload_id": upload_id}).json()["episode_id"]
+    events = _events(client, eid)
+    assert events[-1][0] == "done"
+    assert "synthesize" in [d.get("stage") for ev, d in events if ev == "stage"]
+
+def _episode(status: str, checkpoint_json: str = "") -> int:
+    with get_session() as s:
+        e = Episode(user_id=1, upload_id=0, title="otro proceso", voice="default", lang_code="e",
+                    status=status, checkpoint_json=checkpoint_json)
+        s.add(e); s.commit(); s.refresh(e)
+        return e.id
+
+def _set(episode_id: int, **fields):
+    with get_session() as s:
+        e = s.get(Episode, episode_id)
+        for k, v in fields.items():
+            setattr(e, k, v)
+        s.add(e); s.commit()
+
+def test_events_follow_job_in_other_process(client):
+    # Sin log en este proceso: el stream sigue la base hasta el estado terminal
+    manifest = {"units": 3, "samples": 48000, "sample_rate": 24000, "marks": [["Intro", 0]]}
+    eid = _episode("processing", json.dumps(manifest))
+
+    def finish():
+        time.sleep(1.5)
+        _set(eid, status="ready", duration_sec=42, checkpoint_json="")
+    threading.Thread(target=finish).start()
+
+    events = _events(client, eid)
+    assert events[0] == ("status", {"status": "processing"})
+    assert ("progress", {"stage": "synthesize", "units": 3, "title": "Intro", "audio_sec": 2.0}) in events
+    assert events[-1] == ("done", {"audio_sec": 42})
+
+def test_events_for_finished_job_in_other_process(client):
+    assert _events(client, _episode("cancelled")) == [("cancelled", {})]
+    assert _events(client, _episode("error"))[-1][0] == "error"
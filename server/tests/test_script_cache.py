@@ -0,0 +1,33 @@
+from app.script_cache import ScriptCache
+
+def _script(chars: int):
+    return [{"id": 1, "title": "t", "content": "x"}], "s" * chars
+
+def test_evicts_least_recently_used_by_count():
+    cache = ScriptCache(max_entries=2, max_bytes=1 << 20)
+    cache.put("a", _script(10))
+    cache.put("b", _script(10))
+    assert cache.get("a") is not None  # "a" pasa a ser la más reciente
+    cache.put("c", _script(10))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["entries"] == 2
+
+def test_evicts_by_bytes_and_keeps_the_count_exact():
+    cache = ScriptCache(max_entries=100, max_bytes=1000)
+    for key in "abc":
+        cache.put(key, _script(400))
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+    assert cache.stats()["bytes"] <= 1000
+    # Reemplazar una clave no cuenta su tamaño dos veces
+    before = cache.stats()["bytes"]
+    cache.put("c", _script(400))
+    assert cache.stats()["bytes"] == before
+
+def test_entry_larger_than_the_budget_is_not_cached():
+    cache = ScriptCache(max_entries=10, max_bytes=100)
+    cache.put("small", _script(10))
+    cache.put("huge", _script(1000))
+    assert cache.get("huge") is None
+    assert cache.get("small") is not None
@@ -0,0 +1,18 @@
+from app.sections import SECTION_WORDS, iter_sections
+
+def _para(n_words: int, word: str = "palabra") -> dict:
+    return {"type": "paragraph", "level": 0, "text": " ".join([word] * n_words) + "."}
+
+def _heading(text: str) -> dict:
+    return {"type": "heading", "level": 1, "text": text}
+
+def test_titled_long_body_is_numbered_in_parts():
+    blocks = [_heading("Intro")] + [_para(SECTION_WORDS)] * 5 + [_heading("Cierre"), _para(60)]
+    titles = [s["title"] for s in iter_sections(blocks)]
+    assert titles == ["Intro", "Intro - Parte 2", "Intro - Parte 3", "Cierre"]
+
+def test_untitled_long_body_keeps_its_base_title():
+    blocks = [_para(SECTION_WORDS)] * 5 + [_heading("Tema"), _para(60)]
+    sections = list(iter_sections(blocks))
+    assert [s["title"] for s in sections] == ["Sección 1", "Sección 1 - Parte 2", "Sección 1 - Parte 3", "Tema"]
+    assert [s["id"] for s in sections] == [1, 2, 3, 4]